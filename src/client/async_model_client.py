@@ -0,0 +1,328 @@
+import asyncio
+import time
+from typing import AsyncContextManager, Callable, Container, Dict, Any, List, Optional, Tuple
+
+from .batch_sizing import ConcurrencyTracker
+from .checkpoint import JsonlCheckpoint
+from .dedup import PromptDeduplicator
+from .model_client import BatchModelClient
+from .scheduling import ResultReorderBuffer
+from .streaming import StreamAccumulator
+from .transport import AsyncHttpTransport, is_item_failure, is_overload_error
+from ..prompts import PromptGenerator
+
+
+class AsyncBatchModelClient(BatchModelClient):
+    """
+    Асинхронный клиент для пакетной обработки запросов к модели.
+
+    Держит до max_in_flight пакетов одновременно в обработке на сервере поверх
+    одной общей aiohttp-сессии, пока следующие пакеты формируются из генератора.
+    Результаты выдаются в исходном порядке промптов.
+    """
+
+    def __init__(self, *args, max_in_flight: int = 4, **kwargs):
+        """
+        Args:
+            max_in_flight: Максимальное количество пакетов, одновременно
+                находящихся в обработке на сервере
+            *args, **kwargs: Параметры BatchModelClient
+        """
+        super().__init__(*args, **kwargs)
+        if max_in_flight < 1:
+            raise ValueError("Количество пакетов в обработке (max_in_flight) должно быть не менее 1")
+        self.max_in_flight = max_in_flight
+        self.async_transport = AsyncHttpTransport(
+            headers=self.headers,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            retry_policy=self.retry_policy,
+            pool_size=max_in_flight,
+            codec=self.codec,
+        )
+        self._pending_prompts = {}
+        # Задержка пакета включает ожидание одновременно обрабатываемых пакетов
+        self._concurrency = ConcurrencyTracker()
+        # Ограничение одновременных запросов, общее для нескольких клиентов
+        # (устанавливается FairTaskScheduler.add_task)
+        self.request_gate: Optional[Callable[[str, int], AsyncContextManager[None]]] = None
+
+    async def send_batch_request_async(
+        self,
+        prompts: List[str],
+        prefix: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        data = self._build_batch_payload(prompts, prefix)
+        info = {}
+        started_at = time.time()
+
+        try:
+            responses = await self._post_batch_async(data, len(prompts), info)
+        except Exception as e:
+            self._record_batch(len(prompts), started_at, info, error=e)
+            raise
+
+        self._record_batch(len(prompts), started_at, info, responses)
+        return responses
+
+    async def _stream_batch_async(
+        self, url: str, data: Dict[str, Any], n_prompts: int, info: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Асинхронный аналог BatchModelClient._stream_batch."""
+        accumulator = StreamAccumulator(n_prompts, self.early_stopper)
+        events = self.async_transport.stream_json(url, {**data, "stream": True}, info=info)
+        try:
+            async for event in events:
+                if accumulator.add(event):
+                    break
+        finally:
+            await events.aclose()
+
+        self._record_stream(accumulator, info)
+        return accumulator.responses()
+
+    async def _request_batch_async(
+        self, url: str, data: Dict[str, Any], n_prompts: int, info: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        if self.request_gate is None:
+            return await self._send_request_async(url, data, n_prompts, info)
+
+        queued_at = time.perf_counter()
+        async with self.request_gate(url, n_prompts):
+            info["queue_time"] = time.perf_counter() - queued_at
+            return await self._send_request_async(url, data, n_prompts, info)
+
+    async def _send_request_async(
+        self, url: str, data: Dict[str, Any], n_prompts: int, info: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        if self._use_streaming():
+            return await self._stream_batch_async(url, data, n_prompts, info)
+        return await self.async_transport.post_json(url, data, info=info)
+
+    async def _post_batch_async(
+        self, data: Dict[str, Any], n_prompts: int, info: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        if self.endpoint_pool is None:
+            return await self._request_batch_async(self.base_url, data, n_prompts, info)
+
+        while True:
+            endpoint = self.endpoint_pool.acquire()
+            info["endpoint"] = endpoint.url
+            started = time.perf_counter()
+            try:
+                responses = await self._request_batch_async(
+                    endpoint.url, data, n_prompts, info
+                )
+            except Exception as e:
+                elapsed = time.perf_counter() - started
+                ejected = self.endpoint_pool.release(endpoint, n_prompts, elapsed, e)
+                if not ejected or not self.endpoint_pool.has_available():
+                    raise
+                continue
+
+            elapsed = time.perf_counter() - started
+            self.endpoint_pool.release(endpoint, n_prompts, elapsed)
+            return responses
+
+    async def _send_prompts_async(
+        self, prompts: List[str], prefix: Optional[str] = None, depth: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Асинхронный аналог BatchModelClient._send_prompts; половины разделенного
+        пакета отправляются по очереди, чтобы деление не умножало нагрузку
+        на сервер сверх max_in_flight.
+        """
+        try:
+            return await self._send_adaptive_async(prompts, prefix)
+        except Exception as e:
+            if not self.isolate_failures or not is_item_failure(e):
+                raise
+            if len(prompts) == 1 or depth >= self.max_bisect_depth:
+                return [self._failed_response(e) for _ in prompts]
+
+            left, right = self._bisect(prompts, e)
+            left_responses = await self._send_prompts_async(left, prefix, depth + 1)
+            right_responses = await self._send_prompts_async(right, prefix, depth + 1)
+            return left_responses + right_responses
+
+    async def _send_adaptive_async(
+        self, prompts: List[str], prefix: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Асинхронный аналог BatchModelClient._send_adaptive."""
+        if self.batch_sizer is None:
+            return await self.send_batch_request_async(prompts, prefix)
+
+        started = time.perf_counter()
+        token = self._concurrency.enter()
+        error = None
+        try:
+            responses = await self.send_batch_request_async(prompts, prefix)
+        except Exception as e:
+            error = e
+        finally:
+            concurrency = self._concurrency.exit(token)
+
+        if error is not None:
+            if not is_overload_error(error) or not self.batch_sizer.record_failure(
+                len(prompts), error
+            ):
+                raise error
+            responses = []
+            for part in self._split_for_resend(prompts, error):
+                responses.extend(await self._send_prompts_async(part, prefix))
+            return responses
+
+        self.batch_sizer.record_success(
+            len(prompts), time.perf_counter() - started, concurrency
+        )
+        return responses
+
+    async def _process_batch_async(
+        self,
+        batch: List[Dict[str, Any]],
+        batch_prompts: List[str],
+    ) -> List[Dict[str, Any]]:
+        batch_responses, miss_positions = self._lookup_cache(batch_prompts)
+        duplicate_of, keys, waiting = {}, {}, {}
+        if miss_positions and self.deduplicator is not None:
+            miss_positions, duplicate_of, keys = self.deduplicator.lookup(
+                batch_prompts, batch_responses, miss_positions
+            )
+            miss_positions, waiting = self._claim_prompts(miss_positions, keys)
+
+        error = None
+        try:
+            if miss_positions:
+                server_responses = await self._send_prompts_async(
+                    [batch_prompts[i] for i in miss_positions], self._batch_prefix(batch)
+                )
+                self._store_responses(
+                    batch_prompts, batch_responses, miss_positions, server_responses
+                )
+                if self.deduplicator is not None:
+                    self.deduplicator.store(keys, batch_responses, miss_positions)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if self.deduplicator is not None:
+                self._release_prompts(miss_positions, keys, batch_responses, error)
+
+        for position, future in waiting.items():
+            batch_responses[position] = await future
+
+        PromptDeduplicator.fan_out(batch_responses, duplicate_of)
+        return self._build_batch_results(batch, batch_responses)
+
+    def _claim_prompts(
+        self, positions: List[int], keys: Dict[int, int]
+    ) -> Tuple[List[int], Dict[int, asyncio.Future]]:
+        """
+        Отделяет промпты, которые уже отправлены одновременно обрабатываемыми
+        пакетами: их ответы будут получены из этих пакетов.
+        """
+        send_positions = []
+        waiting = {}
+        loop = asyncio.get_running_loop()
+
+        for position in positions:
+            future = self._pending_prompts.get(keys[position])
+            if future is not None:
+                waiting[position] = future
+                continue
+            self._pending_prompts[keys[position]] = loop.create_future()
+            send_positions.append(position)
+
+        if waiting:
+            self.deduplicator.record_duplicates(len(waiting))
+        return send_positions, waiting
+
+    def _release_prompts(
+        self,
+        positions: List[int],
+        keys: Dict[int, int],
+        batch_responses: List[Optional[Dict[str, Any]]],
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """
+        Передает ответы пакетам, ожидающим те же промпты; если пакет завершился
+        ошибкой, ожидающие пакеты получают ту же ошибку.
+        """
+        for position in positions:
+            future = self._pending_prompts.pop(keys[position])
+            if batch_responses[position] is not None:
+                future.set_result(batch_responses[position])
+            elif error is None or isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
+                # Ожидающих пакетов может не быть: не сообщать о
+                # неполученном исключении при сборке мусора
+                future.exception()
+
+    async def _run_batches_async(
+        self,
+        generator: PromptGenerator,
+        skip_indices: Container[int],
+        checkpoint: Optional[JsonlCheckpoint],
+        emit: Callable[[List[Dict[str, Any]]], None],
+    ) -> None:
+        reorder_buffer = ResultReorderBuffer()
+        in_flight = {}
+
+        async def collect(done):
+            for task in done:
+                batch_index, batch = in_flight.pop(task)
+                batch_results = task.result()
+                if checkpoint is not None:
+                    checkpoint.append(batch_results)
+                print(f"Обработан пакет {batch_index}")
+
+                ready = reorder_buffer.add(batch, batch_results)
+                if ready:
+                    await asyncio.to_thread(emit, ready)
+
+        async with self.async_transport:
+            try:
+                for batch_index, batch in enumerate(
+                    self._iter_batches(generator, skip_indices), start=1
+                ):
+                    if len(in_flight) >= self.max_in_flight:
+                        done, _ = await asyncio.wait(
+                            in_flight, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        await collect(done)
+
+                    batch_prompts = [item["prompt"] for item in batch]
+                    self.submitted_count += len(batch)
+                    task = asyncio.create_task(
+                        self._process_batch_async(batch, batch_prompts)
+                    )
+                    in_flight[task] = (batch_index, batch)
+
+                if in_flight:
+                    done, _ = await asyncio.wait(in_flight)
+                    await collect(done)
+            finally:
+                for task in in_flight:
+                    task.cancel()
+                # Дожидаемся отмены, чтобы пакеты не продолжали работу
+                # после закрытия сессии
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+    def _run_batches(
+        self,
+        generator: PromptGenerator,
+        skip_indices: Container[int],
+        checkpoint: Optional[JsonlCheckpoint],
+        emit: Callable[[List[Dict[str, Any]]], None],
+    ) -> None:
+        asyncio.run(
+            self._run_batches_async(generator, skip_indices, checkpoint, emit)
+        )
+
+    def get_run_info(self) -> Dict[str, Any]:
+        run_info = super().get_run_info()
+        run_info["async_transport"] = self.async_transport.get_stats()
+        run_info["max_in_flight"] = self.max_in_flight
+        return run_info
@@ -0,0 +1,197 @@
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from .transport import is_request_too_large, is_timeout_error
+
+
+class AdaptiveBatchSizer:
+    """
+    Подбирает размер пакета по наблюдаемой пропускной способности.
+
+    Начинает с небольшого пакета и увеличивает его, пока пропускная
+    способность (промптов в секунду) растет. Если рост прекратился, размер
+    фиксируется на лучшем значении. Ошибка пакета или превышение целевой
+    задержки уменьшают размер. Слишком большой запрос (413), таймаут и
+    превышение задержки также ограничивают размер сверху; после серии
+    успешных пакетов ограничение ослабляется и размер подбирается заново.
+    Размер, отклоненный сервером с кодом 413, больше не пробуется.
+
+    Задержка пакета, обработанного одновременно с другими пакетами,
+    включает ожидание их обработки. Поэтому задержка делится на среднее
+    количество пакетов в обработке (concurrency в record_success).
+    """
+
+    def __init__(
+        self,
+        initial_size: int = 8,
+        min_size: int = 1,
+        max_size: int = 1024,
+        target_latency: Optional[float] = None,
+        growth_factor: float = 2.0,
+        shrink_factor: float = 0.5,
+        min_improvement: float = 0.05,
+        recovery_successes: int = 20,
+    ):
+        """
+        Args:
+            initial_size: Начальный размер пакета
+            min_size: Минимальный размер пакета
+            max_size: Максимальный размер пакета
+            target_latency: Целевая задержка пакета (в секундах, без ожидания
+                одновременно обрабатываемых пакетов)
+            growth_factor: Во сколько раз увеличивается пакет
+            shrink_factor: Во сколько раз уменьшается пакет после ошибки
+            min_improvement: Минимальный относительный прирост пропускной
+                способности, при котором пакет продолжает расти
+            recovery_successes: Количество успешных пакетов подряд, после
+                которого ограничение размера ослабляется
+        """
+        if not 1 <= min_size <= initial_size <= max_size:
+            raise ValueError(
+                "Размеры пакета должны удовлетворять условию 1 <= min_size <= initial_size <= max_size"
+            )
+        if recovery_successes < 1:
+            raise ValueError("Количество успешных пакетов (recovery_successes) должно быть не менее 1")
+        self.min_size = min_size
+        self.max_size = max_size
+        # Предел, который не превышается и после ослабления ограничения
+        self.size_limit = max_size
+        self.target_latency = target_latency
+        self.growth_factor = growth_factor
+        self.shrink_factor = shrink_factor
+        self.min_improvement = min_improvement
+        self.recovery_successes = recovery_successes
+
+        self.current_size = initial_size
+        self.best_size = initial_size
+        self.best_throughput = 0.0
+        self.settled = False
+        self.failures = 0
+        self.latency_violations = 0
+        self.recoveries = 0
+        self._degraded = False
+        self._successes = 0
+
+    def _shrink(self, size: int, lower_ceiling: bool = True) -> None:
+        self.current_size = max(self.min_size, int(size * self.shrink_factor))
+        if lower_ceiling:
+            self.max_size = max(self.min_size, min(self.max_size, self.current_size))
+        self.best_size = min(self.best_size, self.current_size)
+        self._degraded = True
+        self._successes = 0
+
+    def _recover(self) -> None:
+        """Ослабляет ограничение размера и возобновляет подбор."""
+        self.max_size = min(
+            self.size_limit, max(self.max_size + 1, int(self.max_size * self.growth_factor))
+        )
+        self.best_throughput = 0.0
+        self.settled = False
+        self._degraded = False
+        self._successes = 0
+        self.recoveries += 1
+
+    def record_success(self, size: int, latency: float, concurrency: float = 1.0) -> None:
+        """
+        Учитывает успешно обработанный пакет.
+
+        Args:
+            size: Размер пакета
+            latency: Задержка пакета (в секундах)
+            concurrency: Среднее количество пакетов (включая этот), одновременно
+                находившихся в обработке
+        """
+        latency = latency / max(concurrency, 1.0)
+        if self.target_latency is not None and latency > self.target_latency:
+            self.latency_violations += 1
+            if size > self.min_size:
+                self._shrink(size)
+                self.best_throughput = 0.0
+                self.settled = True
+            return
+
+        if self._degraded:
+            self._successes += 1
+            if self._successes >= self.recovery_successes:
+                self._recover()
+                return
+
+        if self.settled or size != self.current_size:
+            return
+
+        throughput = size / latency if latency > 0 else float("inf")
+        if throughput > self.best_throughput * (1 + self.min_improvement):
+            self.best_throughput = throughput
+            self.best_size = size
+            next_size = min(self.max_size, int(size * self.growth_factor))
+            if next_size == size:
+                self.settled = True
+            self.current_size = next_size
+        else:
+            self.current_size = self.best_size
+            self.settled = True
+
+    def record_failure(self, size: int, error: Optional[BaseException] = None) -> bool:
+        """
+        Учитывает ошибку пакета и уменьшает размер. Ограничение сверху
+        снижается только для слишком большого запроса (413) и таймаута:
+        остальные ошибки перегрузки (5xx) не связаны с размером пакета.
+
+        Returns:
+            bool: False, если пакет уже минимального размера и уменьшать некуда
+        """
+        self.failures += 1
+        if size <= self.min_size:
+            return False
+
+        if error is not None and is_request_too_large(error):
+            self.size_limit = max(self.min_size, min(self.size_limit, size - 1))
+        lower_ceiling = error is None or is_request_too_large(error) or is_timeout_error(error)
+        self._shrink(size, lower_ceiling)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "batch_size": self.current_size,
+            "best_throughput": self.best_throughput,
+            "settled": self.settled,
+            "max_size": self.max_size,
+            "size_limit": self.size_limit,
+            "failures": self.failures,
+            "latency_violations": self.latency_violations,
+            "recoveries": self.recoveries,
+        }
+
+
+class ConcurrencyTracker:
+    """
+    Среднее по времени количество пакетов, одновременно находившихся
+    в обработке, пока обрабатывался данный пакет.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self._area = 0.0
+        self._updated_at = time.perf_counter()
+
+    def _advance(self) -> float:
+        now = time.perf_counter()
+        self._area += self.in_flight * (now - self._updated_at)
+        self._updated_at = now
+        return now
+
+    def enter(self) -> Tuple[float, float]:
+        """Отмечает начало обработки пакета; возвращает метку для exit."""
+        now = self._advance()
+        self.in_flight += 1
+        return now, self._area
+
+    def exit(self, token: Tuple[float, float]) -> float:
+        """Отмечает конец обработки пакета; возвращает среднюю загрузку."""
+        started, area = token
+        now = self._advance()
+        self.in_flight -= 1
+        elapsed = now - started
+        if elapsed <= 0:
+            return 1.0
+        return max(1.0, (self._area - area) / elapsed)
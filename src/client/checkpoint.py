@@ -0,0 +1,133 @@
+import json
+import os
+from typing import Dict, Any, Iterator, List, Set
+
+
+class JsonlCheckpoint:
+    """
+    Контрольная точка обработки набора данных в формате JSONL.
+
+    Результаты каждого обработанного пакета сразу дописываются в файл и
+    сбрасываются на диск, поэтому после сбоя или прерывания обработку можно
+    продолжить, пропустив уже обработанные индексы.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        """
+        Args:
+            path: Путь к файлу контрольной точки
+            resume: Продолжить существующую контрольную точку
+                (иначе файл перезаписывается)
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.resume = resume
+
+        if not resume and os.path.exists(path):
+            os.remove(path)
+
+    def _read_records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Последовательно читает записи контрольной точки.
+
+        Недописанная последняя строка (сбой во время записи) отбрасывается
+        и обрезается в файле, чтобы следующие записи начинались с новой строки.
+        """
+        if not os.path.exists(self.path):
+            return
+
+        valid_size = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                valid_size += len(line)
+                yield record
+
+        if valid_size < os.path.getsize(self.path):
+            print(f"Контрольная точка {self.path} повреждена в конце, хвост отброшен")
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_size)
+
+    def load(self) -> Dict[int, Dict[str, Any]]:
+        """
+        Читает сохраненные результаты.
+
+        Результаты с ошибкой не считаются обработанными и будут отправлены повторно.
+
+        Returns:
+            Dict[int, Dict[str, Any]]: Результаты по индексам промптов
+        """
+        completed = {}
+        for record in self._read_records():
+            if record.get("error"):
+                completed.pop(record["index"], None)
+            else:
+                completed[record["index"]] = record
+        return completed
+
+    def load_indices(self) -> Set[int]:
+        """Возвращает индексы успешно обработанных промптов, не храня сами результаты."""
+        completed = set()
+        for record in self._read_records():
+            if record.get("error"):
+                completed.discard(record["index"])
+            else:
+                completed.add(record["index"])
+        return completed
+
+    def iter_completed(self, indices: Set[int]) -> Iterator[Dict[str, Any]]:
+        """Последовательно выдает сохраненные результаты для указанных индексов."""
+        for record in self._read_records():
+            if not record.get("error") and record["index"] in indices:
+                yield record
+
+    def append(self, results: List[Dict[str, Any]]) -> None:
+        """Дописывает результаты пакета и сбрасывает их на диск."""
+        with open(self.path, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def merge_checkpoints(paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    Объединяет успешные результаты нескольких контрольных точек - например,
+    частей набора данных, оцененных на разных узлах (PromptGenerator.shard).
+
+    Индексы результатов - позиции примеров в данных, поэтому объединенный
+    список упорядочен по индексу, как результат process_dataset для всего
+    набора, и подходит для Evaluator.evaluate_dataset.
+
+    Raises:
+        ValueError: Если файла нет или индексы разных файлов пересекаются
+    """
+    merged = {}
+    sources = {}
+    overlaps = []
+
+    for path in paths:
+        if not os.path.exists(path):
+            raise ValueError(f"Файл результатов не найден: {path}")
+        for index, record in JsonlCheckpoint(path, resume=True).load().items():
+            if index in merged:
+                overlaps.append((index, sources[index], path))
+            merged[index] = record
+            sources[index] = path
+
+    if overlaps:
+        details = ", ".join(f"{index} ({first} и {second})" for index, first, second in overlaps[:5])
+        raise ValueError(
+            f"Результаты {len(overlaps)} примеров встречаются в нескольких файлах: {details}"
+            f"{', ...' if len(overlaps) > 5 else ''}"
+        )
+
+    return [merged[index] for index in sorted(merged)]
@@ -0,0 +1,143 @@
+import gzip
+import json
+import time
+from typing import Dict, Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+JSON_CODECS = ("json", "orjson", "auto")
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+
+class JsonCodec:
+    """Сериализация JSON стандартной библиотекой."""
+
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """Сериализация JSON библиотекой orjson (в несколько раз быстрее стандартной)."""
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("Для кодека orjson необходимо установить пакет orjson")
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+def get_json_codec(name: str = "json") -> JsonCodec:
+    """
+    Возвращает JSON-кодек по имени: json, orjson или auto (orjson, если он
+    установлен, иначе стандартная библиотека).
+    """
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    if name == "orjson":
+        return OrjsonCodec()
+    if name == "json":
+        return JsonCodec()
+    raise ValueError(f"Неизвестный JSON-кодек: {name}")
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6 if level is None else level)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ImportError("Для сжатия zstd необходимо установить пакет zstandard")
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+    raise ValueError(f"Неизвестный способ сжатия: {encoding}")
+
+
+def decompress(data: bytes, encoding: Optional[str]) -> bytes:
+    """Распаковывает тело сообщения согласно заголовку Content-Encoding."""
+    if not encoding or encoding == "identity":
+        return data
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ImportError("Для распаковки zstd необходимо установить пакет zstandard")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError(f"Неизвестный способ сжатия: {encoding}")
+
+
+class PayloadCodec:
+    """
+    Кодирование тел запросов и ответов: JSON-кодек и необязательное сжатие
+    тела запроса (с заголовком Content-Encoding).
+    """
+
+    def __init__(
+        self,
+        json_codec: str = "json",
+        compression: str = "none",
+        compression_level: Optional[int] = None,
+    ):
+        """
+        Args:
+            json_codec: JSON-кодек (json, orjson или auto)
+            compression: Сжатие тела запроса (none, gzip или zstd)
+            compression_level: Уровень сжатия (по умолчанию - свой для каждого способа)
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Неизвестный способ сжатия: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("Для сжатия zstd необходимо установить пакет zstandard")
+
+        self.json_codec = get_json_codec(json_codec)
+        self.compression = compression
+        self.compression_level = compression_level
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self.compression == "none":
+            return {}
+        return {"Content-Encoding": self.compression}
+
+    def encode(self, payload: Any, info: Dict[str, Any]) -> bytes:
+        """
+        Кодирует тело запроса.
+
+        В info записываются размер тела до и после сжатия
+        (raw_request_bytes, request_bytes) и время кодирования (encode_time).
+        """
+        started = time.perf_counter()
+        data = self.json_codec.dumps(payload)
+        info["raw_request_bytes"] = len(data)
+        if self.compression != "none":
+            data = compress(data, self.compression, self.compression_level)
+        info["encode_time"] = time.perf_counter() - started
+        info["request_bytes"] = len(data)
+        return data
+
+    def decode(self, data: bytes, info: Dict[str, Any]) -> Any:
+        """Декодирует тело ответа и записывает время декодирования (decode_time) в info."""
+        started = time.perf_counter()
+        result = self.json_codec.loads(data)
+        info["decode_time"] = time.perf_counter() - started
+        return result
+
+    def describe(self) -> Dict[str, Any]:
+        return {"json_codec": self.json_codec.name, "compression": self.compression}
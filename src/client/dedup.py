@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+import xxhash
+
+
+class PromptDeduplicator:
+    """
+    Дедупликация одинаковых промптов в пределах одного прогона.
+
+    Каждый уникальный промпт (по xxhash текста) отправляется на сервер один
+    раз, а его ответ раздается всем индексам с тем же промптом: повторам
+    внутри пакета - сразу, повторам в следующих пакетах - из памяти
+    (не более max_entries последних ответов). Корректно только при
+    детерминированной генерации (temperature=0).
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        """
+        Args:
+            max_entries: Максимальное количество ответов, хранимых в памяти
+        """
+        if max_entries < 1:
+            raise ValueError("Размер хранилища (max_entries) должен быть не менее 1")
+
+        self.max_entries = max_entries
+        self.responses = OrderedDict()
+        self.prompts = 0
+        self.duplicates = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(prompt: str) -> int:
+        return xxhash.xxh3_128_intdigest(prompt.encode("utf-8"))
+
+    def lookup(
+        self,
+        batch_prompts: List[str],
+        batch_responses: List[Optional[Dict[str, Any]]],
+        miss_positions: List[int],
+    ) -> Tuple[List[int], Dict[int, int], Dict[int, int]]:
+        """
+        Отбирает промпты пакета, которые нужно отправить на сервер.
+
+        Ответы повторов, уже полученные ранее, записываются в batch_responses.
+
+        Returns:
+            Позиции уникальных промптов для отправки, соответствие позиций
+            повторов внутри пакета позициям их первых вхождений и ключи
+            промптов по позициям
+        """
+        send_positions = []
+        duplicate_of = {}
+        first_positions = {}
+        keys = {}
+
+        with self._lock:
+            for position in miss_positions:
+                key = self.make_key(batch_prompts[position])
+                keys[position] = key
+                self.prompts += 1
+
+                if key in first_positions:
+                    duplicate_of[position] = first_positions[key]
+                    self.duplicates += 1
+                    continue
+
+                response = self.responses.get(key)
+                if response is not None:
+                    self.responses.move_to_end(key)
+                    batch_responses[position] = response
+                    self.duplicates += 1
+                    continue
+
+                first_positions[key] = position
+                send_positions.append(position)
+
+        return send_positions, duplicate_of, keys
+
+    def store(
+        self,
+        keys: Dict[int, int],
+        batch_responses: List[Optional[Dict[str, Any]]],
+        positions: List[int],
+    ) -> None:
+        """Запоминает ответы отправленных промптов (кроме ответов с ошибкой)."""
+        with self._lock:
+            for position in positions:
+                response = batch_responses[position]
+                if response is None or response.get("error"):
+                    continue
+                self.responses[keys[position]] = response
+                self.responses.move_to_end(keys[position])
+
+            while len(self.responses) > self.max_entries:
+                self.responses.popitem(last=False)
+
+    def record_duplicates(self, count: int) -> None:
+        with self._lock:
+            self.duplicates += count
+
+    @staticmethod
+    def fan_out(
+        batch_responses: List[Optional[Dict[str, Any]]], duplicate_of: Dict[int, int]
+    ) -> None:
+        """Раздает ответы первых вхождений повторам внутри пакета."""
+        for position, first_position in duplicate_of.items():
+            batch_responses[position] = batch_responses[first_position]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "prompts": self.prompts,
+                "duplicates": self.duplicates,
+                "dedup_ratio": self.duplicates / self.prompts if self.prompts > 0 else 0.0,
+            }
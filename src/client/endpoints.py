@@ -0,0 +1,181 @@
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+import requests
+
+from .transport import is_endpoint_failure
+
+
+class Endpoint:
+    """Реплика сервера с моделью и статистика работы с ней."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.requests = 0
+        self.prompts = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.first_request_at = None
+        self.last_response_at = None
+        self.ejected_until = 0.0
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def get_stats(self) -> Dict[str, Any]:
+        active_time = 0.0
+        if self.first_request_at is not None and self.last_response_at is not None:
+            active_time = self.last_response_at - self.first_request_at
+
+        return {
+            "requests": self.requests,
+            "prompts": self.prompts,
+            "errors": self.errors,
+            "mean_latency": self.busy_time / self.requests if self.requests > 0 else 0.0,
+            "prompts_per_second": self.prompts / active_time if active_time > 0 else 0.0,
+        }
+
+
+class EndpointPool:
+    """
+    Пул реплик сервера с моделью.
+
+    Пакеты распределяются на реплику с наименьшим числом незавершенных
+    запросов. Реплики, на которых запрос завершился ошибкой или не прошла
+    проверка работоспособности, временно исключаются из распределения.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        eject_seconds: float = 30.0,
+        health_check_interval: float = 15.0,
+        health_check_timeout: float = 5.0,
+    ):
+        """
+        Args:
+            urls: Адреса эндпоинтов реплик
+            eject_seconds: На сколько секунд исключается неисправная реплика
+            health_check_interval: Период проверки работоспособности (в секундах),
+                0 - не проверять
+            health_check_timeout: Таймаут проверочного запроса (в секундах)
+        """
+        if not urls:
+            raise ValueError("Необходимо указать хотя бы один эндпоинт")
+
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.eject_seconds = eject_seconds
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._health_thread = None
+
+    @classmethod
+    def from_addresses(
+        cls, addresses: List[str], endpoint: str = "/api/v1/generate", **kwargs
+    ) -> "EndpointPool":
+        """Создает пул по списку адресов вида host:port."""
+        return cls([f"http://{address.strip()}{endpoint}" for address in addresses], **kwargs)
+
+    def acquire(self) -> Endpoint:
+        """Выбирает реплику для очередного запроса."""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e.is_available(now)]
+            if not candidates:
+                candidates = [min(self.endpoints, key=lambda e: e.ejected_until)]
+
+            endpoint = min(candidates, key=lambda e: (e.outstanding, e.requests))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            if endpoint.first_request_at is None:
+                endpoint.first_request_at = now
+            return endpoint
+
+    def release(
+        self,
+        endpoint: Endpoint,
+        n_prompts: int,
+        elapsed: float,
+        error: Optional[BaseException] = None,
+    ) -> bool:
+        """
+        Учитывает завершение запроса к реплике.
+
+        Args:
+            endpoint: Реплика, выданная acquire
+            n_prompts: Количество промптов в запросе
+            elapsed: Длительность запроса (в секундах)
+            error: Ошибка запроса, если он завершился неудачно
+
+        Returns:
+            bool: True, если реплика исключена из-за ошибки
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.busy_time += elapsed
+            endpoint.last_response_at = time.monotonic()
+            if error is None:
+                endpoint.prompts += n_prompts
+                return False
+
+            endpoint.errors += 1
+            if not is_endpoint_failure(error):
+                return False
+            self._eject(endpoint)
+            return True
+
+    def _eject(self, endpoint: Endpoint) -> None:
+        endpoint.ejected_until = time.monotonic() + self.eject_seconds
+        print(f"Эндпоинт {endpoint.url} временно исключен на {self.eject_seconds:.0f} с")
+
+    def has_available(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            return any(endpoint.is_available(now) for endpoint in self.endpoints)
+
+    def check_health(self) -> None:
+        """Проверяет все реплики минимальным запросом на генерацию."""
+        for endpoint in self.endpoints:
+            try:
+                response = requests.post(
+                    endpoint.url,
+                    json={"prompt": "", "max_tokens": 1, "temperature": 0.0, "top_p": 1.0},
+                    timeout=self.health_check_timeout,
+                )
+                healthy = response.status_code < 500
+            except requests.RequestException:
+                healthy = False
+
+            with self._lock:
+                if healthy:
+                    endpoint.ejected_until = 0.0
+                elif endpoint.is_available(time.monotonic()):
+                    self._eject(endpoint)
+
+    def _health_loop(self) -> None:
+        while not self._stop_event.wait(self.health_check_interval):
+            self.check_health()
+
+    def start(self) -> None:
+        """Запускает периодическую проверку работоспособности в фоновом потоке."""
+        if self.health_check_interval <= 0 or self._health_thread is not None:
+            return
+        self._stop_event.clear()
+        self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+        self._health_thread.start()
+
+    def stop(self) -> None:
+        if self._health_thread is None:
+            return
+        self._stop_event.set()
+        self._health_thread.join()
+        self._health_thread = None
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {endpoint.url: endpoint.get_stats() for endpoint in self.endpoints}
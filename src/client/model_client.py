@@ -1,7 +1,25 @@
 import json
-import requests
-from typing import Dict, Any, List
+import queue
+import threading
+import time
+from typing import Callable, Container, Dict, Any, Iterator, List, Optional, Tuple
 from ..prompts import PromptGenerator
+from .batch_sizing import AdaptiveBatchSizer
+from .checkpoint import JsonlCheckpoint
+from .codecs import PayloadCodec
+from .dedup import PromptDeduplicator
+from .endpoints import EndpointPool
+from .response_cache import ResponseCache
+from .scheduling import BatchScheduler, ResultReorderBuffer, SequentialScheduler
+from .scoring import LetterScorer
+from .streaming import EarlyStopper, StreamAccumulator
+from .telemetry import ClientTelemetry
+from .quarantine import QuarantineFile
+from .transport import HttpTransport, RetryPolicy, is_item_failure, is_overload_error
+
+
+class _ProductionStopped(Exception):
+    """Потребитель потоковых результатов прекратил чтение."""
 
 
 class ModelClient:
@@ -17,12 +35,33 @@ class ModelClient:
         max_tokens: int = 10,
         temperature: float = 0.0,
         top_p: float = 1.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 300.0,
+        retry_policy: RetryPolicy = None,
+        scorer: Optional[LetterScorer] = None,
+        early_stopper: Optional[EarlyStopper] = None,
+        codec: Optional[PayloadCodec] = None,
     ):
         self.base_url = f"http://{host}:{port}{endpoint}"
+        self.endpoint = endpoint
         self.headers = {"Content-Type": "application/json"}
         self.max_tokens = max_tokens
         self.temperature = temperature
         self.top_p = top_p
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.scorer = scorer
+        self.early_stopper = early_stopper
+        self.codec = codec or PayloadCodec()
+        self.stream_stats = {"streams": 0, "cancelled_streams": 0, "stopped_early": 0}
+        self.transport = HttpTransport(
+            headers=self.headers,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retry_policy=self.retry_policy,
+            codec=self.codec,
+        )
 
     def send_request(
         self,
@@ -35,21 +74,67 @@ class ModelClient:
             "temperature": self.temperature,
             "top_p": self.top_p,
         }
-        response = requests.post(
-            self.base_url,
-            headers=self.headers,
-            data=json.dumps(data),
-            timeout=120,
-        )
-
-        response.raise_for_status()
-        result_json = response.json()
+        if self.scorer is not None:
+            data["prompt"] = self.scorer.prepare_prompt(prompt)
+            data.update(self.scorer.payload_fields())
+        if self._use_streaming():
+            return self._stream_batch(self.base_url, data, 1, {})[0]
+        result_json = self.transport.post_json(self.base_url, data)
 
+        if self.scorer is not None:
+            scored = self.scorer.parse_response(result_json)
+            return {"output": scored["model_output"], "option_probs": scored["option_probs"]}
         if "letter" in result_json:
             return {"output": result_json["letter"]}
         else:
             return result_json
 
+    def _use_streaming(self) -> bool:
+        # В режиме оценки по логарифмам вероятностей генерируется один токен
+        return self.early_stopper is not None and self.scorer is None
+
+    def _record_stream(self, accumulator: StreamAccumulator, info: Dict[str, Any]) -> None:
+        self.stream_stats["streams"] += 1
+        self.stream_stats["stopped_early"] += accumulator.stopped_early
+        if accumulator.remaining == 0 and accumulator.stopped_early > 0:
+            self.stream_stats["cancelled_streams"] += 1
+        info["stopped_early"] = accumulator.stopped_early
+
+    def _stream_batch(
+        self, url: str, data: Dict[str, Any], n_prompts: int, info: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Отправляет запрос в потоковом режиме и собирает ответы.
+
+        Поток закрывается, как только ответы всех промптов готовы по условию
+        early_stopper, поэтому сервер не тратит время на лишние токены.
+        """
+        accumulator = StreamAccumulator(n_prompts, self.early_stopper)
+        events = self.transport.stream_json(url, {**data, "stream": True}, info=info)
+        try:
+            for event in events:
+                if accumulator.add(event):
+                    break
+        finally:
+            events.close()
+
+        self._record_stream(accumulator, info)
+        return accumulator.responses()
+
+    def get_run_info(self) -> Dict[str, Any]:
+        """Возвращает сводку о работе клиента для сохранения вместе с оценкой."""
+        run_info = {"transport": self.transport.get_stats(), "codec": self.codec.describe()}
+        if self.early_stopper is not None:
+            run_info["streaming"] = dict(self.stream_stats)
+        return run_info
+
+    def close(self) -> None:
+        self.transport.close()
+        if getattr(self, "endpoint_pool", None) is not None:
+            self.endpoint_pool.stop()
+        if getattr(self, "telemetry", None) is not None:
+            self.telemetry.close()
+
 
 class BatchModelClient(ModelClient):
     """
@@ -65,75 +150,594 @@ class BatchModelClient(ModelClient):
         max_tokens: int = 10,
         temperature: float = 0.0,
         top_p: float = 1.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 300.0,
+        retry_policy: RetryPolicy = None,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[BatchScheduler] = None,
+        batch_sizer: Optional[AdaptiveBatchSizer] = None,
+        endpoint_pool: Optional[EndpointPool] = None,
+        telemetry: Optional[ClientTelemetry] = None,
+        scorer: Optional[LetterScorer] = None,
+        shared_prefix: bool = False,
+        early_stopper: Optional[EarlyStopper] = None,
+        isolate_failures: bool = False,
+        max_bisect_depth: int = 8,
+        quarantine: Optional[QuarantineFile] = None,
+        deduplicator: Optional[PromptDeduplicator] = None,
+        codec: Optional[PayloadCodec] = None,
+        n_samples: int = 1,
+        model_id: Optional[str] = None,
     ):
-        super().__init__(host, port, endpoint, max_tokens, temperature, top_p)
+        """
+        Args:
+            shared_prefix: Отправлять общий префикс промптов пакета (few-shot
+                примеры) один раз: {"prefix", "suffixes"} вместо {"prompts"};
+                префикс берется из поля prefix элементов генератора
+                (FewShotPromptGenerator с share_prefix=True)
+            early_stopper: Генерировать ответы потоково и прекращать генерацию,
+                как только ответы готовы (см. EarlyStopper)
+            isolate_failures: При ошибке сервера, которая может быть вызвана
+                отдельными промптами, делить пакет пополам, пока ошибочные
+                промпты не будут найдены, вместо завершения всей обработки
+            max_bisect_depth: Максимальная глубина деления пакета; промпты части
+                пакета, ошибка которой не изолирована на этой глубине, считаются
+                ошибочными целиком
+            quarantine: Файл, в который записываются ошибочные промпты
+            deduplicator: Отправлять одинаковые промпты один раз за прогон
+                (только при temperature=0)
+            codec: JSON-кодек и сжатие тел запросов (по умолчанию - стандартный
+                json без сжатия)
+            n_samples: Количество ответов на каждый промпт, запрашиваемых одним
+                запросом (поле n); при n_samples > 1 результаты содержат список
+                ответов model_outputs
+            model_id: Идентификатор модели (чекпоинта) - входит в ключ кэша
+                ответов, чтобы ответы разных моделей на одном сервере не смешивались
+        """
+        super().__init__(
+            host,
+            port,
+            endpoint,
+            max_tokens,
+            temperature,
+            top_p,
+            connect_timeout,
+            read_timeout,
+            retry_policy,
+            scorer,
+            early_stopper,
+            codec,
+        )
+        if deduplicator is not None and temperature > 0:
+            raise ValueError("Дедупликация промптов возможна только при temperature=0")
+        if n_samples < 1:
+            raise ValueError("Количество ответов на промпт (n_samples) должно быть не менее 1")
+        if max_bisect_depth < 0:
+            raise ValueError("Глубина деления пакета (max_bisect_depth) не может быть отрицательной")
+        if n_samples > 1 and scorer is not None:
+            raise ValueError(
+                "Несколько ответов на промпт несовместимы с оценкой по логарифмам вероятностей"
+            )
+
         self.batch_size = batch_size
+        self.cache = cache
+        self.deduplicator = deduplicator
+        self.scheduler = scheduler or SequentialScheduler()
+        self.batch_sizer = batch_sizer
+        self.endpoint_pool = endpoint_pool
+        self.telemetry = telemetry
+        self.shared_prefix = shared_prefix
+        self.isolate_failures = isolate_failures
+        self.max_bisect_depth = max_bisect_depth
+        self.quarantine = quarantine
+        self.isolation_stats = {"bisections": 0, "failed_prompts": 0}
+        self.resumed_count = 0
+        # Элементы, переданные на отправку (без восстановленных из контрольной точки)
+        self.submitted_count = 0
+        self.n_samples = n_samples
+        self.model_id = model_id
 
-    def send_batch_request(
-        self,
-        prompts: List[str],
-    ) -> List[Dict[str, Any]]:
+    def _use_streaming(self) -> bool:
+        # Потоковый протокол передает один ответ на промпт
+        return super()._use_streaming() and self.n_samples == 1
+
+    def _build_batch_payload(
+        self, prompts: List[str], prefix: Optional[str] = None
+    ) -> Dict[str, Any]:
         data = {
             "prompts": prompts,
             "max_tokens": self.max_tokens,
             "temperature": self.temperature,
             "top_p": self.top_p,
         }
+        if self.scorer is not None:
+            data["prompts"] = [self.scorer.prepare_prompt(prompt) for prompt in prompts]
+            data.update(self.scorer.payload_fields())
+        if self.n_samples > 1:
+            data["n"] = self.n_samples
+        if prefix:
+            data["prefix"] = prefix
+            data["suffixes"] = [prompt[len(prefix) :] for prompt in data.pop("prompts")]
+        return data
+
+    def send_batch_request(
+        self,
+        prompts: List[str],
+        prefix: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        data = self._build_batch_payload(prompts, prefix)
+        info = {}
+        started_at = time.time()
+
+        try:
+            responses = self._post_batch(data, len(prompts), info)
+        except Exception as e:
+            self._record_batch(len(prompts), started_at, info, error=e)
+            raise
+
+        self._record_batch(len(prompts), started_at, info, responses)
+        return responses
+
+    def _request_batch(
+        self, url: str, data: Dict[str, Any], n_prompts: int, info: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        if self._use_streaming():
+            return self._stream_batch(url, data, n_prompts, info)
+        return self.transport.post_json(url, data, info=info)
+
+    def _post_batch(
+        self, data: Dict[str, Any], n_prompts: int, info: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        if self.endpoint_pool is None:
+            return self._request_batch(self.base_url, data, n_prompts, info)
+
+        while True:
+            endpoint = self.endpoint_pool.acquire()
+            info["endpoint"] = endpoint.url
+            started = time.perf_counter()
+            try:
+                responses = self._request_batch(endpoint.url, data, n_prompts, info)
+            except Exception as e:
+                elapsed = time.perf_counter() - started
+                ejected = self.endpoint_pool.release(endpoint, n_prompts, elapsed, e)
+                if not ejected or not self.endpoint_pool.has_available():
+                    raise
+                continue
+
+            elapsed = time.perf_counter() - started
+            self.endpoint_pool.release(endpoint, n_prompts, elapsed)
+            return responses
+
+    def _record_batch(
+        self,
+        size: int,
+        started_at: float,
+        info: Dict[str, Any],
+        responses: Optional[List[Dict[str, Any]]] = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        if self.telemetry is None:
+            return
+
+        extra = {
+            key: info[key]
+            for key in ("attempts", "endpoint", "stopped_early", "queue_time")
+            if key in info
+        }
+        self.telemetry.record_batch(
+            size,
+            started_at,
+            time.time(),
+            request_bytes=info.get("request_bytes", 0),
+            response_bytes=info.get("response_bytes", 0),
+            raw_request_bytes=info.get("raw_request_bytes", 0),
+            encode_time=info.get("encode_time", 0.0),
+            decode_time=info.get("decode_time", 0.0),
+            tokens=ClientTelemetry.count_tokens(responses) if responses else None,
+            error=error,
+            **extra,
+        )
+
+    @staticmethod
+    def _make_batch_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        batch_item = {
+            "index": item["index"],
+            "prompt": item["prompt"],
+            "domain": item.get("domain", ""),
+            "expected_output": item.get("output", ""),
+        }
+        if item.get("prefix"):
+            batch_item["prefix"] = item["prefix"]
+        return batch_item
+
+    def _batch_prefix(self, batch: List[Dict[str, Any]]) -> Optional[str]:
+        """Общий префикс промптов пакета, если его нужно отправить отдельно."""
+        if not self.shared_prefix:
+            return None
 
-        response = requests.post(
-            self.base_url, headers=self.headers, data=json.dumps(data)
+        prefix = batch[0].get("prefix")
+        if not prefix or any(item.get("prefix") != prefix for item in batch[1:]):
+            return None
+        return prefix
+
+    def _iter_batch_items(
+        self,
+        generator: PromptGenerator,
+        skip_indices: Optional[Container[int]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Выдает элементы пакетов с их позицией в потоке промптов.
+
+        Args:
+            generator: Генератор промптов
+            skip_indices: Индексы уже обработанных промптов, которые пропускаются
+        """
+        position = 0
+
+        for item in generator.iter_items(skip_indices):
+            batch_item = self._make_batch_item(item)
+            batch_item["position"] = position
+            position += 1
+            yield batch_item
+
+    def _iter_batches(
+        self,
+        generator: PromptGenerator,
+        skip_indices: Optional[Container[int]] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Формирует пакеты из потока промптов с помощью планировщика."""
+        return self.scheduler.schedule(
+            self._iter_batch_items(generator, skip_indices), self._current_batch_size
         )
 
-        response.raise_for_status()
-        results = response.json()
+    def _current_batch_size(self) -> int:
+        if self.batch_sizer is not None:
+            return self.batch_sizer.current_size
+        return self.batch_size
 
-        return results
+    def _load_checkpoint(
+        self, checkpoint: Optional[JsonlCheckpoint]
+    ) -> Dict[int, Dict[str, Any]]:
+        if checkpoint is None:
+            return {}
+
+        completed = checkpoint.load()
+        self.resumed_count = len(completed)
+        if completed:
+            print(
+                f"Восстановлено {len(completed)} результатов из контрольной точки {checkpoint.path}"
+            )
+        return completed
+
+    @staticmethod
+    def _merge_results(
+        completed: Dict[int, Dict[str, Any]], results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        if not completed:
+            return results
+
+        merged = list(completed.values()) + results
+        merged.sort(key=lambda result: result["index"])
+        return merged
+
+    def _run_batches(
+        self,
+        generator: PromptGenerator,
+        skip_indices: Container[int],
+        checkpoint: Optional[JsonlCheckpoint],
+        emit: Callable[[List[Dict[str, Any]]], None],
+    ) -> None:
+        """
+        Отправляет пакеты на сервер и передает результаты каждого пакета в emit.
+
+        Args:
+            generator: Генератор промптов
+            skip_indices: Индексы уже обработанных промптов
+            checkpoint: Контрольная точка для сохранения результатов пакетов
+            emit: Получатель результатов пакета
+        """
+        reorder_buffer = ResultReorderBuffer()
+
+        for batch_index, batch in enumerate(
+            self._iter_batches(generator, skip_indices), start=1
+        ):
+            batch_prompts = [item["prompt"] for item in batch]
+            self.submitted_count += len(batch)
+            batch_results = self._process_batch(batch, batch_prompts)
+            if checkpoint is not None:
+                checkpoint.append(batch_results)
+            print(f"Обработан пакет {batch_index}")
+
+            ready = reorder_buffer.add(batch, batch_results)
+            if ready:
+                emit(ready)
 
     def process_dataset(
         self,
         generator: PromptGenerator,
+        checkpoint: Optional[JsonlCheckpoint] = None,
     ) -> List[Dict[str, Any]]:
+        """
+        Обрабатывает все промпты генератора пакетами.
+
+        Args:
+            generator: Генератор промптов
+            checkpoint: Контрольная точка, в которую дописывается каждый
+                обработанный пакет; уже сохраненные в ней индексы пропускаются
+        """
+        completed = self._load_checkpoint(checkpoint)
         results = []
-        current_batch = []
-        batch_prompts = []
-        batch_index = 0
-
-        for item in generator:
-            prompt = item["prompt"]
-            current_batch.append(
-                {
-                    "index": item["index"],
-                    "prompt": prompt,
-                    "domain": item.get("domain", ""),
-                    "expected_output": item.get("output", ""),
-                }
-            )
-            batch_prompts.append(prompt)
 
-            if len(current_batch) >= self.batch_size:
-                batch_results = self._process_batch(current_batch, batch_prompts)
-                results.extend(batch_results)
+        self._run_batches(generator, completed, checkpoint, results.extend)
 
-                current_batch = []
-                batch_prompts = []
-                batch_index += 1
-                print(f"Обработан пакет {batch_index}")
-        if current_batch:
-            batch_results = self._process_batch(current_batch, batch_prompts)
-            results.extend(batch_results)
-            print(f"Обработан финальный пакет {batch_index + 1}")
+        return self._merge_results(completed, results)
 
-        return results
+    def iter_dataset(
+        self,
+        generator: PromptGenerator,
+        checkpoint: Optional[JsonlCheckpoint] = None,
+        queue_size: int = 4,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковый вариант process_dataset: выдает результаты по мере обработки пакетов.
+
+        Пакеты отправляются в фоновом потоке, готовые результаты передаются
+        через очередь на queue_size пакетов. Если потребитель не успевает,
+        отправка новых пакетов приостанавливается, поэтому в памяти находится
+        не более queue_size пакетов независимо от размера набора данных.
+        Результаты, восстановленные из контрольной точки, выдаются первыми.
+
+        Args:
+            generator: Генератор промптов
+            checkpoint: Контрольная точка (см. process_dataset)
+            queue_size: Максимальное количество готовых пакетов в очереди
+        """
+        completed = set()
+        if checkpoint is not None:
+            completed = checkpoint.load_indices()
+            self.resumed_count = len(completed)
+            if completed:
+                print(
+                    f"Восстановлено {len(completed)} результатов из контрольной точки {checkpoint.path}"
+                )
+                yield from checkpoint.iter_completed(completed)
+
+        results_queue = queue.Queue(maxsize=queue_size)
+        stop_event = threading.Event()
+        finished = object()
+
+        def emit(batch_results):
+            while not stop_event.is_set():
+                try:
+                    results_queue.put(batch_results, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            raise _ProductionStopped()
+
+        def produce():
+            try:
+                self._run_batches(generator, completed, checkpoint, emit)
+                outcome = finished
+            except _ProductionStopped:
+                return
+            except BaseException as e:
+                outcome = e
+            while not stop_event.is_set():
+                try:
+                    results_queue.put(outcome, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                batch_results = results_queue.get()
+                if batch_results is finished:
+                    break
+                if isinstance(batch_results, BaseException):
+                    raise batch_results
+                yield from batch_results
+        finally:
+            stop_event.set()
+            producer.join()
 
     def _process_batch(
         self,
         batch: List[Dict[str, Any]],
         batch_prompts: List[str],
     ) -> List[Dict[str, Any]]:
-        batch_responses = self.send_batch_request(batch_prompts)
+        batch_responses, miss_positions = self._lookup_cache(batch_prompts)
+        duplicate_of, keys = {}, {}
+        if miss_positions and self.deduplicator is not None:
+            miss_positions, duplicate_of, keys = self.deduplicator.lookup(
+                batch_prompts, batch_responses, miss_positions
+            )
+
+        if miss_positions:
+            server_responses = self._send_prompts(
+                [batch_prompts[i] for i in miss_positions], self._batch_prefix(batch)
+            )
+            self._store_responses(
+                batch_prompts, batch_responses, miss_positions, server_responses
+            )
+            if self.deduplicator is not None:
+                self.deduplicator.store(keys, batch_responses, miss_positions)
+
+        PromptDeduplicator.fan_out(batch_responses, duplicate_of)
+        return self._build_batch_results(batch, batch_responses)
+
+    def _send_prompts(
+        self, prompts: List[str], prefix: Optional[str] = None, depth: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Отправляет промпты пакета на сервер.
+
+        Если сервер отвечает ошибкой, которую могут вызывать отдельные промпты,
+        пакет рекурсивно делится пополам (не глубже max_bisect_depth):
+        исправные половины обрабатываются целиком, а ошибочные промпты
+        получают ответ с полем error.
+        """
+        try:
+            return self._send_adaptive(prompts, prefix)
+        except Exception as e:
+            if not self.isolate_failures or not is_item_failure(e):
+                raise
+            if len(prompts) == 1 or depth >= self.max_bisect_depth:
+                return [self._failed_response(e) for _ in prompts]
+
+            left, right = self._bisect(prompts, e)
+            return self._send_prompts(left, prefix, depth + 1) + self._send_prompts(
+                right, prefix, depth + 1
+            )
+
+    def _bisect(self, prompts: List[str], error: Exception) -> Tuple[List[str], List[str]]:
+        self.isolation_stats["bisections"] += 1
+        print(
+            f"Ошибка пакета из {len(prompts)} промптов ({error.__class__.__name__}), "
+            f"пакет разделен пополам"
+        )
+        middle = len(prompts) // 2
+        return prompts[:middle], prompts[middle:]
+
+    def _failed_response(self, error: Exception) -> Dict[str, Any]:
+        self.isolation_stats["failed_prompts"] += 1
+        return {"text": "", "error": f"{error.__class__.__name__}: {error}"}
+
+    def _send_adaptive(
+        self, prompts: List[str], prefix: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        При адаптивном подборе размера пакета замеряет задержку, а при ошибке
+        перегрузки уменьшает размер и повторяет отправку частями.
+        """
+        if self.batch_sizer is None:
+            return self.send_batch_request(prompts, prefix)
+
+        started = time.perf_counter()
+        try:
+            responses = self.send_batch_request(prompts, prefix)
+        except Exception as e:
+            if not is_overload_error(e) or not self.batch_sizer.record_failure(len(prompts), e):
+                raise
+            return self._resend_in_parts(prompts, e, prefix)
+
+        self.batch_sizer.record_success(len(prompts), time.perf_counter() - started)
+        return responses
+
+    def _split_for_resend(self, prompts: List[str], error: Exception) -> List[List[str]]:
+        size = max(1, min(self.batch_sizer.current_size, len(prompts) - 1))
+        print(
+            f"Ошибка пакета из {len(prompts)} промптов ({error.__class__.__name__}), "
+            f"размер пакета уменьшен до {size}"
+        )
+        return [prompts[start : start + size] for start in range(0, len(prompts), size)]
+
+    def _resend_in_parts(
+        self, prompts: List[str], error: Exception, prefix: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        responses = []
+        for part in self._split_for_resend(prompts, error):
+            responses.extend(self._send_prompts(part, prefix))
+        return responses
+
+    def _cache_server(self) -> str:
+        """Адрес сервера для ключа кэша (для пула реплик - адреса всех реплик)."""
+        if self.endpoint_pool is not None:
+            return ",".join(sorted(endpoint.url for endpoint in self.endpoint_pool.endpoints))
+        return self.base_url
+
+    def _cache_variant(self) -> str:
+        """
+        Режим запроса, влияющий на текст ответа: несколько ответов на промпт
+        или потоковая генерация, в которой ответ обрезается по маркерам остановки.
+        """
+        parts = []
+        if self.n_samples > 1:
+            parts.append(f"n={self.n_samples}")
+        if self._use_streaming():
+            parts.append(
+                "stop=" + json.dumps(self.early_stopper.stop_markers, ensure_ascii=False)
+            )
+        return ";".join(parts)
+
+    def _cache_key(self, prompt: str) -> str:
+        if self.scorer is not None:
+            return ResponseCache.make_key(
+                prompt,
+                self._cache_server(),
+                1,
+                self.temperature,
+                self.top_p,
+                variant=self.scorer.cache_variant,
+                model_id=self.model_id or "",
+            )
+        return ResponseCache.make_key(
+            prompt,
+            self._cache_server(),
+            self.max_tokens,
+            self.temperature,
+            self.top_p,
+            variant=self._cache_variant(),
+            model_id=self.model_id or "",
+        )
+
+    def _lookup_cache(
+        self,
+        batch_prompts: List[str],
+    ) -> Tuple[List[Optional[Dict[str, Any]]], List[int]]:
+        """
+        Ищет ответы пакета в кэше.
+
+        Returns:
+            Список ответов (None для промахов) и позиции промптов,
+            которые нужно отправить на сервер
+        """
+        if self.cache is None:
+            return [None] * len(batch_prompts), list(range(len(batch_prompts)))
+
+        keys = [self._cache_key(prompt) for prompt in batch_prompts]
+        cached = self.cache.get_many(keys)
+
+        batch_responses = [cached.get(key) for key in keys]
+        miss_positions = [i for i, response in enumerate(batch_responses) if response is None]
+        return batch_responses, miss_positions
+
+    def _store_responses(
+        self,
+        batch_prompts: List[str],
+        batch_responses: List[Optional[Dict[str, Any]]],
+        miss_positions: List[int],
+        server_responses: List[Dict[str, Any]],
+    ) -> None:
+        """
+        Раскладывает ответы сервера по позициям промахов и сохраняет их в кэш.
+
+        Ответы с ошибкой и ответы, генерация которых остановлена досрочно
+        (их текст зависит от парсера потоковой генерации), не кэшируются.
+        """
+        for position, response in zip(miss_positions, server_responses):
+            batch_responses[position] = response
+
+        if self.cache is not None:
+            self.cache.put_many(
+                (self._cache_key(batch_prompts[position]), response)
+                for position, response in zip(miss_positions, server_responses)
+                if not response.get("error") and not response.get("stopped_early")
+            )
+
+    def _build_batch_results(
+        self,
+        batch: List[Dict[str, Any]],
+        batch_responses: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
         results = []
 
         for item, response in zip(batch, batch_responses):
+            response = response or {}
             result = {
                 "index": item["index"],
                 "prompt": item["prompt"],
@@ -142,6 +746,49 @@ class BatchModelClient(ModelClient):
                 "model_output": response.get("text", ""),
                 "error": response.get("error", None),
             }
+            if self.scorer is not None and not result["error"]:
+                result.update(self.scorer.parse_response(response))
+            if self.n_samples > 1 and not result["error"]:
+                result["model_outputs"] = response.get("texts") or [result["model_output"]]
             results.append(result)
 
+        if self.quarantine is not None:
+            self.quarantine.append([result for result in results if result["error"]])
+
         return results
+
+    def get_run_info(self) -> Dict[str, Any]:
+        run_info = super().get_run_info()
+        run_info["batch_size"] = self._current_batch_size()
+        if self.batch_sizer is not None:
+            run_info["adaptive_batch_size"] = self.batch_sizer.get_stats()
+        if self.endpoint_pool is not None:
+            run_info["endpoints"] = self.endpoint_pool.get_stats()
+        if self.telemetry is not None:
+            run_info["telemetry"] = self.telemetry.summary()
+        run_info["resumed_results"] = self.resumed_count
+        scheduler_stats = self.scheduler.get_stats()
+        if scheduler_stats:
+            run_info["scheduler"] = scheduler_stats
+        if self.cache is not None:
+            run_info["cache"] = self.cache.get_stats()
+        if self.model_id is not None:
+            run_info["model_id"] = self.model_id
+        run_info["shared_prefix"] = self.shared_prefix
+        run_info["n_samples"] = self.n_samples
+        # Режимы, при которых часть промптов не отправляется или получает
+        # ответ с ошибкой вместо завершения прогона
+        run_info["dedup_enabled"] = self.deduplicator is not None
+        run_info["isolate_failures"] = self.isolate_failures
+        if self.isolate_failures:
+            run_info["failure_isolation"] = {
+                **self.isolation_stats,
+                "max_bisect_depth": self.max_bisect_depth,
+            }
+        if self.quarantine is not None:
+            run_info["quarantine"] = self.quarantine.get_stats()
+        if self.deduplicator is not None:
+            run_info["dedup"] = self.deduplicator.get_stats()
+        if self.scorer is not None:
+            run_info["scoring"] = {"mode": "logprobs", "choices": self.scorer.choices}
+        return run_info
@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, List, Optional
+
+from ..prompts import PromptGenerator
+from .async_model_client import AsyncBatchModelClient
+from .checkpoint import JsonlCheckpoint
+from .telemetry import percentile
+
+
+class _Task:
+    def __init__(
+        self,
+        name: str,
+        client: AsyncBatchModelClient,
+        generator: PromptGenerator,
+        weight: float,
+        checkpoint: Optional[JsonlCheckpoint],
+    ):
+        self.name = name
+        self.client = client
+        self.generator = generator
+        self.weight = weight
+        self.checkpoint = checkpoint
+        self.finish_tags = {}
+        self.requests = 0
+        self.prompts = 0
+        self.queue_times = []
+        self.elapsed = 0.0
+
+
+class _EndpointSlots:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.virtual_time = 0.0
+        self.waiters = []
+
+    def grant(self, start_tag: float) -> None:
+        self.virtual_time = start_tag
+        self.in_flight += 1
+        self.requests += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+
+class FairTaskScheduler:
+    """
+    Совместный прогон нескольких наборов данных на одном сервере.
+
+    Каждая задача - свой асинхронный клиент (со своими max_tokens, парсером
+    и т.п.) и генератор промптов; все задачи работают в одном цикле событий.
+    Запросы всех задач к одному эндпоинту проходят через общий лимит
+    max_in_flight_per_endpoint, а освободившееся место отдается запросу
+    с наименьшей меткой окончания взвешенной справедливой очереди (WFQ):
+    стоимость запроса - количество промптов, умноженное на max_tokens
+    клиента, деленное на вес задачи. Поэтому задача с длинными генерациями
+    не вытесняет задачу с короткими, а каждая получает долю сервера,
+    пропорциональную весу.
+    """
+
+    def __init__(self, max_in_flight_per_endpoint: int = 4):
+        """
+        Args:
+            max_in_flight_per_endpoint: Максимальное количество запросов всех
+                задач, одновременно обрабатываемых одним эндпоинтом
+        """
+        if max_in_flight_per_endpoint < 1:
+            raise ValueError(
+                "Количество запросов в обработке (max_in_flight_per_endpoint) "
+                "должно быть не менее 1"
+            )
+
+        self.max_in_flight_per_endpoint = max_in_flight_per_endpoint
+        self.tasks = {}
+        self.endpoints = {}
+        self._sequence = itertools.count()
+
+    def add_task(
+        self,
+        name: str,
+        client: AsyncBatchModelClient,
+        generator: PromptGenerator,
+        weight: float = 1.0,
+        checkpoint: Optional[JsonlCheckpoint] = None,
+    ) -> None:
+        """
+        Добавляет задачу.
+
+        Args:
+            name: Имя задачи (ключ результатов и статистики)
+            client: Клиент задачи; его запросы начинают проходить через планировщик
+            generator: Генератор промптов задачи
+            weight: Вес задачи - доля сервера относительно других задач
+            checkpoint: Контрольная точка задачи
+        """
+        if name in self.tasks:
+            raise ValueError(f"Задача {name} уже добавлена")
+        if weight <= 0:
+            raise ValueError("Вес задачи (weight) должен быть больше 0")
+        if not isinstance(client, AsyncBatchModelClient):
+            raise ValueError("Планировщик задач работает только с AsyncBatchModelClient")
+
+        self.tasks[name] = _Task(name, client, generator, weight, checkpoint)
+        client.request_gate = lambda url, n_prompts: self.slot(name, url, n_prompts)
+
+    @asynccontextmanager
+    async def slot(self, name: str, url: str, n_prompts: int) -> AsyncIterator[None]:
+        """Ожидает места для запроса задачи к эндпоинту url и занимает его на время запроса."""
+        task = self.tasks[name]
+        endpoint = self.endpoints.get(url)
+        if endpoint is None:
+            endpoint = self.endpoints[url] = _EndpointSlots(self.max_in_flight_per_endpoint)
+
+        cost = n_prompts * max(1, task.client.max_tokens) / task.weight
+        start_tag = max(endpoint.virtual_time, task.finish_tags.get(url, 0.0))
+        finish_tag = start_tag + cost
+        task.finish_tags[url] = finish_tag
+        queued_at = time.perf_counter()
+
+        if endpoint.in_flight < endpoint.limit and not endpoint.waiters:
+            endpoint.grant(start_tag)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(
+                endpoint.waiters, (finish_tag, next(self._sequence), start_tag, future)
+            )
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release(endpoint)
+                raise
+
+        task.queue_times.append(time.perf_counter() - queued_at)
+        task.requests += 1
+        task.prompts += n_prompts
+        try:
+            yield
+        finally:
+            self._release(endpoint)
+
+    @staticmethod
+    def _release(endpoint: _EndpointSlots) -> None:
+        endpoint.in_flight -= 1
+        while endpoint.waiters and endpoint.in_flight < endpoint.limit:
+            _, _, start_tag, future = heapq.heappop(endpoint.waiters)
+            if future.cancelled():
+                continue
+            endpoint.grant(start_tag)
+            future.set_result(None)
+
+    async def _run_task(self, task: _Task) -> List[Dict[str, Any]]:
+        completed = task.client._load_checkpoint(task.checkpoint)
+        results = []
+
+        started = time.perf_counter()
+        await task.client._run_batches_async(
+            task.generator, completed, task.checkpoint, results.extend
+        )
+        task.elapsed = time.perf_counter() - started
+
+        return task.client._merge_results(completed, results)
+
+    async def _run_async(self) -> Dict[str, List[Dict[str, Any]]]:
+        tasks = list(self.tasks.values())
+        results = await asyncio.gather(*(self._run_task(task) for task in tasks))
+        return {task.name: task_results for task, task_results in zip(tasks, results)}
+
+    def run(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Обрабатывает все задачи одновременно.
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: Результаты каждой задачи в формате
+                BatchModelClient.process_dataset
+        """
+        if not self.tasks:
+            raise ValueError("Не добавлено ни одной задачи")
+        return asyncio.run(self._run_async())
+
+    def get_stats(self) -> Dict[str, Any]:
+        tasks = {}
+        for task in self.tasks.values():
+            tasks[task.name] = {
+                "weight": task.weight,
+                "requests": task.requests,
+                "prompts": task.prompts,
+                "elapsed": task.elapsed,
+                "prompts_per_second": task.prompts / task.elapsed if task.elapsed > 0 else 0.0,
+                "queue_delay_mean": sum(task.queue_times) / len(task.queue_times)
+                if task.queue_times
+                else 0.0,
+                "queue_delay_p50": percentile(task.queue_times, 50),
+                "queue_delay_p95": percentile(task.queue_times, 95),
+                "queue_delay_max": max(task.queue_times, default=0.0),
+            }
+
+        endpoints = {
+            url: {
+                "requests": endpoint.requests,
+                "limit": endpoint.limit,
+                "max_in_flight": endpoint.max_in_flight,
+            }
+            for url, endpoint in self.endpoints.items()
+        }
+        return {"tasks": tasks, "endpoints": endpoints}
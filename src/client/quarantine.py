@@ -0,0 +1,49 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, List
+
+
+class QuarantineFile:
+    """
+    Файл карантина для промптов, на которых сервер стабильно завершается ошибкой.
+
+    Каждый такой промпт записывается в JSONL вместе с индексом, доменом и
+    текстом ошибки, чтобы его можно было разобрать отдельно от основного прогона.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Путь к файлу карантина (дописывается)
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def append(self, results: List[Dict[str, Any]]) -> None:
+        """Записывает результаты с ошибкой."""
+        if not results:
+            return
+
+        timestamp = time.time()
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for result in results:
+                    record = {
+                        "index": result["index"],
+                        "domain": result.get("domain", ""),
+                        "prompt": result["prompt"],
+                        "error": result["error"],
+                        "timestamp": timestamp,
+                    }
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.count += len(results)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "quarantined": self.count}
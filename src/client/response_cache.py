@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, Iterable, List
+
+import xxhash
+
+
+class ResponseCache:
+    """
+    Дисковый кэш ответов модели с адресацией по содержимому запроса.
+
+    Ключ - xxhash от промпта, адреса сервера, идентификатора модели и
+    параметров сэмплирования, поэтому ответы разных серверов и разных
+    чекпоинтов модели не смешиваются. Записи
+    хранятся в SQLite; при превышении max_entries вытесняются давно не
+    использовавшиеся записи (LRU).
+    """
+
+    def __init__(self, path: str, max_entries: int = 1_000_000):
+        """
+        Args:
+            path: Путь к файлу кэша
+            max_entries: Максимальное количество хранимых ответов
+        """
+        if max_entries < 1:
+            raise ValueError("Размер кэша (max_entries) должен быть не менее 1")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, last_access INTEGER NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._connection.commit()
+
+        row = self._connection.execute("SELECT MAX(last_access) FROM responses").fetchone()
+        self._clock = row[0] or 0
+
+    @staticmethod
+    def make_key(
+        prompt: str,
+        server: str,
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        variant: str = "",
+        model_id: str = "",
+    ) -> str:
+        """
+        Args:
+            prompt: Промпт
+            server: Полный адрес сервера (схема, хост, порт и эндпоинт)
+            max_tokens, temperature, top_p: Параметры генерации
+            variant: Режим запроса, влияющий на ответ (оценка по логарифмам
+                вероятностей, несколько ответов и т.п.)
+            model_id: Идентификатор модели (чекпоинта), заданный пользователем
+        """
+        key_fields = [server, model_id, prompt, max_tokens, temperature, top_p]
+        if variant:
+            key_fields.append(variant)
+        payload = json.dumps(key_fields, ensure_ascii=False)
+        return xxhash.xxh3_128_hexdigest(payload.encode("utf-8"))
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Возвращает найденные в кэше ответы и обновляет их время использования."""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+
+        with self._lock:
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT key, response FROM responses WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, response in rows:
+                    found[key] = json.loads(response)
+
+            if found:
+                access = self._tick()
+                self._connection.executemany(
+                    "UPDATE responses SET last_access = ? WHERE key = ?",
+                    [(access, key) for key in found],
+                )
+                self._connection.commit()
+
+            hit_count = sum(1 for key in keys if key in found)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+
+        return found
+
+    def put_many(self, items: Iterable[tuple]) -> None:
+        """Сохраняет пары (ключ, ответ) и вытесняет лишние записи."""
+        with self._lock:
+            access = self._tick()
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO responses (key, response, last_access) VALUES (?, ?, ?)",
+                [
+                    (key, json.dumps(response, ensure_ascii=False), access)
+                    for key, response in items
+                ],
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,222 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional
+
+
+class BatchScheduler(ABC):
+    """Абстрактный класс планировщика, формирующего пакеты из потока промптов."""
+
+    @abstractmethod
+    def schedule(
+        self, items: Iterable[Dict[str, Any]], batch_size: Callable[[], int]
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Args:
+            items: Поток элементов пакетов
+            batch_size: Функция, возвращающая текущий размер пакета
+                (при адаптивном подборе он меняется во время работы)
+        """
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class SequentialScheduler(BatchScheduler):
+    """Формирует пакеты в порядке следования промптов в файле."""
+
+    def schedule(
+        self, items: Iterable[Dict[str, Any]], batch_size: Callable[[], int]
+    ) -> Iterator[List[Dict[str, Any]]]:
+        current_batch = []
+
+        for item in items:
+            current_batch.append(item)
+
+            if len(current_batch) >= batch_size():
+                yield current_batch
+                current_batch = []
+
+        if current_batch:
+            yield current_batch
+
+
+class LengthBucketScheduler(BatchScheduler):
+    """
+    Группирует промпты похожей длины в пределах окна просмотра.
+
+    Сервер дополняет все промпты пакета до самого длинного, поэтому пакеты из
+    промптов близкой длины тратят меньше вычислений на паддинг. Окно из
+    lookahead промптов сортируется по оценке длины и нарезается на пакеты;
+    исходный порядок результатов восстанавливает клиент.
+    """
+
+    def __init__(
+        self,
+        lookahead: int = 2048,
+        length_fn: Callable[[str], int] = len,
+    ):
+        """
+        Args:
+            lookahead: Размер окна просмотра (в промптах)
+            length_fn: Оценка длины промпта (по умолчанию - число символов)
+        """
+        if lookahead < 1:
+            raise ValueError("Размер окна просмотра (lookahead) должен быть не менее 1")
+        self.lookahead = lookahead
+        self.length_fn = length_fn
+
+        self.total_length = 0
+        self.padding_before = 0
+        self.padding_after = 0
+
+    @staticmethod
+    def _padding(lengths: List[int], batch_size: int) -> int:
+        padding = 0
+        for start in range(0, len(lengths), batch_size):
+            chunk = lengths[start : start + batch_size]
+            padding += max(chunk) * len(chunk) - sum(chunk)
+        return padding
+
+    def _schedule_window(
+        self, window: List[Dict[str, Any]], batch_size: int
+    ) -> Iterator[List[Dict[str, Any]]]:
+        lengths = [self.length_fn(item["prompt"]) for item in window]
+        order = sorted(range(len(window)), key=lengths.__getitem__)
+
+        self.total_length += sum(lengths)
+        self.padding_before += self._padding(lengths, batch_size)
+        self.padding_after += self._padding([lengths[i] for i in order], batch_size)
+
+        for start in range(0, len(order), batch_size):
+            yield [window[i] for i in order[start : start + batch_size]]
+
+    def schedule(
+        self, items: Iterable[Dict[str, Any]], batch_size: Callable[[], int]
+    ) -> Iterator[List[Dict[str, Any]]]:
+        window = []
+
+        for item in items:
+            window.append(item)
+
+            size = batch_size()
+            window_size = max(self.lookahead, size)
+            if len(window) >= window_size - window_size % size:
+                yield from self._schedule_window(window, size)
+                window = []
+
+        if window:
+            yield from self._schedule_window(window, batch_size())
+
+    def get_stats(self) -> Dict[str, Any]:
+        def ratio(padding):
+            padded_total = self.total_length + padding
+            return padding / padded_total if padded_total > 0 else 0.0
+
+        return {
+            "lookahead": self.lookahead,
+            "total_length": self.total_length,
+            "padding_before": self.padding_before,
+            "padding_after": self.padding_after,
+            "padding_ratio_before": ratio(self.padding_before),
+            "padding_ratio_after": ratio(self.padding_after),
+        }
+
+
+class PrefixGroupScheduler(BatchScheduler):
+    """
+    Группирует промпты с общим префиксом (few-shot примерами) в пределах окна просмотра.
+
+    Пакет из промптов с одним префиксом отправляется в формате
+    {"prefix", "suffixes"}, а подряд идущие пакеты с тем же префиксом позволяют
+    серверу с кэшированием префиксов повторно использовать KV-кэш. Промпты без
+    префикса образуют отдельную группу.
+    """
+
+    def __init__(
+        self,
+        lookahead: int = 2048,
+        length_fn: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Args:
+            lookahead: Размер окна просмотра (в промптах)
+            length_fn: Если задана, промпты внутри группы дополнительно
+                сортируются по этой оценке длины (см. LengthBucketScheduler)
+        """
+        if lookahead < 1:
+            raise ValueError("Размер окна просмотра (lookahead) должен быть не менее 1")
+        self.lookahead = lookahead
+        self.length_fn = length_fn
+
+        self.batches = 0
+        self.prefix_switches = 0
+        self._last_prefix = None
+
+    def _schedule_window(
+        self, window: List[Dict[str, Any]], batch_size: int
+    ) -> Iterator[List[Dict[str, Any]]]:
+        groups = {}
+        for item in window:
+            groups.setdefault(item.get("prefix"), []).append(item)
+
+        for prefix, group in groups.items():
+            if self.length_fn is not None:
+                group.sort(key=lambda item: self.length_fn(item["prompt"]))
+            if prefix != self._last_prefix:
+                self.prefix_switches += 1
+                self._last_prefix = prefix
+
+            for start in range(0, len(group), batch_size):
+                self.batches += 1
+                yield group[start : start + batch_size]
+
+    def schedule(
+        self, items: Iterable[Dict[str, Any]], batch_size: Callable[[], int]
+    ) -> Iterator[List[Dict[str, Any]]]:
+        window = []
+
+        for item in items:
+            window.append(item)
+
+            if len(window) >= max(self.lookahead, batch_size()):
+                yield from self._schedule_window(window, batch_size())
+                window = []
+
+        if window:
+            yield from self._schedule_window(window, batch_size())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "lookahead": self.lookahead,
+            "batches": self.batches,
+            "prefix_switches": self.prefix_switches,
+        }
+
+
+class ResultReorderBuffer:
+    """
+    Восстанавливает исходный порядок результатов.
+
+    Каждый элемент пакета несет свою позицию в потоке промптов; результаты
+    придерживаются, пока не будут получены все предыдущие позиции.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.next_position = 0
+
+    def add(
+        self,
+        batch: List[Dict[str, Any]],
+        batch_results: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Принимает результаты пакета и возвращает результаты, готовые к выдаче."""
+        for item, result in zip(batch, batch_results):
+            self.pending[item["position"]] = result
+
+        ready = []
+        while self.next_position in self.pending:
+            ready.append(self.pending.pop(self.next_position))
+            self.next_position += 1
+
+        return ready
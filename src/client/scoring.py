@@ -0,0 +1,76 @@
+import math
+from typing import Dict, Any
+
+
+class LetterScorer:
+    """
+    Режим оценки вариантов ответа по логарифмам вероятностей следующего токена.
+
+    Вместо генерации нескольких токенов и разбора ответа регулярными
+    выражениями сервер выполняет один прямой проход и возвращает
+    логарифмы вероятностей следующего токена, ограниченные буквами вариантов
+    ответа. Ответом модели считается вариант с максимальной вероятностью,
+    а нормированные вероятности всех вариантов сохраняются для анализа
+    калибровки.
+
+    Протокол: в запрос добавляются поля choices (список букв) и
+    return_logprobs; сервер отвечает полем logprobs - словарем
+    {буква: логарифм вероятности}.
+    """
+
+    def __init__(self, choices: str = "ABCDEFGHIJ", answer_prefix: str = ""):
+        """
+        Args:
+            choices: Допустимые буквы вариантов ответа
+            answer_prefix: Строка, добавляемая в конец промпта, чтобы буква
+                ответа была естественным следующим токеном (например, "\\n(")
+        """
+        if not choices:
+            raise ValueError("Необходимо указать хотя бы один вариант ответа")
+        self.choices = choices
+        self.answer_prefix = answer_prefix
+
+    @property
+    def cache_variant(self) -> str:
+        return f"logprobs:{self.choices}:{self.answer_prefix}"
+
+    def prepare_prompt(self, prompt: str) -> str:
+        return prompt + self.answer_prefix
+
+    def payload_fields(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": 1,
+            "choices": list(self.choices),
+            "return_logprobs": True,
+        }
+
+    def option_probabilities(self, logprobs: Dict[str, float]) -> Dict[str, float]:
+        """Нормирует вероятности по допустимым вариантам (softmax)."""
+        scores = {
+            letter: logprobs[letter]
+            for letter in self.choices
+            if logprobs.get(letter) is not None
+        }
+        if not scores:
+            return {}
+
+        max_score = max(scores.values())
+        exp_scores = {letter: math.exp(score - max_score) for letter, score in scores.items()}
+        total = sum(exp_scores.values())
+        return {letter: value / total for letter, value in exp_scores.items()}
+
+    def parse_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Извлекает ответ модели из ответа сервера.
+
+        Returns:
+            Dict[str, Any]: model_output (буква) и option_probs (вероятности вариантов)
+        """
+        option_probs = self.option_probabilities(response.get("logprobs") or {})
+
+        if option_probs:
+            letter = max(option_probs, key=option_probs.get)
+        else:
+            letter = response.get("letter", "")
+
+        return {"model_output": letter, "option_probs": option_probs}
@@ -0,0 +1,114 @@
+from typing import Dict, Any, List, Optional, Sequence
+
+from ..evaluation.parsers import ResponseParser
+
+
+DEFAULT_STOP_MARKERS = ("<model>", "<client>")
+
+
+class EarlyStopper:
+    """
+    Условие досрочной остановки потоковой генерации.
+
+    Генерация ответа прекращается, как только в нем появляется маркер смены
+    реплики (модель начинает сочинять следующий ход диалога few-shot промпта)
+    или парсер уверенно извлекает ответ из уже полученного текста.
+    """
+
+    def __init__(
+        self,
+        parser: Optional[ResponseParser] = None,
+        stop_markers: Sequence[str] = DEFAULT_STOP_MARKERS,
+    ):
+        """
+        Args:
+            parser: Парсер ответов, по частичному ответу которого определяется
+                готовность ответа (см. ResponseParser.parse_partial)
+            stop_markers: Маркеры, на которых ответ обрезается
+        """
+        self.parser = parser
+        self.stop_markers = tuple(marker for marker in stop_markers if marker)
+
+    def check(self, text: str) -> Optional[str]:
+        """
+        Проверяет частичный ответ.
+
+        Returns:
+            Optional[str]: Окончательный текст ответа (обрезанный по маркеру),
+                если генерацию можно остановить, иначе None
+        """
+        cut = min(
+            (position for position in map(text.find, self.stop_markers) if position >= 0),
+            default=None,
+        )
+        if cut is not None:
+            return text[:cut]
+
+        if self.parser is not None and self.parser.parse_partial(text) is not None:
+            return text
+
+        return None
+
+
+class StreamAccumulator:
+    """
+    Собирает ответы пакета из событий потоковой генерации.
+
+    Событие содержит позицию промпта в пакете (index), очередной фрагмент
+    текста (text) и, в последнем событии промпта, признак finished и usage.
+    """
+
+    def __init__(self, n_prompts: int, early_stopper: EarlyStopper):
+        self.early_stopper = early_stopper
+        self.texts = [""] * n_prompts
+        self.final_texts = [None] * n_prompts
+        self.usage = [None] * n_prompts
+        self.stopped = [False] * n_prompts
+        self.remaining = n_prompts
+        self.stopped_early = 0
+
+    def add(self, event: Dict[str, Any]) -> bool:
+        """
+        Учитывает событие потока.
+
+        Returns:
+            bool: True, если ответы всех промптов готовы и поток можно закрыть
+        """
+        index = event.get("index", 0)
+        if self.final_texts[index] is not None:
+            return self.remaining == 0
+
+        self.texts[index] += event.get("text", "")
+        if event.get("usage"):
+            self.usage[index] = event["usage"]
+
+        final_text = self.early_stopper.check(self.texts[index])
+        if final_text is not None:
+            if not event.get("finished"):
+                self.stopped_early += 1
+                self.stopped[index] = True
+        elif event.get("finished"):
+            final_text = self.texts[index]
+
+        if final_text is not None:
+            self.final_texts[index] = final_text
+            self.remaining -= 1
+
+        return self.remaining == 0
+
+    def responses(self) -> List[Dict[str, Any]]:
+        """
+        Ответы пакета; ответы, генерация которых остановлена досрочно,
+        помечаются полем stopped_early (они не сохраняются в кэш ответов).
+        """
+        responses = []
+        for text, final_text, usage, stopped in zip(
+            self.texts, self.final_texts, self.usage, self.stopped
+        ):
+            response = {"text": text if final_text is None else final_text}
+            if usage is not None:
+                response["usage"] = usage
+            if stopped:
+                response["stopped_early"] = True
+            responses.append(response)
+        return responses
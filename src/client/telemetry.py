@@ -0,0 +1,271 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+class ClientTelemetry:
+    """
+    Телеметрия пакетных запросов клиента.
+
+    Для каждого пакета учитывает время выполнения, объем запроса и ответа,
+    пропускную способность и (если сервер их возвращает) количество токенов.
+    События пишутся построчно в JSONL, агрегаты - в текстовый файл в формате
+    Prometheus (для textfile-коллектора node_exporter).
+    """
+
+    def __init__(
+        self,
+        events_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        prometheus_interval: float = 15.0,
+    ):
+        """
+        Args:
+            events_path: Путь к JSONL-файлу событий
+            prometheus_path: Путь к текстовому файлу метрик Prometheus
+            prometheus_interval: Период обновления файла метрик (в секундах)
+        """
+        self.events_path = events_path
+        self.prometheus_path = prometheus_path
+        self.prometheus_interval = prometheus_interval
+
+        for path in (events_path, prometheus_path):
+            if path and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._events_file = open(events_path, "a", encoding="utf-8") if events_path else None
+        self._last_prometheus_write = 0.0
+
+        self.batches = 0
+        self.failed_batches = 0
+        self.prompts = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.raw_request_bytes = 0
+        self.encode_time = 0.0
+        self.decode_time = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.has_token_counts = False
+        self.latencies = []
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.first_started_at = None
+        self.last_finished_at = None
+
+    @staticmethod
+    def count_tokens(responses: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+        """Суммирует счетчики токенов из поля usage ответов, если сервер их вернул."""
+        prompt_tokens = 0
+        completion_tokens = 0
+        found = False
+
+        for response in responses:
+            usage = response.get("usage") if isinstance(response, dict) else None
+            if not usage:
+                continue
+            found = True
+            prompt_tokens += usage.get("prompt_tokens", 0)
+            completion_tokens += usage.get("completion_tokens", 0)
+
+        if not found:
+            return None
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+    def record_batch(
+        self,
+        size: int,
+        started_at: float,
+        finished_at: float,
+        request_bytes: int = 0,
+        response_bytes: int = 0,
+        raw_request_bytes: int = 0,
+        encode_time: float = 0.0,
+        decode_time: float = 0.0,
+        tokens: Optional[Dict[str, int]] = None,
+        error: Optional[BaseException] = None,
+        **extra: Any,
+    ) -> None:
+        """
+        Учитывает пакетный запрос.
+
+        Args:
+            size: Количество промптов в пакете
+            started_at: Время начала запроса (time.time())
+            finished_at: Время завершения запроса (time.time())
+            request_bytes: Размер тела запроса (после сжатия)
+            response_bytes: Размер тела ответа
+            raw_request_bytes: Размер тела запроса до сжатия
+            encode_time: Время сериализации и сжатия тела запроса
+            decode_time: Время разбора тела ответа
+            tokens: Количество токенов промптов и ответов
+            error: Ошибка запроса
+            **extra: Дополнительные поля события
+        """
+        wall_time = finished_at - started_at
+        event = {
+            "event": "batch",
+            "timestamp": finished_at,
+            "size": size,
+            "wall_time": wall_time,
+            "prompts_per_second": size / wall_time if wall_time > 0 else 0.0,
+            "request_bytes": request_bytes,
+            "response_bytes": response_bytes,
+            "raw_request_bytes": raw_request_bytes,
+            "encode_time": encode_time,
+            "decode_time": decode_time,
+            **extra,
+        }
+        if tokens is not None:
+            event.update(tokens)
+            total_tokens = tokens["prompt_tokens"] + tokens["completion_tokens"]
+            event["tokens_per_second"] = total_tokens / wall_time if wall_time > 0 else 0.0
+        if error is not None:
+            event["error"] = f"{error.__class__.__name__}: {error}"
+
+        with self._lock:
+            if self.first_started_at is None or started_at < self.first_started_at:
+                self.first_started_at = started_at
+            if self.last_finished_at is None or finished_at > self.last_finished_at:
+                self.last_finished_at = finished_at
+
+            self.request_bytes += request_bytes
+            self.response_bytes += response_bytes
+            self.raw_request_bytes += raw_request_bytes
+            self.encode_time += encode_time
+            self.decode_time += decode_time
+
+            if error is not None:
+                self.failed_batches += 1
+            else:
+                self.batches += 1
+                self.prompts += size
+                self.latencies.append(wall_time)
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    if wall_time <= bound:
+                        self.bucket_counts[i] += 1
+                if tokens is not None:
+                    self.has_token_counts = True
+                    self.prompt_tokens += tokens["prompt_tokens"]
+                    self.completion_tokens += tokens["completion_tokens"]
+
+            if self._events_file is not None:
+                self._events_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+                self._events_file.flush()
+
+            write_prometheus = (
+                self.prometheus_path is not None
+                and finished_at - self._last_prometheus_write >= self.prometheus_interval
+            )
+
+        if write_prometheus:
+            self.write_prometheus()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = 0.0
+            if self.first_started_at is not None:
+                elapsed = self.last_finished_at - self.first_started_at
+
+            summary = {
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "prompts": self.prompts,
+                "elapsed": elapsed,
+                "prompts_per_second": self.prompts / elapsed if elapsed > 0 else 0.0,
+                "request_bytes": self.request_bytes,
+                "response_bytes": self.response_bytes,
+                "raw_request_bytes": self.raw_request_bytes,
+                "compression_ratio": self.raw_request_bytes / self.request_bytes
+                if self.request_bytes > 0
+                else 1.0,
+                "encode_time": self.encode_time,
+                "decode_time": self.decode_time,
+                "latency_mean": sum(self.latencies) / len(self.latencies)
+                if self.latencies
+                else 0.0,
+                "latency_p50": percentile(self.latencies, 50),
+                "latency_p95": percentile(self.latencies, 95),
+                "latency_p99": percentile(self.latencies, 99),
+                "latency_histogram": {
+                    str(bound): count
+                    for bound, count in zip(LATENCY_BUCKETS, self.bucket_counts)
+                },
+            }
+            if self.has_token_counts:
+                total_tokens = self.prompt_tokens + self.completion_tokens
+                summary["prompt_tokens"] = self.prompt_tokens
+                summary["completion_tokens"] = self.completion_tokens
+                summary["tokens_per_second"] = total_tokens / elapsed if elapsed > 0 else 0.0
+
+        return summary
+
+    def _prometheus_lines(self) -> List[str]:
+        summary = self.summary()
+        lines = []
+
+        def counter(name, help_text, value):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+
+        counter("model_client_batches_total", "Successful batch requests", summary["batches"])
+        counter(
+            "model_client_failed_batches_total", "Failed batch requests", summary["failed_batches"]
+        )
+        counter("model_client_prompts_total", "Prompts processed", summary["prompts"])
+        counter("model_client_request_bytes_total", "Request bytes sent", summary["request_bytes"])
+        counter(
+            "model_client_response_bytes_total", "Response bytes received", summary["response_bytes"]
+        )
+        if self.has_token_counts:
+            counter("model_client_prompt_tokens_total", "Prompt tokens", summary["prompt_tokens"])
+            counter(
+                "model_client_completion_tokens_total",
+                "Completion tokens",
+                summary["completion_tokens"],
+            )
+
+        name = "model_client_batch_latency_seconds"
+        lines.append(f"# HELP {name} Batch request wall time")
+        lines.append(f"# TYPE {name} histogram")
+        with self._lock:
+            for bound, count in zip(LATENCY_BUCKETS, self.bucket_counts):
+                lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {len(self.latencies)}')
+            lines.append(f"{name}_sum {sum(self.latencies)}")
+            lines.append(f"{name}_count {len(self.latencies)}")
+
+        return lines
+
+    def write_prometheus(self) -> None:
+        """Атомарно перезаписывает файл метрик Prometheus."""
+        if self.prometheus_path is None:
+            return
+
+        tmp_path = f"{self.prometheus_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(self._prometheus_lines()) + "\n")
+        os.replace(tmp_path, self.prometheus_path)
+        self._last_prometheus_write = time.time()
+
+    def close(self) -> None:
+        self.write_prometheus()
+        with self._lock:
+            if self._events_file is not None:
+                self._events_file.close()
+                self._events_file = None
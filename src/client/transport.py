@@ -0,0 +1,411 @@
+import asyncio
+import json
+import random
+import time
+from typing import AsyncIterator, Dict, Any, Iterator, Optional
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from .codecs import PayloadCodec
+
+
+SSE_DONE = "[DONE]"
+
+
+def parse_sse_line(line: str) -> Optional[Any]:
+    """
+    Разбирает строку потока Server-Sent Events.
+
+    Returns:
+        Данные события (JSON), SSE_DONE в конце потока или None для
+        служебных и пустых строк
+    """
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:") :].strip()
+    if data == SSE_DONE:
+        return SSE_DONE
+    return json.loads(data)
+
+
+class RetryPolicy:
+    """
+    Политика повторных попыток: повторяются ответы 5xx и ошибки соединения,
+    пауза между попытками растет экспоненциально со случайным разбросом (full jitter).
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+    ):
+        if max_retries < 0:
+            raise ValueError("Количество повторов (max_retries) не может быть отрицательным")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    @staticmethod
+    def is_retryable_status(status: int) -> bool:
+        return status >= 500
+
+    def get_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """
+    Проверяет, что ошибка запроса вызвана перегрузкой сервера: слишком большой
+    запрос (413), ошибка сервера (5xx) или истекший таймаут.
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+    elif isinstance(error, aiohttp.ClientResponseError):
+        status = error.status
+    else:
+        return is_timeout_error(error)
+
+    return status == 413 or status >= 500
+
+
+def is_timeout_error(error: BaseException) -> bool:
+    return isinstance(error, (requests.Timeout, asyncio.TimeoutError))
+
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    """
+    Проверяет, что ошибка указывает на неисправность реплики сервера:
+    ошибка соединения, таймаут или ошибка сервера (5xx).
+    """
+    if isinstance(error, (requests.ConnectionError, aiohttp.ClientConnectionError)):
+        return True
+    return is_overload_error(error) and not is_request_too_large(error)
+
+
+def is_item_failure(error: BaseException) -> bool:
+    """
+    Проверяет, что ошибка может быть вызвана содержимым отдельных промптов
+    пакета: некорректный запрос (400, 413, 422) или внутренняя ошибка сервера
+    (500), которая транспортом выбрасывается только после исчерпания повторных
+    попыток. Остальные ответы 5xx (502, 503, 504) и 408, 429 относятся
+    к нагрузке и доступности сервера, а не к содержимому.
+    """
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+    elif isinstance(error, aiohttp.ClientResponseError):
+        status = error.status
+    else:
+        return False
+
+    return status in (400, 413, 422, 500)
+
+
+def is_request_too_large(error: BaseException) -> bool:
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 413
+    return isinstance(error, aiohttp.ClientResponseError) and error.status == 413
+
+
+class HttpTransport:
+    """
+    Транспорт поверх requests.Session: пул keep-alive соединений, таймауты
+    на подключение и чтение, повторные попытки согласно RetryPolicy.
+    """
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 300.0,
+        retry_policy: Optional[RetryPolicy] = None,
+        pool_size: int = 10,
+        codec: Optional[PayloadCodec] = None,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.codec = codec or PayloadCodec()
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.request_count = 0
+        self.retry_count = 0
+
+    def post_json(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        read_timeout: Optional[float] = None,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """
+        Отправляет JSON-запрос и возвращает разобранный ответ.
+
+        Args:
+            url: Адрес запроса
+            payload: Тело запроса
+            read_timeout: Таймаут чтения для этого запроса
+            info: Словарь, в который записываются размеры запроса и ответа
+                (request_bytes, response_bytes), время кодирования и
+                декодирования (см. PayloadCodec) и количество попыток
+        """
+        timeout = (self.connect_timeout, read_timeout or self.read_timeout)
+        info = info if info is not None else {}
+        data = self.codec.encode(payload, info)
+        attempt = 0
+
+        while True:
+            self.request_count += 1
+            try:
+                response = self.session.post(
+                    url, data=data, headers=self.codec.headers, timeout=timeout
+                )
+                if (
+                    self.retry_policy.is_retryable_status(response.status_code)
+                    and attempt < self.retry_policy.max_retries
+                ):
+                    print(
+                        f"Сервер вернул {response.status_code}, повтор {attempt + 1}"
+                        f"/{self.retry_policy.max_retries}"
+                    )
+                else:
+                    info["attempts"] = attempt + 1
+                    info["response_bytes"] = len(response.content)
+                    response.raise_for_status()
+                    return self.codec.decode(response.content, info)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retry_policy.max_retries:
+                    raise
+                print(
+                    f"Ошибка соединения ({e.__class__.__name__}), повтор {attempt + 1}"
+                    f"/{self.retry_policy.max_retries}"
+                )
+
+            time.sleep(self.retry_policy.get_delay(attempt))
+            attempt += 1
+            self.retry_count += 1
+
+    def stream_json(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        read_timeout: Optional[float] = None,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Any]:
+        """
+        Отправляет JSON-запрос и выдает события потокового ответа (SSE).
+
+        Повторные попытки выполняются только до начала чтения потока.
+        Закрытие итератора разрывает соединение, и сервер прекращает генерацию.
+        """
+        timeout = (self.connect_timeout, read_timeout or self.read_timeout)
+        info = info if info is not None else {}
+        data = self.codec.encode(payload, info)
+        attempt = 0
+
+        while True:
+            self.request_count += 1
+            try:
+                response = self.session.post(
+                    url, data=data, headers=self.codec.headers, timeout=timeout, stream=True
+                )
+                if (
+                    self.retry_policy.is_retryable_status(response.status_code)
+                    and attempt < self.retry_policy.max_retries
+                ):
+                    response.close()
+                    print(
+                        f"Сервер вернул {response.status_code}, повтор {attempt + 1}"
+                        f"/{self.retry_policy.max_retries}"
+                    )
+                else:
+                    break
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retry_policy.max_retries:
+                    raise
+                print(
+                    f"Ошибка соединения ({e.__class__.__name__}), повтор {attempt + 1}"
+                    f"/{self.retry_policy.max_retries}"
+                )
+
+            time.sleep(self.retry_policy.get_delay(attempt))
+            attempt += 1
+            self.retry_count += 1
+
+        info["attempts"] = attempt + 1
+        info["response_bytes"] = 0
+        try:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                info["response_bytes"] += len(line) + 1
+                event = parse_sse_line(line.decode("utf-8"))
+                if event == SSE_DONE:
+                    return
+                if event is not None:
+                    yield event
+        finally:
+            response.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"requests": self.request_count, "retries": self.retry_count}
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncHttpTransport:
+    """
+    Асинхронный аналог HttpTransport поверх одной aiohttp-сессии.
+    Сессия открывается на время работы через `async with`.
+    """
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 300.0,
+        retry_policy: Optional[RetryPolicy] = None,
+        pool_size: int = 10,
+        codec: Optional[PayloadCodec] = None,
+    ):
+        self.headers = headers or {}
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.codec = codec or PayloadCodec()
+        self.pool_size = pool_size
+        self.session = None
+
+        self.request_count = 0
+        self.retry_count = 0
+
+    async def __aenter__(self) -> "AsyncHttpTransport":
+        connector = aiohttp.TCPConnector(limit=self.pool_size)
+        self.session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.session.close()
+        self.session = None
+
+    async def post_json(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        read_timeout: Optional[float] = None,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """Асинхронный аналог HttpTransport.post_json."""
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=self.connect_timeout,
+            sock_read=read_timeout or self.read_timeout,
+        )
+        info = info if info is not None else {}
+        data = self.codec.encode(payload, info)
+        attempt = 0
+
+        while True:
+            self.request_count += 1
+            try:
+                async with self.session.post(
+                    url, data=data, headers=self.codec.headers, timeout=timeout
+                ) as response:
+                    if (
+                        self.retry_policy.is_retryable_status(response.status)
+                        and attempt < self.retry_policy.max_retries
+                    ):
+                        print(
+                            f"Сервер вернул {response.status}, повтор {attempt + 1}"
+                            f"/{self.retry_policy.max_retries}"
+                        )
+                    else:
+                        body = await response.read()
+                        info["attempts"] = attempt + 1
+                        info["response_bytes"] = len(body)
+                        response.raise_for_status()
+                        return self.codec.decode(body, info)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.retry_policy.max_retries:
+                    raise
+                print(
+                    f"Ошибка соединения ({e.__class__.__name__}), повтор {attempt + 1}"
+                    f"/{self.retry_policy.max_retries}"
+                )
+
+            await asyncio.sleep(self.retry_policy.get_delay(attempt))
+            attempt += 1
+            self.retry_count += 1
+
+    async def stream_json(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        read_timeout: Optional[float] = None,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Any]:
+        """Асинхронный аналог HttpTransport.stream_json."""
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=self.connect_timeout,
+            sock_read=read_timeout or self.read_timeout,
+        )
+        info = info if info is not None else {}
+        data = self.codec.encode(payload, info)
+        attempt = 0
+
+        while True:
+            self.request_count += 1
+            try:
+                response = await self.session.post(
+                    url, data=data, headers=self.codec.headers, timeout=timeout
+                )
+                if (
+                    self.retry_policy.is_retryable_status(response.status)
+                    and attempt < self.retry_policy.max_retries
+                ):
+                    response.release()
+                    print(
+                        f"Сервер вернул {response.status}, повтор {attempt + 1}"
+                        f"/{self.retry_policy.max_retries}"
+                    )
+                else:
+                    break
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.retry_policy.max_retries:
+                    raise
+                print(
+                    f"Ошибка соединения ({e.__class__.__name__}), повтор {attempt + 1}"
+                    f"/{self.retry_policy.max_retries}"
+                )
+
+            await asyncio.sleep(self.retry_policy.get_delay(attempt))
+            attempt += 1
+            self.retry_count += 1
+
+        info["attempts"] = attempt + 1
+        info["response_bytes"] = 0
+        completed = False
+        try:
+            response.raise_for_status()
+            async for line in response.content:
+                info["response_bytes"] += len(line)
+                event = parse_sse_line(line.decode("utf-8"))
+                if event == SSE_DONE:
+                    break
+                if event is not None:
+                    yield event
+            completed = True
+        finally:
+            if completed:
+                response.release()
+            else:
+                response.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"requests": self.request_count, "retries": self.retry_count}
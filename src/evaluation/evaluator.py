@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from collections import Counter
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 import json
 import os
 
@@ -7,6 +8,25 @@ from src.evaluation.parsers import ResponseParser
 from src.evaluation.metrics import Metric
 
 
+def majority_vote(answers: List[str]) -> Tuple[str, float]:
+    """
+    Выбирает самый частый ответ среди ответов нескольких генераций.
+
+    Пустые (не распознанные парсером) ответы не голосуют; при равенстве
+    голосов побеждает ответ, встретившийся раньше.
+
+    Returns:
+        Tuple[str, float]: Выбранный ответ и доля генераций, давших его
+    """
+    votes = Counter(answer for answer in answers if answer)
+    if not votes:
+        return "", 0.0
+
+    best_count = max(votes.values())
+    winner = next(answer for answer in answers if votes.get(answer) == best_count)
+    return winner, best_count / len(answers)
+
+
 class AbstractEvaluator(ABC):
     def __init__(self, parser: ResponseParser, output_dir: Optional[str] = None):
         self.parser = parser
@@ -25,17 +45,23 @@ class AbstractEvaluator(ABC):
         pass
 
     @abstractmethod
-    def evaluate_dataset(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def evaluate_dataset(self, results: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
         pass
 
     def save_evaluation(
-        self, evaluation_results: Dict[str, Any], filename: str
+        self,
+        evaluation_results: Dict[str, Any],
+        filename: str,
+        run_info: Optional[Dict[str, Any]] = None,
     ) -> None:
         if not self.output_dir:
             raise ValueError("Не указана директория для сохранения результатов")
 
         filepath = os.path.join(self.output_dir, filename)
 
+        if run_info is not None:
+            evaluation_results = {**evaluation_results, "run_info": run_info}
+
         with open(filepath, "w", encoding="utf-8") as f:
             json.dump(evaluation_results, f, ensure_ascii=False, indent=2)
 
@@ -67,29 +93,81 @@ class Evaluator(AbstractEvaluator):
             "model_output": model_output,
         }
 
-    def evaluate_dataset(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
-        valid_results = [r for r in results if not r.get("error")]
-        processed_results = []
+    def evaluate_samples(
+        self, prompt: str, model_outputs: List[str], expected_output: str
+    ) -> Dict[str, Any]:
+        """
+        Оценивает несколько ответов модели на один промпт голосованием большинства.
+
+        Каждый ответ разбирается парсером, итоговым считается самый частый
+        ответ (см. majority_vote). Дополнительно сохраняются ответы всех
+        генераций, доля голосов за итоговый ответ и количество правильных
+        генераций (для оценки pass@k).
+        """
+        parsed_answers = [self.parser.parse(model_output) for model_output in model_outputs]
+        parsed_answer, vote_share = majority_vote(parsed_answers)
+        expected_answer = expected_output.strip()
+
+        return {
+            "parsed_answer": parsed_answer,
+            "expected_answer": expected_answer,
+            "is_correct": parsed_answer == expected_answer,
+            "prompt": prompt,
+            "model_output": model_outputs[parsed_answers.index(parsed_answer)],
+            "parsed_answers": parsed_answers,
+            "vote_share": vote_share,
+            "correct_samples": sum(answer == expected_answer for answer in parsed_answers),
+        }
+
+    def evaluate_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Оценивает один результат модели и сохраняет его метаданные (кроме промпта).
 
-        for result in valid_results:
+        Если результат содержит несколько ответов (model_outputs), ответ
+        выбирается голосованием большинства (см. evaluate_samples).
+        """
+        if result.get("model_outputs"):
+            evaluation = self.evaluate_samples(
+                result["prompt"], result["model_outputs"], result["expected_output"]
+            )
+        else:
             evaluation = self.evaluate_response(
                 result["prompt"], result["model_output"], result["expected_output"]
             )
 
-            evaluation_with_meta = {
-                "index": result.get("index"),
-                "domain": result.get("domain", "unknown"),
-                "parsed_answer": evaluation["parsed_answer"],
-                "expected_answer": evaluation["expected_answer"],
-                "is_correct": evaluation["is_correct"],
-                "model_output": evaluation["model_output"],
-            }
+        evaluation_with_meta = {
+            "index": result.get("index"),
+            "domain": result.get("domain", "unknown"),
+            "parsed_answer": evaluation["parsed_answer"],
+            "expected_answer": evaluation["expected_answer"],
+            "is_correct": evaluation["is_correct"],
+            "model_output": evaluation["model_output"],
+        }
+        for key in ("parsed_answers", "vote_share", "correct_samples"):
+            if key in evaluation:
+                evaluation_with_meta[key] = evaluation[key]
+
+        for key, value in result.items():
+            if key not in ["prompt", "model_output", "expected_output", "error"]:
+                evaluation_with_meta[key] = value
+
+        return evaluation_with_meta
 
-            for key, value in result.items():
-                if key not in ["prompt", "model_output", "expected_output", "error"]:
-                    evaluation_with_meta[key] = value
+    def evaluate_dataset(self, results: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Оценивает результаты модели.
+
+        Args:
+            results: Результаты модели - список или итератор (например,
+                BatchModelClient.iter_dataset); промпты не сохраняются в оценке,
+                поэтому при потоковой обработке они не накапливаются в памяти
+        """
+        processed_results = []
 
-            processed_results.append(evaluation_with_meta)
+        for result in results:
+            if result.get("error"):
+                continue
+            processed_results.append(self.evaluate_result(result))
 
         metric_results = self.metric.calculate(processed_results)
         metric_results["detailed_evaluations"] = processed_results
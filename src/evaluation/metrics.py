@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional, Literal
+from math import comb
+from typing import Dict, Any, List, Optional, Literal, Sequence
 import re
 
 from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
@@ -51,6 +52,96 @@ class DomainAccuracyMetric(Metric):
         return {"domain_stats": domain_stats}
 
 
+class CalibrationMetric(Metric):
+    """
+    Калибровка вероятностей вариантов ответа (режим оценки по логарифмам вероятностей).
+
+    Использует поле option_probs результатов: ожидаемую ошибку калибровки
+    (ECE) по уверенности в выбранном варианте и оценку Брайера по всем вариантам.
+    """
+
+    def __init__(self, n_bins: int = 10):
+        self.n_bins = n_bins
+
+    def calculate(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        scored = [result for result in results if result.get("option_probs")]
+        if not scored:
+            return {"scored_examples": 0, "ece": 0.0, "brier": 0.0, "mean_confidence": 0.0}
+
+        bins = [{"count": 0, "confidence": 0.0, "correct": 0} for _ in range(self.n_bins)]
+        brier_total = 0.0
+        confidence_total = 0.0
+
+        for result in scored:
+            option_probs = result["option_probs"]
+            expected = result.get("expected_answer", "")
+            confidence = max(option_probs.values())
+            confidence_total += confidence
+
+            bin_index = min(int(confidence * self.n_bins), self.n_bins - 1)
+            bins[bin_index]["count"] += 1
+            bins[bin_index]["confidence"] += confidence
+            if result.get("is_correct", False):
+                bins[bin_index]["correct"] += 1
+
+            brier_total += sum(
+                (prob - (1.0 if letter == expected else 0.0)) ** 2
+                for letter, prob in option_probs.items()
+            )
+
+        total = len(scored)
+        ece = sum(
+            abs(b["correct"] - b["confidence"]) / total for b in bins if b["count"] > 0
+        )
+
+        return {
+            "scored_examples": total,
+            "ece": ece,
+            "brier": brier_total / total,
+            "mean_confidence": confidence_total / total,
+        }
+
+
+class SamplingMetric(Metric):
+    """
+    Метрики нескольких генераций на промпт (self-consistency).
+
+    Использует поля parsed_answers и correct_samples результатов: средняя
+    доля голосов за итоговый ответ и несмещенная оценка pass@k - вероятности
+    того, что хотя бы один из k случайно выбранных ответов правильный.
+    """
+
+    def __init__(self, ks: Sequence[int] = (1,)):
+        self.ks = tuple(ks)
+
+    @staticmethod
+    def pass_at_k(n: int, correct: int, k: int) -> float:
+        if n - correct < k:
+            return 1.0
+        return 1.0 - comb(n - correct, k) / comb(n, k)
+
+    def calculate(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        sampled = [result for result in results if result.get("parsed_answers")]
+        metrics = {"sampled_examples": len(sampled), "mean_vote_share": 0.0}
+        if not sampled:
+            return metrics
+
+        metrics["mean_vote_share"] = sum(r["vote_share"] for r in sampled) / len(sampled)
+        for k in self.ks:
+            eligible = [r for r in sampled if len(r["parsed_answers"]) >= k]
+            metrics[f"pass@{k}"] = (
+                sum(
+                    self.pass_at_k(len(r["parsed_answers"]), r["correct_samples"], k)
+                    for r in eligible
+                )
+                / len(eligible)
+                if eligible
+                else 0.0
+            )
+
+        return metrics
+
+
 class ExactMatchMetric(Metric):
     def __init__(self, case_sensitive: bool = False, normalize: bool = True):
         self.case_sensitive = case_sensitive
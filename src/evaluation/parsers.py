@@ -1,5 +1,6 @@
 from abc import ABCMeta, abstractmethod
 import re
+from typing import Optional
 
 
 class ResponseParser(metaclass=ABCMeta):
@@ -7,6 +8,16 @@ class ResponseParser(metaclass=ABCMeta):
     def parse(self, response: str) -> str:
         pass
 
+    def parse_partial(self, partial_response: str) -> Optional[str]:
+        """
+        Разбирает начало ответа, получаемого потоково.
+
+        Returns:
+            Optional[str]: Ответ, если он уже однозначно определен и дальнейшая
+                генерация его не изменит, иначе None
+        """
+        return None
+
 
 class MultipleChoiceParser(ResponseParser):
     def __init__(
@@ -17,29 +28,54 @@ class MultipleChoiceParser(ResponseParser):
             allowed_options if case_sensitive else allowed_options.upper()
         )
 
+    def _patterns(self):
+        options = re.escape(self.allowed_options)
+        return [
+            rf"(?:^|\s)(?:\(?([{options}])\)?)(?:[\.\s]|$)",
+            rf"(?:ответ|answer)[:\s]*(?:\(?([{options}])\)?)(?:[\.\s]|$)",
+            rf"(?:^|\s)(?:the answer is|мой ответ)[:\s]*(?:\(?([{options}])\)?)(?:[\.\s]|$)",
+            rf"\(([{options}])\)",
+            rf"([{options}])\.(?:\s|$)",
+            rf"(?:^|\s)([{options}])$",
+            rf"(?:вариант|option)[:\s]*([{options}])(?:[\.\s]|$)",
+        ]
+
+    def _result(self, match) -> str:
+        result = match.group(1)
+        return result if self.case_sensitive else result.upper()
+
     def parse(self, response: str) -> str:
         if not response:
             return ""
 
-        patterns = [
-            rf"(?:^|\s)(?:\(?([{re.escape(self.allowed_options)}])\)?)(?:[\.\s]|$)",
-            rf"(?:ответ|answer)[:\s]*(?:\(?([{re.escape(self.allowed_options)}])\)?)(?:[\.\s]|$)",
-            rf"(?:^|\s)(?:the answer is|мой ответ)[:\s]*(?:\(?([{re.escape(self.allowed_options)}])\)?)(?:[\.\s]|$)",
-            rf"\(([{re.escape(self.allowed_options)}])\)",
-            rf"([{re.escape(self.allowed_options)}])\.(?:\s|$)",
-            rf"(?:^|\s)([{re.escape(self.allowed_options)}])$",
-            rf"(?:вариант|option)[:\s]*([{re.escape(self.allowed_options)}])(?:[\.\s]|$)",
-        ]
-
-        for pattern in patterns:
-            flags = 0 if self.case_sensitive else re.IGNORECASE
+        flags = 0 if self.case_sensitive else re.IGNORECASE
+        for pattern in self._patterns():
             match = re.search(pattern, response, flags)
             if match:
-                result = match.group(1)
-                return result if self.case_sensitive else result.upper()
+                return self._result(match)
 
         return ""
 
+    def parse_partial(self, partial_response: str) -> Optional[str]:
+        """
+        Ответ parse() для начала ответа, если продолжение генерации его не изменит.
+
+        parse() берет самое левое совпадение первого шаблона, поэтому ответ
+        определен, когда первый шаблон совпал в начале ответа и совпадение
+        уже завершено разделителем (точкой или пробельным символом), а не
+        концом текста: продолжение не может ни изменить это совпадение, ни
+        добавить совпадение левее. Совпадения остальных шаблонов не
+        принимаются - в полном ответе их может перекрыть первый шаблон.
+        """
+        if not partial_response:
+            return None
+
+        flags = 0 if self.case_sensitive else re.IGNORECASE
+        match = re.search(self._patterns()[0], partial_response, flags)
+        if match is None or not re.fullmatch(r"[\.\s]", match.group(0)[-1]):
+            return None
+        return self._result(match)
+
 
 class RegexParser(ResponseParser):
     def __init__(self, pattern: str, group: int = 1, fallback_to_full: bool = True):
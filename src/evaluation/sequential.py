@@ -0,0 +1,225 @@
+import math
+import random
+from statistics import NormalDist
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.client.checkpoint import JsonlCheckpoint
+from src.client.model_client import BatchModelClient
+from src.evaluation.evaluator import Evaluator
+from src.prompts import PromptGenerator
+from src.prompts.sampling import domain_strata
+
+
+def wilson_interval(correct: int, total: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """Доверительный интервал Уилсона для доли правильных ответов."""
+    if total == 0:
+        return 0.0, 1.0
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    p = correct / total
+    denominator = 1 + z**2 / total
+    center = (p + z**2 / (2 * total)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / total + z**2 / (4 * total**2)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def stratified_order(strata: List[str], seed: int = 0) -> List[int]:
+    """
+    Случайный порядок позиций, в котором любой префикс стратифицирован.
+
+    Позиции каждой страты перемешиваются и равномерно распределяются по всей
+    длине порядка, поэтому доля каждой страты в первых n позициях близка
+    к ее доле во всем наборе данных.
+
+    Args:
+        strata: Метка страты для каждой позиции данных
+        seed: Начальное значение генератора случайных чисел
+    """
+    rng = random.Random(seed)
+    positions_by_stratum = {}
+    for position, stratum in enumerate(strata):
+        positions_by_stratum.setdefault(stratum, []).append(position)
+
+    keyed_positions = []
+    for stratum in sorted(positions_by_stratum):
+        positions = positions_by_stratum[stratum]
+        rng.shuffle(positions)
+        offset = rng.random()
+        for k, position in enumerate(positions):
+            keyed_positions.append(((k + offset) / len(positions), rng.random(), position))
+
+    keyed_positions.sort()
+    return [position for _, _, position in keyed_positions]
+
+
+class SequentialEvaluator:
+    """
+    Последовательная оценка точности с ранней остановкой.
+
+    Примеры отправляются в случайном порядке, стратифицированном по домену
+    (meta.domain). После каждого пакета пересчитывается точность и ее
+    доверительный интервал Уилсона; оценка останавливается, когда ширина
+    интервала становится не больше max_ci_width, либо когда результат
+    сравнения с базовой точностью уже определен: базовая точность вне
+    интервала или весь интервал лежит в пределах baseline_margin от нее.
+
+    Интервал проверяется многократно, поэтому уровень значимости 1 - confidence
+    делится поровну между всеми запланированными проверками (поправка
+    Бонферрони): интервалы всех проверок одновременно накрывают истинную
+    точность с вероятностью не меньше confidence, и остановка по любой из
+    них сохраняет заявленный уровень доверия.
+
+    Результаты с ошибкой сервера не оцениваются: они не входят в точность
+    и в количество примеров total, а учитываются отдельно (failed).
+    """
+
+    def __init__(
+        self,
+        evaluator: Evaluator,
+        max_ci_width: float = 0.02,
+        baseline: Optional[float] = None,
+        baseline_margin: float = 0.0,
+        confidence: float = 0.95,
+        min_examples: int = 100,
+        check_every: Optional[int] = None,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            evaluator: Оценщик ответов модели
+            max_ci_width: Ширина доверительного интервала, при которой оценка останавливается
+            baseline: Базовая точность для сравнения (например, предыдущей модели)
+            baseline_margin: Допустимое отличие от базовой точности, в пределах
+                которого модели считаются равными (0 - не проверять)
+            confidence: Уровень доверия интервала с учетом всех проверок
+            min_examples: Минимальное количество оцененных примеров до остановки
+            check_every: Период проверки условия остановки (в примерах),
+                по умолчанию - текущий размер пакета клиента
+            seed: Начальное значение генератора случайного порядка
+        """
+        if not 0 < confidence < 1:
+            raise ValueError("Уровень доверия (confidence) должен быть в интервале (0, 1)")
+
+        self.evaluator = evaluator
+        self.max_ci_width = max_ci_width
+        self.baseline = baseline
+        self.baseline_margin = baseline_margin
+        self.confidence = confidence
+        self.min_examples = min_examples
+        self.check_every = check_every
+        self.seed = seed
+
+    def _stop_reason(self, evaluated: int, lower: float, upper: float) -> Optional[str]:
+        if evaluated < self.min_examples:
+            return None
+        if upper - lower <= self.max_ci_width:
+            return "ci_width"
+        if self.baseline is not None:
+            if self.baseline < lower:
+                return "above_baseline"
+            if self.baseline > upper:
+                return "below_baseline"
+            if (
+                self.baseline_margin > 0
+                and self.baseline - self.baseline_margin <= lower
+                and upper <= self.baseline + self.baseline_margin
+            ):
+                return "within_baseline_margin"
+        return None
+
+    def evaluate(
+        self,
+        client: BatchModelClient,
+        generator: PromptGenerator,
+        checkpoint: Optional[JsonlCheckpoint] = None,
+    ) -> Dict[str, Any]:
+        """
+        Оценивает модель, пока не выполнится условие остановки или не закончатся данные.
+
+        Генератор переключается на стратифицированный случайный порядок
+        (см. PromptGenerator.select); если генератор уже ограничен подвыборкой,
+        перемешиваются только ее примеры.
+
+        Returns:
+            Dict[str, Any]: Результаты метрик оценщика и сводка последовательной
+                оценки в поле sequential
+        """
+        positions = list(range(len(generator.data)))
+        if generator.order is not None:
+            positions = sorted(generator.order)
+        strata = domain_strata([generator.data[position] for position in positions])
+        generator.select([positions[i] for i in stratified_order(strata, self.seed)])
+        dataset_size = len(generator)
+        check_every = self.check_every or client._current_batch_size()
+        planned_checks = max(1, math.ceil(dataset_size / check_every))
+        check_confidence = 1 - (1 - self.confidence) / planned_checks
+
+        processed_results = []
+        failed = 0
+        correct = 0
+        history = []
+        stop_reason = None
+        lower, upper = 0.0, 1.0
+
+        submitted_before = client.submitted_count
+        results = client.iter_dataset(generator=generator, checkpoint=checkpoint)
+        try:
+            for result in results:
+                if result.get("error"):
+                    failed += 1
+                    continue
+
+                evaluation = self.evaluator.evaluate_result(result)
+                processed_results.append(evaluation)
+                if evaluation["is_correct"]:
+                    correct += 1
+
+                evaluated = len(processed_results)
+                if evaluated % check_every != 0:
+                    continue
+
+                lower, upper = wilson_interval(correct, evaluated, check_confidence)
+                history.append(
+                    {
+                        "evaluated": evaluated,
+                        "accuracy": correct / evaluated,
+                        "ci_lower": lower,
+                        "ci_upper": upper,
+                    }
+                )
+                stop_reason = self._stop_reason(evaluated, lower, upper)
+                if stop_reason is not None:
+                    break
+        finally:
+            results.close()
+
+        evaluated = len(processed_results)
+        if stop_reason is None:
+            lower, upper = wilson_interval(correct, evaluated, check_confidence)
+        # Генератор формирует элементы с упреждением, поэтому отправленные
+        # примеры считает клиент: пакеты, переданные на отправку в этом
+        # прогоне (включая прерванные остановкой), и восстановленные
+        # из контрольной точки
+        submitted = client.submitted_count - submitted_before + client.resumed_count
+
+        metric_results = self.evaluator.metric.calculate(processed_results)
+        metric_results["detailed_evaluations"] = processed_results
+        metric_results["sequential"] = {
+            "stopped_early": stop_reason is not None,
+            "stop_reason": stop_reason or "exhausted",
+            "evaluated": evaluated,
+            "failed": failed,
+            "total": dataset_size - failed,
+            "submitted": submitted,
+            "requests_saved": dataset_size - submitted,
+            "accuracy": correct / evaluated if evaluated > 0 else 0.0,
+            "ci_lower": lower,
+            "ci_upper": upper,
+            "confidence": self.confidence,
+            "planned_checks": planned_checks,
+            "check_confidence": check_confidence,
+            "baseline": self.baseline,
+            "history": history,
+        }
+
+        return metric_results
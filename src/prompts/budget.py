@@ -0,0 +1,359 @@
+import math
+import re
+from bisect import bisect_right
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .templates import compile_template
+
+try:
+    from transformers import AutoTokenizer
+except ImportError:
+    AutoTokenizer = None
+
+
+# Заниженные оценки количества символов на токен для BPE-токенизаторов:
+# при ошибке оценки промпт скорее окажется короче бюджета, чем длиннее
+DEFAULT_CHARS_PER_TOKEN = {"english": 3.5, "russian": 2.5}
+
+# Конец предложения: знаки препинания (с закрывающими кавычками и скобками)
+# перед пробелом или концом текста, а также перевод строки
+SENTENCE_END = re.compile(r"[.!?…]+[\"'»”’)\]]*(?=\s|$)|\n")
+WORD_END = re.compile(r"\S+")
+
+
+class TokenCounter(ABC):
+    """Подсчет токенов текста."""
+
+    name = "base"
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        pass
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        return [self.count(text) for text in texts]
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+
+class CharRatioTokenCounter(TokenCounter):
+    """
+    Оценка количества токенов по длине текста в символах.
+
+    Используется, когда токенизатор модели недоступен (например, без доступа
+    к сети). Отношение символов на токен по умолчанию (DEFAULT_CHARS_PER_TOKEN) -
+    приближение; точнее откалибровать его по образцу текстов с известным
+    количеством токенов (см. calibrate и from_usage).
+    """
+
+    name = "chars"
+
+    def __init__(self, chars_per_token: float = 3.0, calibration_texts: int = 0):
+        """
+        Args:
+            chars_per_token: Среднее количество символов на токен
+            calibration_texts: Количество текстов, по которым откалибровано отношение
+        """
+        if chars_per_token <= 0:
+            raise ValueError("Количество символов на токен (chars_per_token) должно быть больше 0")
+        self.chars_per_token = chars_per_token
+        self.calibration_texts = calibration_texts
+
+    @classmethod
+    def for_language(cls, language: str) -> "CharRatioTokenCounter":
+        return cls(DEFAULT_CHARS_PER_TOKEN.get(language, min(DEFAULT_CHARS_PER_TOKEN.values())))
+
+    @classmethod
+    def calibrate(cls, texts: Sequence[str], token_counts: Sequence[int]) -> "CharRatioTokenCounter":
+        """
+        Отношение символов на токен по образцу текстов.
+
+        Args:
+            texts: Образец текстов
+            token_counts: Количество токенов каждого текста (по токенизатору
+                модели или по полю usage ответов сервера)
+        """
+        total_tokens = sum(token_counts)
+        if total_tokens <= 0:
+            raise ValueError("Для калибровки нужны тексты с ненулевым количеством токенов")
+        return cls(sum(len(text) for text in texts) / total_tokens, calibration_texts=len(texts))
+
+    @classmethod
+    def from_usage(
+        cls, texts: Sequence[str], responses: Sequence[Mapping[str, Any]]
+    ) -> "CharRatioTokenCounter":
+        """
+        Отношение символов на токен по ответам сервера на тексты образца:
+        количество токенов текста берется из поля usage.prompt_tokens.
+
+        Raises:
+            ValueError: Если ни один ответ не содержит количества токенов промпта
+        """
+        pairs = [
+            (text, response["usage"]["prompt_tokens"])
+            for text, response in zip(texts, responses)
+            if (response.get("usage") or {}).get("prompt_tokens")
+        ]
+        if not pairs:
+            raise ValueError("Ответы сервера не содержат количества токенов промпта (usage.prompt_tokens)")
+        return cls.calibrate([text for text, _ in pairs], [tokens for _, tokens in pairs])
+
+    def count(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def describe(self) -> Dict[str, Any]:
+        description = {"name": self.name, "chars_per_token": self.chars_per_token}
+        if self.calibration_texts:
+            description["calibration_texts"] = self.calibration_texts
+        return description
+
+
+class TransformersTokenCounter(TokenCounter):
+    """Точный подсчет токенов токенизатором модели из библиотеки transformers."""
+
+    name = "transformers"
+
+    def __init__(self, tokenizer: str, local_files_only: bool = True):
+        """
+        Args:
+            tokenizer: Имя или путь токенизатора
+            local_files_only: Загружать токенизатор только из локального кэша
+        """
+        if AutoTokenizer is None:
+            raise ImportError("Для подсчета токенов токенизатором необходимо установить пакет transformers")
+        self.tokenizer_name = tokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer, local_files_only=local_files_only)
+
+    def count(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        if not texts:
+            return []
+        encoded = self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "tokenizer": self.tokenizer_name}
+
+
+def load_token_counter(
+    tokenizer: Optional[str] = None,
+    language: str = "english",
+    chars_per_token: Optional[float] = None,
+) -> TokenCounter:
+    """
+    Счетчик токенов: токенизатор модели, если он указан и доступен локально,
+    иначе оценка по количеству символов.
+
+    Args:
+        tokenizer: Имя или путь токенизатора transformers
+        language: Язык текстов (для отношения символов на токен по умолчанию)
+        chars_per_token: Отношение символов на токен для оценки
+    """
+    if tokenizer is not None:
+        try:
+            return TransformersTokenCounter(tokenizer)
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Токенизатор {tokenizer} недоступен ({e}), токены оцениваются по длине текста")
+
+    if chars_per_token is not None:
+        return CharRatioTokenCounter(chars_per_token)
+    return CharRatioTokenCounter.for_language(language)
+
+
+def sentence_ends(text: str, stop: Optional[int] = None) -> List[int]:
+    """
+    Позиции концов предложений в text[:stop]; конец текста тоже считается
+    концом предложения.
+    """
+    size = len(text)
+    stop = size if stop is None else min(stop, size)
+    ends = [
+        match.end()
+        for match in SENTENCE_END.finditer(text, 0, stop)
+        if match.end() < stop or stop == size
+    ]
+    if stop == size and (not ends or ends[-1] < size):
+        ends.append(size)
+    return ends
+
+
+class PromptBudget:
+    """
+    Ограничение длины промпта бюджетом токенов.
+
+    Контекст модели вмещает промпт и генерацию, поэтому на промпт остается
+    max_context_tokens - max_tokens - reserve_tokens токенов. Если промпт
+    не помещается, поле field (текст статьи) обрезается по границе
+    предложения: на префилл не тратятся токены, которые сервер все равно
+    отбросил бы или из-за которых отклонил бы запрос. Предложение режется по
+    словам, только если не помещается даже первое.
+    """
+
+    COUNTERS = (
+        "items",
+        "truncated_items",
+        "cut_within_sentence",
+        "dropped_chars",
+        "prompt_tokens_before",
+        "prompt_tokens_after",
+    )
+
+    def __init__(
+        self,
+        counter: TokenCounter,
+        max_context_tokens: int,
+        max_tokens: int = 0,
+        field: str = "text",
+        reserve_tokens: int = 8,
+    ):
+        """
+        Args:
+            counter: Счетчик токенов
+            max_context_tokens: Размер контекста модели (в токенах)
+            max_tokens: Максимальное количество токенов в ответе
+            field: Поле входных данных, которое можно обрезать
+            reserve_tokens: Запас на специальные токены и неточность подсчета
+                на стыке текста и шаблона
+        """
+        self.counter = counter
+        self.max_context_tokens = max_context_tokens
+        self.max_tokens = max_tokens
+        self.field = field
+        self.reserve_tokens = reserve_tokens
+        self.limit = max_context_tokens - max_tokens - reserve_tokens
+        if self.limit <= 0:
+            raise ValueError(
+                "Бюджет промпта (max_context_tokens - max_tokens - reserve_tokens) "
+                "должен быть больше 0"
+            )
+
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+
+    def _cut_words(self, text: str, limit: int) -> str:
+        """Самый длинный префикс text по границе слова, помещающийся в limit токенов."""
+        ends = [match.end() for match in WORD_END.finditer(text)]
+        low, high = 0, len(ends)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.counter.count(text[: ends[middle - 1]]) <= limit:
+                low = middle
+            else:
+                high = middle - 1
+        return text[: ends[low - 1]] if low else ""
+
+    def truncate(self, text: str, limit: int, text_tokens: Optional[int] = None) -> Tuple[str, int]:
+        """
+        Обрезает текст до limit токенов по границе предложения.
+
+        Args:
+            text: Текст
+            limit: Бюджет токенов текста
+            text_tokens: Количество токенов всего текста, если уже известно
+
+        Returns:
+            Tuple[str, int]: Обрезанный текст и его количество токенов
+        """
+        if limit <= 0:
+            return "", 0
+        if text_tokens is None:
+            text_tokens = self.counter.count(text)
+        if text_tokens <= limit:
+            return text, text_tokens
+
+        # Место обреза оценивается по среднему количеству символов на токен
+        # этого текста и уточняется подсчетом токенов префиксов. Границы
+        # предложений ищутся только в окне вокруг оценки, которое
+        # расширяется, если в него помещаются все найденные предложения,
+        # а само окно - нет
+        estimate = limit * len(text) / text_tokens
+        stop = int(estimate * 1.25) + 256
+        while True:
+            ends = sentence_ends(text, stop)
+            kept = bisect_right(ends, estimate)
+            while kept < len(ends) and self.counter.count(text[: ends[kept]].rstrip()) <= limit:
+                kept += 1
+            if kept < len(ends) or stop >= len(text):
+                break
+            if self.counter.count(text[:stop]) > limit:
+                break
+            stop *= 2
+
+        while kept > 0:
+            truncated = text[: ends[kept - 1]].rstrip()
+            tokens = self.counter.count(truncated)
+            if tokens <= limit:
+                return truncated, tokens
+            kept -= 1
+
+        self.cut_within_sentence += 1
+        truncated = self._cut_words(text[: ends[0] if ends else stop], limit)
+        return truncated, self.counter.count(truncated)
+
+    def fit(self, instruction: str, inputs: Mapping[str, Any]) -> Mapping[str, Any]:
+        """
+        Входные данные, с которыми промпт помещается в бюджет.
+
+        Returns:
+            Mapping[str, Any]: inputs без изменений или их копия с обрезанным полем field
+        """
+        self.items += 1
+        text = inputs.get(self.field)
+        if not text:
+            return inputs
+
+        template = compile_template(instruction)
+        shell_tokens = self.counter.count(template.render({**inputs, self.field: ""}))
+        text_tokens = self.counter.count(text)
+        self.prompt_tokens_before += shell_tokens + text_tokens
+
+        if shell_tokens + text_tokens <= self.limit:
+            self.prompt_tokens_after += shell_tokens + text_tokens
+            return inputs
+
+        truncated, truncated_tokens = self.truncate(text, self.limit - shell_tokens, text_tokens)
+        self.truncated_items += 1
+        self.dropped_chars += len(text) - len(truncated)
+        self.prompt_tokens_after += shell_tokens + truncated_tokens
+        return {**inputs, self.field: truncated}
+
+    def fit_many(
+        self, instruction: str, inputs_column: Sequence[Mapping[str, Any]]
+    ) -> List[Mapping[str, Any]]:
+        return [self.fit(instruction, inputs) for inputs in inputs_column]
+
+    def take_counters(self) -> Dict[str, int]:
+        """Забирает накопленные счетчики, обнуляя их (см. add_counters)."""
+        counters = {name: getattr(self, name) for name in self.COUNTERS}
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        return counters
+
+    def add_counters(self, counters: Mapping[str, int]) -> None:
+        """Добавляет счетчики бюджета из другого процесса."""
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + counters.get(name, 0))
+
+    def get_stats(self) -> Dict[str, Any]:
+        saved_tokens = self.prompt_tokens_before - self.prompt_tokens_after
+        return {
+            "counter": self.counter.describe(),
+            "max_context_tokens": self.max_context_tokens,
+            "max_tokens": self.max_tokens,
+            "prompt_limit": self.limit,
+            "items": self.items,
+            "truncated_items": self.truncated_items,
+            "truncated_share": self.truncated_items / self.items if self.items else 0.0,
+            "cut_within_sentence": self.cut_within_sentence,
+            "dropped_chars": self.dropped_chars,
+            "prompt_tokens_before": self.prompt_tokens_before,
+            "prompt_tokens_after": self.prompt_tokens_after,
+            "saved_tokens": saved_tokens,
+            "saved_share": saved_tokens / self.prompt_tokens_before
+            if self.prompt_tokens_before
+            else 0.0,
+        }
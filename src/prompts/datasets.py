@@ -0,0 +1,135 @@
+import json
+import mmap
+import os
+from array import array
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, Optional
+
+INDEX_SUFFIX = ".idx"
+
+
+class JsonlDataset(Sequence):
+    """
+    Ленивое чтение набора данных в формате JSONL.
+
+    Файл отображается в память (mmap), а записи разбираются только при
+    обращении к ним: по индексу байтовых смещений строк доступ к любой
+    записи и len() выполняются за O(1), и в памяти процесса не хранятся
+    разобранные записи. Индекс строится одним проходом по файлу и
+    сохраняется рядом с ним (файл .idx), поэтому последующие загрузки того
+    же файла не читают его целиком. Срезы возвращают представления того же
+    набора данных без копирования.
+    """
+
+    def __init__(self, path: str, index_path: Optional[str] = None, save_index: bool = True):
+        """
+        Args:
+            path: Путь к JSONL-файлу
+            index_path: Путь к файлу индекса (по умолчанию - path + ".idx")
+            save_index: Сохранять построенный индекс для последующих загрузок
+        """
+        self.path = path
+        self.index_path = index_path or path + INDEX_SUFFIX
+        self.save_index = save_index
+        self._open()
+        self._positions = range(len(self._offsets) // 2)
+
+    def _open(self) -> None:
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            # Пустой файл нельзя отобразить в память
+            self._mmap = b""
+            if stat.st_size > 0:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._offsets = self._load_index(stat)
+        if self._offsets is None:
+            self._offsets = self._build_index()
+            if self.save_index:
+                self._write_index(stat)
+
+    def _build_index(self) -> array:
+        """Смещения начала и конца каждой непустой строки (пустые строки пропускаются)."""
+        offsets = array("q")
+        data = self._mmap
+        size = len(data)
+        start = 0
+
+        while start < size:
+            end = data.find(b"\n", start)
+            if end < 0:
+                end = size
+            if data[start:end].strip():
+                offsets.append(start)
+                offsets.append(end)
+            start = end + 1
+
+        return offsets
+
+    def _index_header(self, stat: os.stat_result) -> array:
+        return array("q", [stat.st_size, stat.st_mtime_ns])
+
+    def _load_index(self, stat: os.stat_result) -> Optional[array]:
+        try:
+            with open(self.index_path, "rb") as f:
+                header = array("q")
+                header.fromfile(f, 2)
+                if header != self._index_header(stat):
+                    return None
+                offsets = array("q")
+                offsets.frombytes(f.read())
+        except (OSError, EOFError):
+            return None
+
+        if len(offsets) % 2 != 0:
+            return None
+        return offsets
+
+    def _write_index(self, stat: os.stat_result) -> None:
+        try:
+            with open(self.index_path, "wb") as f:
+                self._index_header(stat).tofile(f)
+                self._offsets.tofile(f)
+        except OSError:
+            # Индекс - только ускорение: без права записи он строится при каждой загрузке
+            pass
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _record(self, line: int) -> Dict[str, Any]:
+        start = self._offsets[2 * line]
+        end = self._offsets[2 * line + 1]
+        return json.loads(self._mmap[start:end])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            view = object.__new__(JsonlDataset)
+            view.__dict__.update(self.__dict__)
+            view._positions = self._positions[index]
+            return view
+        return self._record(self._positions[index])
+
+    def subset(self, positions: Sequence) -> "JsonlDataset":
+        """Представление из записей на заданных позициях (в их порядке)."""
+        view = self[:]
+        view._positions = [self._positions[position] for position in positions]
+        return view
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for line in self._positions:
+            yield self._record(line)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Отображение файла не передается между процессами: он открывается заново
+        state = dict(self.__dict__)
+        del state["_mmap"], state["_offsets"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._open()
+
+    def close(self) -> None:
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
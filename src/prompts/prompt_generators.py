@@ -1,7 +1,83 @@
+from .datasets import JsonlDataset
 from .prompt_strategies import PromptStrategy
 from abc import ABCMeta, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 import json
+import multiprocessing
+
+SHARD_MODES = ("contiguous", "strided")
+
+# Генератор промптов процесса пула (см. PromptGenerator.prerender)
+_worker_generator = None
+
+
+def _init_render_worker(generator):
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _render_chunk(positions):
+    records = _worker_generator._render_positions(positions)
+    # Общий префикс одинаков для многих записей; основной процесс добавляет
+    # его заново из своего кэша (_add_prefix), чтобы не передавать копии
+    for record in records:
+        record.pop("prefix", None)
+    strategy = getattr(_worker_generator, "strategy", None)
+    return records, strategy.take_stats() if strategy is not None else None
+
+
+class _PrerenderedChunks:
+    """
+    Формирование промптов в пуле процессов на несколько частей вперед.
+
+    Позиции делятся на части по chunk_size; в обработке одновременно
+    находится до prefetch частей, а готовые элементы выдаются по порядку.
+
+    Процессы пула запускаются методом spawn: пул создается при первом
+    запросе промпта, когда в процессе уже работают потоки клиента, а fork
+    многопоточного процесса может унаследовать захваченные блокировки.
+    """
+
+    def __init__(self, generator, positions, workers, chunk_size, prefetch):
+        self.generator = generator
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_render_worker,
+            initargs=(generator,),
+        )
+        self.chunks = (
+            positions[start : start + chunk_size] for start in range(0, len(positions), chunk_size)
+        )
+        self.pending = deque()
+        self.ready = deque()
+        self.prefetch = prefetch
+        self._submit()
+
+    def _submit(self):
+        while len(self.pending) < self.prefetch:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return
+            self.pending.append(self.executor.submit(_render_chunk, chunk))
+
+    def next(self):
+        if not self.ready:
+            if not self.pending:
+                raise StopIteration
+            records, stats = self.pending.popleft().result()
+            if stats is not None:
+                self.generator.strategy.add_stats(stats)
+            self.ready.extend(map(self.generator._add_prefix, records))
+            self._submit()
+        return self.ready.popleft()
+
+    def close(self):
+        for future in self.pending:
+            future.cancel()
+        self.executor.shutdown(wait=True)
 
 
 class PromptGenerator(metaclass=ABCMeta):
@@ -9,7 +85,12 @@ class PromptGenerator(metaclass=ABCMeta):
 
     def __init__(self):
         self.data = []
+        self.order = None
         self.current_index = 0
+        self.shard_info = None
+        self.render_workers = 0
+        self.render_chunk_size = 256
+        self._prerendered = None
 
     @abstractmethod
     def generate_prompt(self, item):
@@ -23,29 +104,237 @@ class PromptGenerator(metaclass=ABCMeta):
                 prompts.append(json_obj)
         return prompts
 
-    def load_data(self, file_path):
-        self.data = self.parse_jsonl(file_path)
+    def load_data(self, file_path, lazy=True):
+        """
+        Загружает набор данных из JSONL-файла.
+
+        Args:
+            file_path: Путь к файлу
+            lazy: Читать записи по требованию (см. JsonlDataset) вместо
+                разбора всего файла при загрузке
+        """
+        self.close()
+        self.data = JsonlDataset(file_path) if lazy else self.parse_jsonl(file_path)
+        self.order = None
+        self.current_index = 0
+        self.shard_info = None
+        return self
+
+    def select(self, positions):
+        """
+        Ограничивает выдачу промптов заданными позициями данных.
+
+        Промпты выдаются в порядке positions, индекс результата остается
+        позицией примера в данных, поэтому результаты разных выборок
+        сопоставимы между собой. None - выдавать все данные по порядку.
+        """
+        self.close()
+        self.order = None if positions is None else list(positions)
         self.current_index = 0
         return self
 
+    def shard(self, index, count, mode="contiguous"):
+        """
+        Оставляет часть выдаваемых примеров для одного из count узлов.
+
+        Делятся примеры, выдаваемые генератором (с учетом select и
+        подвыборки), поэтому подвыборку нужно строить до деления. Индексы
+        результатов остаются позициями примеров в данных, и результаты всех
+        частей объединяются без пересечений (см. src/scripts/merge_shards.py).
+
+        Args:
+            index: Номер части (от 0 до count - 1)
+            count: Количество частей
+            mode: contiguous - подряд идущие примеры, strided - каждый count-й
+                пример, начиная с index (части ближе по составу доменов)
+        """
+        if count < 1:
+            raise ValueError("Количество частей (count) должно быть не менее 1")
+        if not 0 <= index < count:
+            raise ValueError(f"Номер части (index) должен быть от 0 до {count - 1}")
+        if mode not in SHARD_MODES:
+            raise ValueError(f"Неизвестный способ деления на части: {mode}")
+
+        positions = list(self._positions())
+        if mode == "contiguous":
+            start = len(positions) * index // count
+            end = len(positions) * (index + 1) // count
+            part = positions[start:end]
+        else:
+            part = positions[index::count]
+
+        self.select(part)
+        self.shard_info = {
+            "index": index,
+            "count": count,
+            "mode": mode,
+            "total": len(positions),
+            "size": len(part),
+        }
+        return self
+
+    def prerender(self, workers, chunk_size=256):
+        """
+        Включает формирование промптов в пуле из workers процессов.
+
+        Промпты формируются частями по chunk_size примеров на несколько частей
+        вперед, пока клиент отправляет предыдущие. Имеет смысл для дорогого
+        форматирования (например, с бюджетом токенов и токенизатором модели).
+        Генератор и его стратегия передаются в процессы пула, поэтому должны
+        сериализоваться pickle. workers < 2 - формирование в текущем процессе.
+        """
+        if chunk_size < 1:
+            raise ValueError("Размер части (chunk_size) должен быть не менее 1")
+        self.close()
+        self.render_workers = workers
+        self.render_chunk_size = chunk_size
+        return self
+
+    def close(self):
+        """Останавливает пул процессов формирования промптов, если он запущен."""
+        if self._prerendered is not None:
+            self._prerendered.close()
+            self._prerendered = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_prerendered"] = None
+        return state
+
+    def __len__(self):
+        return len(self.data) if self.order is None else len(self.order)
+
     def __iter__(self):
+        self.close()
         self.current_index = 0
         return self
 
-    def __next__(self):
-        if self.current_index >= len(self.data):
-            raise StopIteration
+    def generate_prompts(self, items):
+        """Пакетный вариант generate_prompt."""
+        return [self.generate_prompt(item) for item in items]
+
+    def _process_column(self, items):
+        """
+        Форматирует примеры стратегией self.strategy, группируя их по инструкции,
+        чтобы каждый шаблон отрисовывался для всего столбца сразу.
+        """
+        groups = {}
+        for i, item in enumerate(items):
+            groups.setdefault(item.get("instruction", ""), []).append(i)
+
+        prompts = [None] * len(items)
+        for instruction, rows in groups.items():
+            rendered = self.strategy.process_many(
+                instruction, [items[i].get("inputs", {}) for i in rows]
+            )
+            for i, prompt in zip(rows, rendered):
+                prompts[i] = prompt
+        return prompts
+
+    def _positions(self):
+        return range(len(self.data)) if self.order is None else self.order
+
+    def validate(self):
+        """
+        Проверяет до начала прогона, что во всех выдаваемых примерах есть поля
+        шаблонов их инструкций.
+
+        Raises:
+            ValueError: С перечнем недостающих полей и позиций примеров
+        """
+        groups = {}
+        for position in self._positions():
+            item = self.data[position]
+            groups.setdefault(item.get("instruction", ""), []).append((position, item))
+
+        for instruction, group in groups.items():
+            self.strategy.validate(
+                instruction,
+                [item.get("inputs", {}) for _, item in group],
+                row_ids=[position for position, _ in group],
+            )
 
-        item = self.data[self.current_index]
-        prompt = self.generate_prompt(item)
+    def _render_positions(self, positions):
+        items = [self.data[position] for position in positions]
+        prompts = self.generate_prompts(items)
+        return [
+            self._item_record(position, item, prompt)
+            for position, item, prompt in zip(positions, items, prompts)
+        ]
 
-        result = {
-            "index": self.current_index,
+    def _item_record(self, position, item, prompt):
+        return {
+            "index": position,
             "prompt": prompt,
             "domain": item.get("meta").get("domain", ""),
             "output": item.get("output", ""),
         }
 
+    def _add_prefix(self, record):
+        """Дополняет запись общим префиксом промптов, если он есть."""
+        return record
+
+    def _make_item(self, position):
+        item = self.data[position]
+        return self._item_record(position, item, self.generate_prompt(item))
+
+    def iter_items(self, skip_indices=None):
+        """
+        Выдает элементы, как итерация по генератору, но пропускает примеры
+        с индексами из skip_indices (например, уже обработанные по контрольной
+        точке) до формирования их промптов и учета бюджета токенов.
+        """
+        self.close()
+        positions = list(self._positions())
+        if skip_indices:
+            positions = [position for position in positions if position not in skip_indices]
+
+        if self.render_workers <= 1:
+            for position in positions:
+                yield self._make_item(position)
+            return
+
+        self._prerendered = _PrerenderedChunks(
+            self,
+            positions,
+            self.render_workers,
+            self.render_chunk_size,
+            prefetch=2 * self.render_workers,
+        )
+        try:
+            while True:
+                try:
+                    item = self._prerendered.next()
+                except StopIteration:
+                    return
+                yield item
+        finally:
+            self.close()
+
+    def __next__(self):
+        if self.current_index >= len(self):
+            self.close()
+            raise StopIteration
+
+        if self.render_workers > 1:
+            if self._prerendered is None:
+                self._prerendered = _PrerenderedChunks(
+                    self,
+                    list(self._positions())[self.current_index :],
+                    self.render_workers,
+                    self.render_chunk_size,
+                    prefetch=2 * self.render_workers,
+                )
+            result = self._prerendered.next()
+            self.current_index += 1
+            return result
+
+        position = self.current_index
+        if self.order is not None:
+            position = self.order[position]
+
+        result = self._make_item(position)
+
         self.current_index += 1
         return result
 
@@ -66,9 +355,32 @@ class SinglePromptGenerator(PromptGenerator):
 
         return self.strategy.process(instruction, inputs)
 
+    def generate_prompts(self, items):
+        return self._process_column(items)
+
 
 class FewShotPromptGenerator(PromptGenerator):
-    def __init__(self, strategy: PromptStrategy, n_shots: int = 5):
+    """
+    Генерация few-shot промптов.
+
+    Блок few-shot примеров с ответами форматируется один раз и кэшируется,
+    поэтому для каждого вопроса форматируется только он сам. При
+    per_domain=True примеры для каждого домена (meta.domain) берутся из того
+    же домена, как в стандартном протоколе MMLU: первые n_shots примеров
+    домена становятся few-shot примерами, остальные - вопросами.
+
+    При share_prefix=True элементы содержат поле prefix - блок few-shot
+    примеров, который клиент может отправить серверу один раз на пакет
+    (см. BatchModelClient, shared_prefix).
+    """
+
+    def __init__(
+        self,
+        strategy: PromptStrategy,
+        n_shots: int = 5,
+        per_domain: bool = False,
+        share_prefix: bool = False,
+    ):
         super().__init__()
         if n_shots < 1:
             raise ValueError("Количество few-shot примеров (n_shots) должно быть не менее 1")
@@ -76,17 +388,61 @@ class FewShotPromptGenerator(PromptGenerator):
             raise ValueError("Необходимо предоставить стратегию форматирования промпта")
         self.strategy = strategy
         self.n_shots = n_shots
+        self.per_domain = per_domain
+        self.share_prefix = share_prefix
         self.few_shot_examples = []
+        self.domain_few_shot_examples = {}
+        self._prefix_cache = {}
+
+    @staticmethod
+    def _domain(item):
+        return item.get("meta").get("domain", "")
+
+    def load_data(self, file_path, lazy=True):
+        super().load_data(file_path, lazy)
+        self._prefix_cache = {}
+        if self.per_domain:
+            return self._split_domain_shots()
 
-    def load_data(self, file_path):
-        super().load_data(file_path)
         if len(self.data) <= self.n_shots:
             raise ValueError(
                 f"Недостаточно данных ({len(self.data)}) для создания {self.n_shots} few-shot примеров."
             )
         
-        self.few_shot_examples = self.data[:self.n_shots]
+        self.few_shot_examples = list(self.data[:self.n_shots])
         self.data = self.data[self.n_shots:]
+        self.order = None
+        self.current_index = 0
+        return self
+
+    def _split_domain_shots(self):
+        """Отделяет первые n_shots примеров каждого домена в few-shot примеры."""
+        self.domain_few_shot_examples = {}
+        positions = []
+
+        for position, item in enumerate(self.data):
+            examples = self.domain_few_shot_examples.setdefault(self._domain(item), [])
+            if len(examples) < self.n_shots:
+                examples.append(item)
+            else:
+                positions.append(position)
+
+        short_domains = [
+            domain
+            for domain, examples in self.domain_few_shot_examples.items()
+            if len(examples) < self.n_shots
+        ]
+        if short_domains:
+            raise ValueError(
+                f"Недостаточно данных для создания {self.n_shots} few-shot примеров "
+                f"в доменах: {', '.join(short_domains)}"
+            )
+
+        if isinstance(self.data, JsonlDataset):
+            self.data = self.data.subset(positions)
+        else:
+            self.data = [self.data[position] for position in positions]
+        self.order = None
         self.current_index = 0
         return self
 
@@ -103,13 +459,42 @@ class FewShotPromptGenerator(PromptGenerator):
         else:
             return f"<client>\n{formatted_prompt}\n<client>\n<model>"
 
+    def few_shot_prefix(self, domain=None):
+        """
+        Общая для промптов часть: few-shot примеры с ответами.
+
+        Args:
+            domain: Домен вопроса (учитывается при per_domain=True)
+        """
+        key = domain if self.per_domain else None
+        prefix = self._prefix_cache.get(key)
+        if prefix is None:
+            examples = self.few_shot_examples
+            if self.per_domain:
+                examples = self.domain_few_shot_examples[key]
+            few_shot_prompts = [
+                self._format_example(example, include_answer=True) for example in examples
+            ]
+            prefix = "\n\n".join(few_shot_prompts) + "\n\n"
+            self._prefix_cache[key] = prefix
+        return prefix
+
     def generate_prompt(self, item):
         """Генерирует полный few-shot промпт."""
-        few_shot_prompts = [
-            self._format_example(example, include_answer=True)
-            for example in self.few_shot_examples
+        return self.few_shot_prefix(self._domain(item)) + self._format_example(
+            item, include_answer=False
+        )
+
+    def generate_prompts(self, items):
+        return [
+            self.few_shot_prefix(self._domain(item)) + f"<client>\n{body}\n<client>\n<model>"
+            for item, body in zip(items, self._process_column(items))
         ]
 
-        current_prompt = self._format_example(item, include_answer=False)
-        full_prompt = "\n\n".join(few_shot_prompts + [current_prompt])
-        return full_prompt
+    def _item_record(self, position, item, prompt):
+        return self._add_prefix(super()._item_record(position, item, prompt))
+
+    def _add_prefix(self, record):
+        if self.share_prefix:
+            record["prefix"] = self.few_shot_prefix(record["domain"])
+        return record
@@ -1,4 +1,9 @@
 from abc import ABCMeta, abstractmethod
+from functools import lru_cache
+
+from .templates import compile_template, substitute_field
+
+OPTION_LABELS = tuple((f"option_{letter}", f"{letter.upper()}. ") for letter in "abcdefghij")
 
 
 class PromptStrategy(metaclass=ABCMeta):
@@ -8,26 +13,111 @@ class PromptStrategy(metaclass=ABCMeta):
     def process(self, instruction, inputs):
         pass
 
+    def process_many(self, instruction, inputs_column):
+        """
+        Пакетный вариант process для примеров с одной инструкцией.
+
+        Raises:
+            ValueError: Если в части примеров не хватает полей шаблона
+                (проверяется до форматирования)
+        """
+        return [self.process(instruction, inputs) for inputs in inputs_column]
+
+    def validate(self, instruction, inputs_column, row_ids=None):
+        """Проверяет, что во всех примерах есть поля шаблона инструкции."""
+        compile_template(instruction).validate_many(inputs_column, row_ids=row_ids)
+
+    def take_stats(self):
+        """
+        Забирает накопленные счетчики стратегии (обнуляя их), чтобы передать
+        их из процесса пула формирования промптов; None - счетчиков нет.
+        """
+        return None
+
+    def add_stats(self, stats):
+        """Добавляет счетчики, полученные take_stats в другом процессе."""
+
 
 class OptionsPromptStrategy(PromptStrategy):
     """Стратегия для обработки промптов с вариантами ответов."""
 
+    @staticmethod
+    def _options(inputs):
+        return "\n".join(
+            f"{label}{inputs[option_key]}"
+            for option_key, label in OPTION_LABELS
+            if option_key in inputs
+        )
+
     def process(self, instruction, inputs):
-        inputs_copy = inputs.copy()
+        return compile_template(instruction).render(inputs, {"options": self._options(inputs)})
 
-        options = []
-        for letter in "abcdefghij":
-            option_key = f"option_{letter}"
-            if option_key in inputs_copy:
-                options.append(f"{letter.upper()}. {inputs_copy[option_key]}")
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _options_template(keys):
+        """Шаблон списка вариантов для примеров с набором полей keys."""
+        return "\n".join(
+            f"{label}{{{option_key}}}" for option_key, label in OPTION_LABELS if option_key in keys
+        )
 
-        inputs_copy["options"] = "\n".join(options)
-        return instruction.format(**inputs_copy)
+    def process_many(self, instruction, inputs_column):
+        self.validate(instruction, inputs_column)
+
+        # Примеры группируются по набору полей, и для каждой группы список
+        # вариантов встраивается в шаблон: один %-формат на пример
+        layouts = {}
+        for i, inputs in enumerate(inputs_column):
+            layouts.setdefault(tuple(inputs), []).append(i)
+
+        prompts = [None] * len(inputs_column)
+        for keys, rows in layouts.items():
+            column = [inputs_column[i] for i in rows]
+            template = substitute_field(instruction, "options", self._options_template(keys))
+            if template is None:
+                template = compile_template(instruction)
+                rendered = template.render_many(
+                    column, [{"options": self._options(inputs)} for inputs in column], validate=False
+                )
+            else:
+                rendered = template.render_many(column, validate=False)
+            for i, prompt in zip(rows, rendered):
+                prompts[i] = prompt
+        return prompts
+
+    def validate(self, instruction, inputs_column, row_ids=None):
+        compile_template(instruction).validate_many(
+            inputs_column, extra_fields=("options",), row_ids=row_ids
+        )
 
 
 class GenerationPromptStrategy(PromptStrategy):
     """Стратегия для обработки промптов для генерации текста."""
 
+    def __init__(self, budget=None):
+        """
+        Args:
+            budget: Бюджет токенов промпта (PromptBudget); длинные тексты
+                обрезаются по границе предложения
+        """
+        self.budget = budget
+
     def process(self, instruction, inputs):
-        formatted_instruction = instruction.format(**inputs)
-        return formatted_instruction
+        if self.budget is not None:
+            inputs = self.budget.fit(instruction, inputs)
+        return compile_template(instruction).render(inputs)
+
+    def process_many(self, instruction, inputs_column):
+        if self.budget is None:
+            return compile_template(instruction).render_many(inputs_column)
+
+        self.validate(instruction, inputs_column)
+        return compile_template(instruction).render_many(
+            self.budget.fit_many(instruction, inputs_column), validate=False
+        )
+
+    def take_stats(self):
+        return self.budget.take_counters() if self.budget is not None else None
+
+    def add_stats(self, stats):
+        if self.budget is not None:
+            self.budget.add_counters(stats)
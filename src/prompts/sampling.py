@@ -0,0 +1,163 @@
+import json
+import os
+import random
+from typing import Any, Callable, Dict, List, Optional
+
+from .prompt_generators import PromptGenerator
+
+
+def domain_strata(data: List[Dict[str, Any]]) -> List[str]:
+    """Страта примера - его домен (meta.domain), для MMLU и MMLU-Pro."""
+    return [(item.get("meta") or {}).get("domain", "") for item in data]
+
+
+class LengthBucketStrata:
+    """
+    Страта примера - корзина длины входного текста, для XLSum.
+
+    Границы корзин - квантили длины по всему набору данных, поэтому корзины
+    примерно равны по размеру.
+    """
+
+    def __init__(self, n_buckets: int = 4, field: str = "text"):
+        """
+        Args:
+            n_buckets: Количество корзин длины
+            field: Поле inputs, длина которого учитывается
+        """
+        if n_buckets < 1:
+            raise ValueError("Количество корзин (n_buckets) должно быть не менее 1")
+        self.n_buckets = n_buckets
+        self.field = field
+
+    def __call__(self, data: List[Dict[str, Any]]) -> List[str]:
+        lengths = [len(str(item.get("inputs", {}).get(self.field, ""))) for item in data]
+        if not lengths:
+            return []
+
+        ordered = sorted(lengths)
+        boundaries = [
+            ordered[min(len(ordered) - 1, len(ordered) * i // self.n_buckets)]
+            for i in range(1, self.n_buckets)
+        ]
+
+        strata = []
+        for length in lengths:
+            bucket = sum(1 for boundary in boundaries if length >= boundary)
+            strata.append(f"length_{bucket}")
+        return strata
+
+
+class StratifiedSampler:
+    """
+    Воспроизводимая стратифицированная подвыборка примеров.
+
+    Из каждой страты случайно (с фиксированным seed) отбирается либо доля
+    fraction примеров, либо per_stratum примеров, поэтому метрики по доменам
+    на подвыборке сопоставимы с полным прогоном. Выбранные позиции
+    сохраняются в манифест, и последующие запуски с тем же манифестом
+    используют ровно те же примеры.
+    """
+
+    def __init__(
+        self,
+        fraction: Optional[float] = None,
+        per_stratum: Optional[int] = None,
+        seed: int = 0,
+        strata_fn: Callable[[List[Dict[str, Any]]], List[str]] = domain_strata,
+    ):
+        """
+        Args:
+            fraction: Доля примеров каждой страты
+            per_stratum: Количество примеров из каждой страты
+            seed: Начальное значение генератора случайных чисел
+            strata_fn: Функция, возвращающая метку страты для каждого примера
+        """
+        if (fraction is None) == (per_stratum is None):
+            raise ValueError("Необходимо указать ровно один из параметров fraction и per_stratum")
+        if fraction is not None and not 0 < fraction <= 1:
+            raise ValueError("Доля примеров (fraction) должна быть в интервале (0, 1]")
+        if per_stratum is not None and per_stratum < 1:
+            raise ValueError("Количество примеров страты (per_stratum) должно быть не менее 1")
+
+        self.fraction = fraction
+        self.per_stratum = per_stratum
+        self.seed = seed
+        self.strata_fn = strata_fn
+        self.strata_counts = {}
+
+    def _sample_size(self, stratum_size: int) -> int:
+        if self.per_stratum is not None:
+            return min(self.per_stratum, stratum_size)
+        return max(1, round(self.fraction * stratum_size))
+
+    def sample(self, data: List[Dict[str, Any]]) -> List[int]:
+        """Возвращает отсортированные позиции отобранных примеров."""
+        positions_by_stratum = {}
+        for position, stratum in enumerate(self.strata_fn(data)):
+            positions_by_stratum.setdefault(stratum, []).append(position)
+
+        rng = random.Random(self.seed)
+        selected = []
+        self.strata_counts = {}
+        for stratum in sorted(positions_by_stratum):
+            positions = positions_by_stratum[stratum]
+            chosen = rng.sample(positions, self._sample_size(len(positions)))
+            self.strata_counts[stratum] = {"total": len(positions), "selected": len(chosen)}
+            selected.extend(chosen)
+
+        return sorted(selected)
+
+    def save_manifest(self, path: str, positions: List[int], data_size: int) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        manifest = {
+            "seed": self.seed,
+            "fraction": self.fraction,
+            "per_stratum": self.per_stratum,
+            "data_size": data_size,
+            "strata": self.strata_counts,
+            "positions": positions,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def load_manifest(path: str, data_size: int) -> List[int]:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if manifest["data_size"] != data_size:
+            raise ValueError(
+                f"Манифест {path} составлен для {manifest['data_size']} примеров, "
+                f"а загружено {data_size}"
+            )
+        return manifest["positions"]
+
+    def apply(
+        self, generator: PromptGenerator, manifest_path: Optional[str] = None
+    ) -> PromptGenerator:
+        """
+        Ограничивает генератор подвыборкой.
+
+        Если манифест manifest_path уже существует, используются сохраненные
+        в нем позиции, иначе подвыборка строится заново и сохраняется в него.
+        """
+        data_size = len(generator.data)
+
+        if manifest_path and os.path.exists(manifest_path):
+            positions = self.load_manifest(manifest_path, data_size)
+            print(f"Подвыборка из {len(positions)} примеров загружена из {manifest_path}")
+        else:
+            positions = self.sample(generator.data)
+            print(
+                f"Отобрано {len(positions)} из {data_size} примеров "
+                f"({len(self.strata_counts)} страт)"
+            )
+            if manifest_path:
+                self.save_manifest(manifest_path, positions, data_size)
+                print(f"Манифест подвыборки сохранен в {manifest_path}")
+
+        return generator.select(positions)
@@ -0,0 +1,191 @@
+from functools import lru_cache
+from operator import itemgetter
+from string import Formatter
+from typing import Any, FrozenSet, Iterable, List, Mapping, Optional, Sequence
+
+CONVERSIONS = {"r": repr, "s": str, "a": ascii}
+
+
+class CompiledTemplate:
+    """
+    Шаблон инструкции, разобранный один раз на литералы и поля.
+
+    Шаблон компилируется в строку %-форматирования, поэтому отрисовка дает
+    тот же результат, что и str.format(**values), но без повторного разбора
+    шаблона для каждого примера. Шаблоны с позиционными или составными
+    полями ({0}, {a.b}, {a[0]}) и вложенными спецификаторами формата
+    отрисовываются через str.format.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self.fields = set()
+        self._names = []
+        self._converters = []
+        self._simple = True
+        format_parts = []
+
+        for literal, name, format_spec, conversion in Formatter().parse(template):
+            format_parts.append(literal.replace("%", "%%"))
+            if name is None:
+                continue
+
+            if not name.isidentifier() or "{" in (format_spec or ""):
+                self._simple = False
+            root = name.split(".")[0].split("[")[0]
+            if root and not root.isdigit():
+                self.fields.add(root)
+
+            if conversion or format_spec:
+                self._converters.append(
+                    (len(self._names), CONVERSIONS.get(conversion), format_spec or "")
+                )
+            self._names.append(name)
+            format_parts.append("%s")
+
+        self._format = "".join(format_parts)
+        self._getter = itemgetter(*self._names) if self._names else None
+
+    def render(
+        self, values: Mapping[str, Any], extra: Optional[Mapping[str, Any]] = None
+    ) -> str:
+        """
+        Отрисовывает шаблон.
+
+        Args:
+            values: Значения полей
+            extra: Дополнительные значения полей (имеют приоритет над values)
+        """
+        if not self._simple:
+            return self.template.format(**({**values, **extra} if extra else values))
+
+        if self._getter is None:
+            return self._format % ()
+        if extra:
+            values = {**values, **extra}
+
+        args = self._getter(values)
+        if len(self._names) == 1:
+            args = (args,)
+        if self._converters:
+            args = list(args)
+            for i, conversion, format_spec in self._converters:
+                value = args[i] if conversion is None else conversion(args[i])
+                args[i] = format(value, format_spec)
+            args = tuple(args)
+
+        return self._format % args
+
+    def missing_fields(
+        self, values: Mapping[str, Any], extra_fields: Iterable[str] = ()
+    ) -> FrozenSet[str]:
+        return frozenset(self.fields.difference(values, extra_fields))
+
+    def validate_many(
+        self,
+        values_column: Sequence[Mapping[str, Any]],
+        extra_fields: Iterable[str] = (),
+        row_ids: Optional[Sequence[Any]] = None,
+    ) -> None:
+        """
+        Проверяет, что во всех наборах значений есть все поля шаблона.
+
+        Args:
+            values_column: Значения полей для каждого примера
+            extra_fields: Поля, значения которых передаются отдельно
+            row_ids: Идентификаторы примеров для сообщения об ошибке
+                (по умолчанию - номера в values_column)
+
+        Raises:
+            ValueError: Если в части наборов не хватает полей (с идентификаторами
+                первых таких наборов)
+        """
+        required = self.fields.difference(extra_fields)
+        missing = {}
+        for i, values in enumerate(values_column):
+            if values.keys() >= required:
+                continue
+            row_id = i if row_ids is None else row_ids[i]
+            missing.setdefault(frozenset(required.difference(values)), []).append(row_id)
+
+        if missing:
+            details = "; ".join(
+                f"{', '.join(sorted(fields))} - в {len(rows)} записях (номера: "
+                f"{', '.join(map(str, rows[:5]))}{', ...' if len(rows) > 5 else ''})"
+                for fields, rows in missing.items()
+            )
+            raise ValueError(f"В данных не хватает полей шаблона {self.template!r}: {details}")
+
+    def render_many(
+        self,
+        values_column: Sequence[Mapping[str, Any]],
+        extra_column: Optional[Sequence[Mapping[str, Any]]] = None,
+        validate: bool = True,
+    ) -> List[str]:
+        """
+        Отрисовывает шаблон для столбца значений.
+
+        Все наборы значений проверяются до отрисовки (см. validate_many),
+        поэтому ошибка в данных обнаруживается сразу, а не на середине прогона.
+
+        Args:
+            values_column: Значения полей для каждого примера
+            extra_column: Дополнительные значения полей для каждого примера
+            validate: Проверять наличие полей (False - если столбец уже проверен)
+        """
+        if validate:
+            extra_fields = extra_column[0].keys() if extra_column else ()
+            self.validate_many(values_column, extra_fields)
+
+        if extra_column:
+            values_column = [
+                {**values, **extra} for values, extra in zip(values_column, extra_column)
+            ]
+        if not self._simple or self._converters or self._getter is None:
+            return [self.render(values) for values in values_column]
+
+        # Основной случай - только простые поля: одно %-форматирование на пример
+        template_format = self._format
+        getter = self._getter
+        if len(self._names) == 1:
+            return [template_format % (getter(values),) for values in values_column]
+        return [template_format % getter(values) for values in values_column]
+
+
+@lru_cache(maxsize=1024)
+def compile_template(template: str) -> CompiledTemplate:
+    """Разобранный шаблон; каждый различный шаблон разбирается один раз."""
+    return CompiledTemplate(template)
+
+
+def _escape(literal: str) -> str:
+    return literal.replace("{", "{{").replace("}", "}}")
+
+
+@lru_cache(maxsize=1024)
+def substitute_field(template: str, name: str, replacement: str) -> Optional[CompiledTemplate]:
+    """
+    Шаблон, в котором поле {name} заменено шаблоном replacement.
+
+    Позволяет встроить в шаблон составное поле (например, список вариантов
+    ответа) и отрисовывать его одним форматированием вместе с остальными
+    полями. Возвращает None, если поле используется с преобразованием или
+    спецификатором формата и встроить его нельзя.
+    """
+    parts = []
+    for literal, field_name, format_spec, conversion in Formatter().parse(template):
+        parts.append(_escape(literal))
+        if field_name is None:
+            continue
+        if field_name == name:
+            if format_spec or conversion:
+                return None
+            parts.append(replacement)
+            continue
+        parts.append(
+            "{" + field_name
+            + (f"!{conversion}" if conversion else "")
+            + (f":{format_spec}" if format_spec else "")
+            + "}"
+        )
+    return compile_template("".join(parts))
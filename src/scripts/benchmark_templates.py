@@ -0,0 +1,168 @@
+import sys
+import random
+import argparse
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parents[2]
+sys.path.append(str(project_root))
+
+from src.prompts.prompt_strategies import GenerationPromptStrategy, OptionsPromptStrategy
+from src.prompts.datasets import JsonlDataset
+
+
+OPTIONS_TEMPLATE = (
+    "The following are multiple choice questions about {subject}.\n\n"
+    "{text}\n{options}\nAnswer:"
+)
+GENERATION_TEMPLATE = "Summarize the following text:\n{text}\n\nSUMMARY:"
+
+
+class LegacyOptionsPromptStrategy:
+    """Прежняя реализация OptionsPromptStrategy: str.format для каждого примера."""
+
+    def process(self, instruction, inputs):
+        inputs_copy = inputs.copy()
+
+        options = []
+        for letter in "abcdefghij":
+            option_key = f"option_{letter}"
+            if option_key in inputs_copy:
+                options.append(f"{letter.upper()}. {inputs_copy[option_key]}")
+
+        inputs_copy["options"] = "\n".join(options)
+        return instruction.format(**inputs_copy)
+
+
+class LegacyGenerationPromptStrategy:
+    """Прежняя реализация GenerationPromptStrategy."""
+
+    def process(self, instruction, inputs):
+        return instruction.format(**inputs)
+
+
+def synthetic_items(kind, num_items, seed):
+    """Синтетические примеры в формате обработанных наборов данных."""
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+
+    items = []
+    for i in range(num_items):
+        if kind == "options":
+            inputs = {
+                "subject": rng.choice(["math", "history", "biology", "law"]),
+                "text": " ".join(rng.choice(words) for _ in range(rng.randint(10, 60))),
+            }
+            for letter in "abcd":
+                inputs[f"option_{letter}"] = " ".join(rng.choice(words) for _ in range(3))
+            instruction = OPTIONS_TEMPLATE
+        else:
+            inputs = {"text": " ".join(rng.choice(words) for _ in range(rng.randint(100, 500)))}
+            instruction = GENERATION_TEMPLATE
+        items.append({"instruction": instruction, "inputs": inputs})
+    return items
+
+
+def parse_arguments():
+    """
+    Парсит аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(
+        description="Сравнение скорости отрисовки промптов прежними стратегиями "
+        "(str.format) и скомпилированными шаблонами"
+    )
+
+    parser.add_argument(
+        "--kind",
+        type=str,
+        default="options",
+        choices=["options", "generation"],
+        help="Стратегия: с вариантами ответов (MMLU) или для генерации (XLSum)",
+    )
+    parser.add_argument(
+        "--data_path",
+        type=str,
+        default=None,
+        help="Обработанный набор данных JSONL (по умолчанию - синтетический)",
+    )
+    parser.add_argument(
+        "--num_items",
+        type=int,
+        default=20000,
+        help="Количество синтетических примеров",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=5,
+        help="Количество повторов каждого замера (берется лучшее время)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed синтетических данных")
+
+    return parser.parse_args()
+
+
+def best_time(func, repeats):
+    best = None
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    args = parse_arguments()
+
+    if args.data_path:
+        items = list(JsonlDataset(args.data_path))
+    else:
+        items = synthetic_items(args.kind, args.num_items, args.seed)
+
+    if args.kind == "options":
+        legacy, strategy = LegacyOptionsPromptStrategy(), OptionsPromptStrategy()
+    else:
+        legacy, strategy = LegacyGenerationPromptStrategy(), GenerationPromptStrategy()
+
+    groups = {}
+    for item in items:
+        groups.setdefault(item["instruction"], []).append(item["inputs"])
+
+    def run_legacy():
+        return [legacy.process(item["instruction"], item["inputs"]) for item in items]
+
+    def run_compiled():
+        return [strategy.process(item["instruction"], item["inputs"]) for item in items]
+
+    def run_bulk():
+        prompts = []
+        for instruction, inputs_column in groups.items():
+            prompts.extend(strategy.process_many(instruction, inputs_column))
+        return prompts
+
+    legacy_time, legacy_prompts = best_time(run_legacy, args.repeats)
+    compiled_time, compiled_prompts = best_time(run_compiled, args.repeats)
+    bulk_time, bulk_prompts = best_time(run_bulk, args.repeats)
+
+    # Пакетная отрисовка идет по группам инструкций, поэтому сравнивается как мультимножество
+    if compiled_prompts != legacy_prompts or sorted(bulk_prompts) != sorted(legacy_prompts):
+        print("Ошибка: скомпилированные шаблоны дают промпты, отличные от str.format")
+        sys.exit(1)
+
+    print(f"Примеров: {len(items)}, различных инструкций: {len(groups)}")
+    for name, elapsed in (
+        ("str.format (прежние стратегии)", legacy_time),
+        ("скомпилированный шаблон, по одному", compiled_time),
+        ("скомпилированный шаблон, render_many", bulk_time),
+    ):
+        print(
+            f"{name}: {elapsed * 1000:.1f} мс, "
+            f"{len(items) / elapsed:.0f} промптов/с, x{legacy_time / elapsed:.2f}"
+        )
+
+
+# python3 src/scripts/benchmark_templates.py --kind options --num_items 20000
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import os
+import sys
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parents[2]
+sys.path.append(str(project_root))
+
+from src.client.async_model_client import AsyncBatchModelClient
+from src.client.multitask import FairTaskScheduler
+from src.client.telemetry import ClientTelemetry
+from src.client.transport import RetryPolicy
+from src.prompts.prompt_generators import FewShotPromptGenerator, SinglePromptGenerator
+from src.prompts.prompt_strategies import GenerationPromptStrategy, OptionsPromptStrategy
+from src.evaluation.evaluator import Evaluator
+from src.evaluation.parsers import MultipleChoiceParser, RegexParser
+from src.scripts.evaluate_mmlu import make_metric as make_mmlu_metric
+from src.scripts.evaluete_xlsum import make_metric as make_xlsum_metric
+
+
+def parse_arguments():
+    """
+    Парсит аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(
+        description="Одновременная оценка модели на MMLU и XLSum с общим планировщиком запросов"
+    )
+
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="0.0.0.0",
+        help="Хост, где запущен сервер с моделью",
+    )
+
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="Порт, на котором слушает сервер",
+    )
+
+    parser.add_argument(
+        "--endpoint",
+        type=str,
+        default="/api/v1/generate",
+        help="Эндпоинт для запросов к модели",
+    )
+
+    parser.add_argument(
+        "--language",
+        type=str,
+        default="russian",
+        choices=["russian", "english"],
+        help="Язык набора данных XLSum для оценки",
+    )
+
+    parser.add_argument(
+        "--max_in_flight_per_endpoint",
+        type=int,
+        default=4,
+        help="Максимальное количество запросов обеих задач, одновременно "
+        "обрабатываемых сервером",
+    )
+
+    parser.add_argument(
+        "--mmlu_weight",
+        type=float,
+        default=1.0,
+        help="Вес MMLU - доля сервера относительно XLSum",
+    )
+
+    parser.add_argument(
+        "--xlsum_weight",
+        type=float,
+        default=1.0,
+        help="Вес XLSum - доля сервера относительно MMLU",
+    )
+
+    parser.add_argument(
+        "--mmlu_batch_size",
+        type=int,
+        default=10,
+        help="Размер пакета для MMLU",
+    )
+
+    parser.add_argument(
+        "--xlsum_batch_size",
+        type=int,
+        default=10,
+        help="Размер пакета для XLSum",
+    )
+
+    parser.add_argument(
+        "--mmlu_max_tokens",
+        type=int,
+        default=10,
+        help="Максимальное количество токенов в ответе для MMLU",
+    )
+
+    parser.add_argument(
+        "--xlsum_max_tokens",
+        type=int,
+        default=128,
+        help="Максимальное количество токенов в ответе для XLSum",
+    )
+
+    parser.add_argument(
+        "--max_in_flight",
+        type=int,
+        default=4,
+        help="Максимальное количество пакетов каждой задачи, одновременно ожидающих "
+        "отправки или находящихся в обработке",
+    )
+
+    parser.add_argument(
+        "--connect_timeout",
+        type=float,
+        default=5.0,
+        help="Таймаут на установку соединения (в секундах)",
+    )
+
+    parser.add_argument(
+        "--read_timeout",
+        type=float,
+        default=300.0,
+        help="Таймаут на чтение ответа (в секундах)",
+    )
+
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=3,
+        help="Максимальное количество повторных попыток при ошибках",
+    )
+
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        default=os.path.join(project_root, "results", "evaluations"),
+        help="Директория для сохранения результатов",
+    )
+
+    return parser.parse_args()
+
+
+def make_client(args, batch_size, max_tokens, telemetry):
+    return AsyncBatchModelClient(
+        host=args.host,
+        port=args.port,
+        endpoint=args.endpoint,
+        batch_size=batch_size,
+        max_tokens=max_tokens,
+        temperature=0.0,
+        top_p=1.0,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        retry_policy=RetryPolicy(max_retries=args.max_retries),
+        telemetry=telemetry,
+        max_in_flight=args.max_in_flight,
+    )
+
+
+def main():
+    args = parse_arguments()
+
+    processed_data_dir = os.path.join(project_root, "data", "processed")
+    mmlu_data_path = os.path.join(processed_data_dir, "mmlu", "mmlu.jsonl")
+    xlsum_data_path = os.path.join(
+        processed_data_dir, "xlsum", f"xlsum_{args.language}.jsonl"
+    )
+
+    for data_path in (mmlu_data_path, xlsum_data_path):
+        if not os.path.exists(data_path):
+            print(f"Ошибка: Файл данных не найден по пути: {data_path}")
+            print(
+                "Пожалуйста, сначала запустите скрипт build_datasets.py для подготовки данных."
+            )
+            return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print(f"Инициализация клиентов для запросов к модели на {args.host}:{args.port}...")
+
+    mmlu_telemetry = ClientTelemetry()
+    xlsum_telemetry = ClientTelemetry()
+    mmlu_client = make_client(args, args.mmlu_batch_size, args.mmlu_max_tokens, mmlu_telemetry)
+    xlsum_client = make_client(
+        args, args.xlsum_batch_size, args.xlsum_max_tokens, xlsum_telemetry
+    )
+
+    mmlu_generator = FewShotPromptGenerator(strategy=OptionsPromptStrategy(), n_shots=3)
+    mmlu_generator.load_data(mmlu_data_path)
+    xlsum_generator = SinglePromptGenerator(strategy=GenerationPromptStrategy())
+    xlsum_generator.load_data(xlsum_data_path)
+
+    scheduler = FairTaskScheduler(max_in_flight_per_endpoint=args.max_in_flight_per_endpoint)
+    scheduler.add_task("mmlu", mmlu_client, mmlu_generator, weight=args.mmlu_weight)
+    scheduler.add_task("xlsum", xlsum_client, xlsum_generator, weight=args.xlsum_weight)
+
+    print("Инициализация парсеров и метрик для оценки ответов модели...")
+
+    evaluators = {
+        "mmlu": Evaluator(
+            parser=MultipleChoiceParser(case_sensitive=False),
+            metric=make_mmlu_metric(),
+            output_dir=args.output_dir,
+        ),
+        "xlsum": Evaluator(
+            parser=RegexParser(pattern=r"(.*)", group=1),
+            metric=make_xlsum_metric(args.language),
+            output_dir=args.output_dir,
+        ),
+    }
+
+    print("Начинаем одновременную оценку модели на MMLU и XLSum...")
+    print(
+        f"Параметры: max_in_flight_per_endpoint={args.max_in_flight_per_endpoint}, "
+        f"веса mmlu={args.mmlu_weight}, xlsum={args.xlsum_weight}"
+    )
+
+    results = scheduler.run()
+    mmlu_client.close()
+    xlsum_client.close()
+
+    scheduler_stats = scheduler.get_stats()
+    for name, task_stats in scheduler_stats["tasks"].items():
+        print(
+            f"{name}: {task_stats['prompts']} промптов за {task_stats['elapsed']:.1f} с, "
+            f"{task_stats['prompts_per_second']:.1f} промптов/с, "
+            f"ожидание в очереди p50={task_stats['queue_delay_p50']:.3f} с, "
+            f"p95={task_stats['queue_delay_p95']:.3f} с"
+        )
+
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    clients = {"mmlu": mmlu_client, "xlsum": xlsum_client}
+    filenames = {
+        "mmlu": f"mmlu_evaluation_{timestamp}.json",
+        "xlsum": f"xlsum_{args.language}_evaluation_{timestamp}.json",
+    }
+
+    for name, evaluator in evaluators.items():
+        evaluation_results = evaluator.evaluate_dataset(results[name])
+        run_info = clients[name].get_run_info()
+        run_info["fair_scheduler"] = scheduler_stats
+        evaluator.save_evaluation(evaluation_results, filenames[name], run_info=run_info)
+
+
+# python3 src/scripts/evaluate_concurrent.py --host 0.0.0.0 --port 8000 --mmlu_weight 2
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,32 @@ from pathlib import Path
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
-from src.client.model_client import BatchModelClient
-from src.prompts.prompt_generators import FewShotPromptGenerator
+from src.client.async_model_client import AsyncBatchModelClient
+from src.client.batch_sizing import AdaptiveBatchSizer
+from src.client.checkpoint import JsonlCheckpoint
+from src.client.codecs import COMPRESSIONS, JSON_CODECS, PayloadCodec
+from src.client.dedup import PromptDeduplicator
+from src.client.endpoints import EndpointPool
+from src.client.quarantine import QuarantineFile
+from src.client.response_cache import ResponseCache
+from src.client.scheduling import LengthBucketScheduler, PrefixGroupScheduler
+from src.client.scoring import LetterScorer
+from src.client.streaming import EarlyStopper
+from src.client.telemetry import ClientTelemetry
+from src.client.transport import RetryPolicy
+from src.prompts.prompt_generators import SHARD_MODES, FewShotPromptGenerator
 from src.prompts.prompt_strategies import OptionsPromptStrategy
+from src.prompts.sampling import StratifiedSampler
 from src.evaluation.evaluator import Evaluator
 from src.evaluation.parsers import MultipleChoiceParser
-from src.evaluation.metrics import AccuracyMetric, DomainAccuracyMetric, CompositeMetric
+from src.evaluation.sequential import SequentialEvaluator
+from src.evaluation.metrics import (
+    AccuracyMetric,
+    CalibrationMetric,
+    DomainAccuracyMetric,
+    CompositeMetric,
+    SamplingMetric,
+)
 
 
 def parse_arguments():
@@ -42,6 +62,21 @@ def parse_arguments():
         help="Эндпоинт для запросов к модели",
     )
 
+    parser.add_argument(
+        "--endpoints",
+        type=str,
+        default=None,
+        help="Список реплик сервера через запятую в виде host:port "
+        "(заменяет --host и --port)",
+    )
+
+    parser.add_argument(
+        "--health_check_interval",
+        type=float,
+        default=15.0,
+        help="Период проверки работоспособности реплик (в секундах)",
+    )
+
     parser.add_argument(
         "--batch_size",
         type=int,
@@ -49,6 +84,41 @@ def parse_arguments():
         help="Размер пакета для запросов",
     )
 
+    parser.add_argument(
+        "--adaptive_batch_size",
+        action="store_true",
+        help="Подбирать размер пакета по пропускной способности и ошибкам сервера "
+        "(--batch_size игнорируется)",
+    )
+
+    parser.add_argument(
+        "--initial_batch_size",
+        type=int,
+        default=8,
+        help="Начальный размер пакета при адаптивном подборе",
+    )
+
+    parser.add_argument(
+        "--max_batch_size",
+        type=int,
+        default=1024,
+        help="Максимальный размер пакета при адаптивном подборе",
+    )
+
+    parser.add_argument(
+        "--target_latency",
+        type=float,
+        default=None,
+        help="Целевая задержка пакета (в секундах) при адаптивном подборе",
+    )
+
+    parser.add_argument(
+        "--max_in_flight",
+        type=int,
+        default=4,
+        help="Максимальное количество пакетов, одновременно находящихся в обработке",
+    )
+
     parser.add_argument(
         "--max_tokens",
         type=int,
@@ -56,6 +126,279 @@ def parse_arguments():
         help="Максимальное количество токенов в ответе",
     )
 
+    parser.add_argument(
+        "--n_samples",
+        type=int,
+        default=1,
+        help="Количество ответов на каждый промпт в одном запросе; итоговый ответ "
+        "выбирается голосованием большинства",
+    )
+
+    parser.add_argument(
+        "--temperature",
+        type=float,
+        default=0.0,
+        help="Температура генерации (для нескольких ответов на промпт нужна temperature > 0)",
+    )
+
+    parser.add_argument(
+        "--scoring",
+        type=str,
+        choices=["generate", "logprobs"],
+        default="generate",
+        help="Способ получения ответа: генерация с разбором буквы или выбор варианта "
+        "с максимальной вероятностью следующего токена (один шаг декодирования)",
+    )
+
+    parser.add_argument(
+        "--per_domain_shots",
+        action="store_true",
+        help="Брать few-shot примеры из того же домена, что и вопрос (стандартный протокол MMLU)",
+    )
+
+    parser.add_argument(
+        "--shared_prefix",
+        action="store_true",
+        help="Отправлять few-shot примеры один раз на пакет и группировать "
+        "промпты с общим префиксом (для серверов с кэшированием префиксов)",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Потоковая генерация: прекращать генерацию ответа, как только он готов "
+        "или модель начинает следующую реплику (<model>/<client>)",
+    )
+
+    parser.add_argument(
+        "--length_bucketing",
+        action="store_true",
+        help="Группировать в пакеты промпты похожей длины, чтобы сократить паддинг на сервере",
+    )
+
+    parser.add_argument(
+        "--lookahead",
+        type=int,
+        default=2048,
+        help="Размер окна просмотра (в промптах) для группировки по длине",
+    )
+
+    parser.add_argument(
+        "--connect_timeout",
+        type=float,
+        default=5.0,
+        help="Таймаут на подключение к серверу (в секундах)",
+    )
+
+    parser.add_argument(
+        "--read_timeout",
+        type=float,
+        default=300.0,
+        help="Таймаут на чтение ответа сервера (в секундах)",
+    )
+
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=3,
+        help="Количество повторов запроса при ошибках 5xx и ошибках соединения",
+    )
+
+    parser.add_argument(
+        "--cache_path",
+        type=str,
+        default=os.path.join(project_root, "results", "cache", "responses.sqlite"),
+        help="Путь к дисковому кэшу ответов модели",
+    )
+
+    parser.add_argument(
+        "--cache_max_entries",
+        type=int,
+        default=1_000_000,
+        help="Максимальное количество ответов в кэше",
+    )
+
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Использовать дисковый кэш ответов модели (ключ включает адрес сервера "
+        "и --model_id)",
+    )
+
+    parser.add_argument(
+        "--model_id",
+        type=str,
+        default=None,
+        help="Идентификатор модели (чекпоинта): ответы разных моделей на одном "
+        "сервере не смешиваются в кэше",
+    )
+
+    parser.add_argument(
+        "--checkpoint_path",
+        type=str,
+        default=None,
+        help="Путь к файлу контрольной точки (по умолчанию в output_dir)",
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Продолжить обработку с контрольной точки, пропустив обработанные примеры",
+    )
+
+    parser.add_argument(
+        "--num_shards",
+        type=int,
+        default=1,
+        help="Количество частей набора данных для оценки на нескольких узлах",
+    )
+
+    parser.add_argument(
+        "--shard_index",
+        type=int,
+        default=0,
+        help="Номер части набора данных, оцениваемой на этом узле (от 0)",
+    )
+
+    parser.add_argument(
+        "--shard_mode",
+        type=str,
+        choices=SHARD_MODES,
+        default="contiguous",
+        help="Деление на части: contiguous - подряд идущие примеры, "
+        "strided - каждый num_shards-й пример",
+    )
+
+    parser.add_argument(
+        "--render_workers",
+        type=int,
+        default=0,
+        help="Количество процессов для формирования промптов заранее "
+        "(0 - в основном процессе)",
+    )
+
+    parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="Последовательная оценка в стратифицированном случайном порядке "
+        "с остановкой по доверительному интервалу точности",
+    )
+
+    parser.add_argument(
+        "--max_ci_width",
+        type=float,
+        default=0.02,
+        help="Ширина доверительного интервала точности, при которой оценка останавливается",
+    )
+
+    parser.add_argument(
+        "--baseline_accuracy",
+        type=float,
+        default=None,
+        help="Базовая точность: оценка останавливается, как только отличие от нее определено",
+    )
+
+    parser.add_argument(
+        "--baseline_margin",
+        type=float,
+        default=0.0,
+        help="Отличие от базовой точности, в пределах которого модели считаются равными",
+    )
+
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="Уровень доверия интервала при последовательной оценке (с учетом всех проверок)",
+    )
+
+    parser.add_argument(
+        "--min_examples",
+        type=int,
+        default=100,
+        help="Минимальное количество примеров до ранней остановки",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Начальное значение генератора случайного порядка примеров",
+    )
+
+    parser.add_argument(
+        "--sample_fraction",
+        type=float,
+        default=None,
+        help="Оценивать стратифицированную подвыборку: доля примеров каждой страты",
+    )
+
+    parser.add_argument(
+        "--sample_per_stratum",
+        type=int,
+        default=None,
+        help="Оценивать стратифицированную подвыборку: количество примеров каждой страты",
+    )
+
+    parser.add_argument(
+        "--sample_manifest",
+        type=str,
+        default=None,
+        help="Файл манифеста подвыборки; если он существует, используются сохраненные примеры",
+    )
+
+    parser.add_argument(
+        "--compression",
+        type=str,
+        choices=COMPRESSIONS,
+        default="none",
+        help="Сжатие тел запросов (zstd требует пакет zstandard)",
+    )
+
+    parser.add_argument(
+        "--json_codec",
+        type=str,
+        choices=JSON_CODECS,
+        default="json",
+        help="JSON-кодек запросов и ответов (auto - orjson, если он установлен)",
+    )
+
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Отправлять повторяющиеся промпты один раз за прогон (только при temperature=0)",
+    )
+
+    parser.add_argument(
+        "--quarantine_path",
+        type=str,
+        default=None,
+        help="JSONL-файл для промптов, на которых сервер завершается ошибкой "
+        "(по умолчанию - в директории результатов; при --isolate_failures)",
+    )
+
+    parser.add_argument(
+        "--isolate_failures",
+        action="store_true",
+        help="При ошибке пакета, вызванной содержимым промптов, искать ошибочные "
+        "промпты делением пакета и записывать их в карантинный файл вместо "
+        "завершения обработки",
+    )
+
+    parser.add_argument(
+        "--telemetry_path",
+        type=str,
+        default=None,
+        help="JSONL-файл для событий телеметрии пакетов",
+    )
+
+    parser.add_argument(
+        "--prometheus_path",
+        type=str,
+        default=None,
+        help="Текстовый файл метрик в формате Prometheus (textfile-коллектор)",
+    )
+
     parser.add_argument(
         "--output_dir",
         type=str,
@@ -63,7 +406,36 @@ def parse_arguments():
         help="Директория для сохранения результатов",
     )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    try:
+        # orjson и zstandard - необязательные пакеты
+        PayloadCodec(json_codec=args.json_codec, compression=args.compression)
+    except ImportError as e:
+        parser.error(str(e))
+    if args.n_samples > 1 and args.temperature == 0:
+        parser.error("--n_samples > 1 требует --temperature > 0: при temperature=0 все ответы совпадают")
+    return args
+
+
+def make_metric(calibration=False, n_samples=1):
+    """
+    Метрики оценки MMLU (используются также при объединении частей, см. merge_shards.py).
+
+    Args:
+        calibration: Оценивать калибровку вероятностей вариантов (при оценке
+            по логарифмам вероятностей)
+        n_samples: Количество ответов на промпт (при n_samples > 1 - метрики голосования)
+    """
+    metrics = [AccuracyMetric(), DomainAccuracyMetric()]
+    metric_names = ["accuracy", "domain"]
+    if calibration:
+        metrics.append(CalibrationMetric())
+        metric_names.append("calibration")
+    if n_samples > 1:
+        metrics.append(SamplingMetric(ks=sorted({1, n_samples})))
+        metric_names.append("sampling")
+
+    return CompositeMetric(metrics=metrics, metric_names=metric_names)
 
 
 def main():
@@ -83,56 +455,264 @@ def main():
 
     print(f"Инициализация клиента для запросов к модели на {args.host}:{args.port}...")
 
-    client = BatchModelClient(
+    cache = None
+    if args.cache:
+        if args.model_id is None:
+            print(
+                "Предупреждение: кэш ответов без --model_id - после смены модели на "
+                "сервере будут возвращаться ответы прежней модели"
+            )
+        cache = ResponseCache(args.cache_path, max_entries=args.cache_max_entries)
+
+    scheduler = None
+    if args.shared_prefix:
+        scheduler = PrefixGroupScheduler(
+            lookahead=args.lookahead, length_fn=len if args.length_bucketing else None
+        )
+    elif args.length_bucketing:
+        scheduler = LengthBucketScheduler(lookahead=args.lookahead)
+
+    batch_sizer = None
+    if args.adaptive_batch_size:
+        batch_sizer = AdaptiveBatchSizer(
+            initial_size=args.initial_batch_size,
+            max_size=args.max_batch_size,
+            target_latency=args.target_latency,
+        )
+
+    endpoint_pool = None
+    if args.endpoints:
+        endpoint_pool = EndpointPool.from_addresses(
+            args.endpoints.split(","),
+            args.endpoint,
+            health_check_interval=args.health_check_interval,
+        )
+        print(f"Реплики сервера: {', '.join(e.url for e in endpoint_pool.endpoints)}")
+
+    telemetry = ClientTelemetry(
+        events_path=args.telemetry_path, prometheus_path=args.prometheus_path
+    )
+
+    codec = PayloadCodec(json_codec=args.json_codec, compression=args.compression)
+
+    deduplicator = None
+    if args.dedup:
+        if args.temperature == 0:
+            deduplicator = PromptDeduplicator()
+        else:
+            print("Предупреждение: дедупликация промптов возможна только при temperature=0, отключена")
+
+    quarantine = None
+    if args.isolate_failures:
+        quarantine = QuarantineFile(
+            args.quarantine_path or os.path.join(args.output_dir, "mmlu_quarantine.jsonl")
+        )
+
+    parser = MultipleChoiceParser(case_sensitive=False)
+
+    early_stopper = None
+    if args.stream:
+        early_stopper = EarlyStopper(parser=parser)
+
+    scorer = None
+    if args.scoring == "logprobs":
+        scorer = LetterScorer(choices="ABCDEFGHIJ", answer_prefix="\n(")
+
+    client = AsyncBatchModelClient(
         host=args.host,
         port=args.port,
         endpoint=args.endpoint,
         batch_size=args.batch_size,
         max_tokens=args.max_tokens,
-        temperature=0.0,
+        temperature=args.temperature,
         top_p=1.0,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        retry_policy=RetryPolicy(max_retries=args.max_retries),
+        cache=cache,
+        scheduler=scheduler,
+        batch_sizer=batch_sizer,
+        endpoint_pool=endpoint_pool,
+        telemetry=telemetry,
+        early_stopper=early_stopper,
+        isolate_failures=args.isolate_failures,
+        quarantine=quarantine,
+        deduplicator=deduplicator,
+        model_id=args.model_id,
+        scorer=scorer,
+        shared_prefix=args.shared_prefix,
+        n_samples=args.n_samples,
+        codec=codec,
+        max_in_flight=args.max_in_flight,
     )
 
     prompt_strategy = OptionsPromptStrategy()
-    prompt_generator = FewShotPromptGenerator(strategy=prompt_strategy, n_shots=3)
+    prompt_generator = FewShotPromptGenerator(
+        strategy=prompt_strategy,
+        n_shots=3,
+        per_domain=args.per_domain_shots,
+        share_prefix=args.shared_prefix,
+    )
 
     print(f"Загрузка данных MMLU из файла: {mmlu_data_path}")
     prompt_generator.load_data(mmlu_data_path)
 
-    print("Инициализация парсера и метрик для оценки ответов модели...")
+    if args.sample_fraction is not None or args.sample_per_stratum is not None:
+        sampler = StratifiedSampler(
+            fraction=args.sample_fraction,
+            per_stratum=args.sample_per_stratum,
+            seed=args.seed,
+        )
+        sampler.apply(prompt_generator, manifest_path=args.sample_manifest)
 
-    parser = MultipleChoiceParser(case_sensitive=False)
+    shard_suffix = ""
+    if args.num_shards > 1:
+        prompt_generator.shard(args.shard_index, args.num_shards, mode=args.shard_mode)
+        shard_suffix = f".shard{args.shard_index}-of-{args.num_shards}"
+        print(
+            f"Часть {args.shard_index} из {args.num_shards} ({args.shard_mode}): "
+            f"{len(prompt_generator)} примеров"
+        )
 
-    accuracy_metric = AccuracyMetric()
-    domain_accuracy_metric = DomainAccuracyMetric()
+    # Недостающие поля шаблонов обнаруживаются до первого запроса к модели
+    prompt_generator.validate()
+    if args.render_workers > 1:
+        prompt_generator.prerender(args.render_workers)
 
-    composite_metric = CompositeMetric(
-        metrics=[accuracy_metric, domain_accuracy_metric],
-        metric_names=["accuracy", "domain"],
-    )
+    print("Инициализация парсера и метрик для оценки ответов модели...")
+
+    composite_metric = make_metric(calibration=scorer is not None, n_samples=args.n_samples)
 
     evaluator = Evaluator(
         parser=parser, metric=composite_metric, output_dir=args.output_dir
     )
 
     print(f"Начинаем оценку модели на наборе данных MMLU...")
-    print(f"Параметры: batch_size={args.batch_size}, max_tokens={args.max_tokens}")
-
-    results = client.process_dataset(generator=prompt_generator)
+    print(
+        f"Параметры: batch_size={args.batch_size}, max_tokens={args.max_tokens}, "
+        f"max_in_flight={args.max_in_flight}, scoring={args.scoring}"
+    )
 
-    print(f"Обработка завершена. Получено {len(results)} результатов.")
+    checkpoint_path = args.checkpoint_path or os.path.join(
+        args.output_dir, f"mmlu_checkpoint{shard_suffix}.jsonl"
+    )
+    checkpoint = JsonlCheckpoint(checkpoint_path, resume=args.resume)
+
+    if endpoint_pool is not None:
+        endpoint_pool.start()
+
+    if args.sequential:
+        sequential_evaluator = SequentialEvaluator(
+            evaluator,
+            max_ci_width=args.max_ci_width,
+            baseline=args.baseline_accuracy,
+            baseline_margin=args.baseline_margin,
+            confidence=args.confidence,
+            min_examples=args.min_examples,
+            seed=args.seed,
+        )
+        evaluation_results = sequential_evaluator.evaluate(
+            client, prompt_generator, checkpoint=checkpoint
+        )
+    else:
+        results = client.iter_dataset(generator=prompt_generator, checkpoint=checkpoint)
+        evaluation_results = evaluator.evaluate_dataset(results)
+    client.close()
+    prompt_generator.close()
+    run_info = client.get_run_info()
+    if prompt_generator.shard_info is not None:
+        run_info["shard"] = prompt_generator.shard_info
+    print(f"Повторных запросов: {run_info['async_transport']['retries']}")
+    telemetry_summary = run_info["telemetry"]
+    print(
+        f"Пропускная способность: {telemetry_summary['prompts_per_second']:.1f} промптов/с, "
+        f"задержка пакета p50={telemetry_summary['latency_p50']:.2f} с, "
+        f"p95={telemetry_summary['latency_p95']:.2f} с"
+    )
+    if early_stopper is not None:
+        streaming_stats = run_info["streaming"]
+        print(
+            f"Потоковая генерация: досрочно остановлено {streaming_stats['stopped_early']} "
+            f"ответов, прервано {streaming_stats['cancelled_streams']} "
+            f"из {streaming_stats['streams']} потоков"
+        )
+    print(
+        f"Передано {telemetry_summary['request_bytes']} байт запросов "
+        f"(до сжатия {telemetry_summary['raw_request_bytes']}), "
+        f"{telemetry_summary['response_bytes']} байт ответов; "
+        f"кодирование {telemetry_summary['encode_time']:.3f} с, "
+        f"декодирование {telemetry_summary['decode_time']:.3f} с"
+    )
+    if deduplicator is not None:
+        dedup_stats = run_info["dedup"]
+        print(
+            f"Повторяющихся промптов: {dedup_stats['duplicates']} "
+            f"({dedup_stats['dedup_ratio']:.2%})"
+        )
+    if quarantine is not None and quarantine.count > 0:
+        print(f"Промптов с ошибкой: {quarantine.count}, записаны в {quarantine.path}")
+    if cache is not None:
+        print(f"Кэш ответов: попаданий {cache.hits}, промахов {cache.misses}")
+    if endpoint_pool is not None:
+        for url, endpoint_stats in run_info["endpoints"].items():
+            print(
+                f"{url}: {endpoint_stats['prompts']} промптов, "
+                f"{endpoint_stats['prompts_per_second']:.1f} промптов/с, "
+                f"ошибок {endpoint_stats['errors']}"
+            )
+    if batch_sizer is not None:
+        print(f"Подобранный размер пакета: {batch_sizer.current_size}")
+    if args.shared_prefix:
+        print(
+            f"Отправлено {telemetry_summary['request_bytes']} байт запросов, "
+            f"смен префикса: {scheduler.get_stats()['prefix_switches']}"
+        )
+    if isinstance(scheduler, LengthBucketScheduler):
+        scheduler_stats = scheduler.get_stats()
+        print(
+            f"Доля паддинга: {scheduler_stats['padding_ratio_before']:.2%} -> "
+            f"{scheduler_stats['padding_ratio_after']:.2%}"
+        )
 
-    evaluation_results = evaluator.evaluate_dataset(results)
+    print(
+        f"Обработка завершена. Оценено {evaluation_results['total_examples']} результатов."
+    )
 
     print("\nРезультаты оценки:")
     print(f"Всего примеров: {evaluation_results['total_examples']}")
     print(f"Правильных ответов: {evaluation_results['correct_answers']}")
     print(f"Точность (accuracy): {evaluation_results['accuracy']:.4f}")
+    if args.sequential:
+        sequential = evaluation_results["sequential"]
+        print(
+            f"Доверительный интервал ({sequential['confidence']:.0%}): "
+            f"[{sequential['ci_lower']:.4f}, {sequential['ci_upper']:.4f}], "
+            f"причина остановки: {sequential['stop_reason']}"
+        )
+        print(
+            f"Отправлено {sequential['submitted']} из "
+            f"{sequential['total'] + sequential['failed']} примеров, "
+            f"сэкономлено запросов: {sequential['requests_saved']}"
+        )
+        if sequential["failed"]:
+            print(f"Примеров с ошибкой сервера (не оценены): {sequential['failed']}")
+    if scorer is not None:
+        print(
+            f"Калибровка: ECE={evaluation_results['calibration_ece']:.4f}, "
+            f"Brier={evaluation_results['calibration_brier']:.4f}"
+        )
+    if args.n_samples > 1:
+        print(
+            f"Голосование по {args.n_samples} ответам: средняя доля голосов "
+            f"{evaluation_results['sampling_mean_vote_share']:.2%}, "
+            f"pass@1={evaluation_results['sampling_pass@1']:.4f}, "
+            f"pass@{args.n_samples}={evaluation_results[f'sampling_pass@{args.n_samples}']:.4f}"
+        )
 
     timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    results_filename = f"mmlu_evaluation_{timestamp}.json"
+    results_filename = f"mmlu_evaluation{shard_suffix}_{timestamp}.json"
 
-    evaluator.save_evaluation(evaluation_results, results_filename)
+    evaluator.save_evaluation(evaluation_results, results_filename, run_info=run_info)
 
     print(
         f"\nРезультаты сохранены в файл: {os.path.join(args.output_dir, results_filename)}"
@@ -7,13 +7,28 @@ from pathlib import Path
 project_root = Path(__file__).parents[2]
 sys.path.append(str(project_root))
 
-from src.client.model_client import BatchModelClient
+from src.client.async_model_client import AsyncBatchModelClient
+from src.client.batch_sizing import AdaptiveBatchSizer
+from src.client.checkpoint import JsonlCheckpoint
+from src.client.codecs import COMPRESSIONS, JSON_CODECS, PayloadCodec
+from src.client.dedup import PromptDeduplicator
+from src.client.endpoints import EndpointPool
+from src.client.quarantine import QuarantineFile
+from src.client.response_cache import ResponseCache
+from src.client.scheduling import LengthBucketScheduler
+from src.client.streaming import EarlyStopper
+from src.client.telemetry import ClientTelemetry
+from src.client.transport import RetryPolicy
 from src.prompts.prompt_generators import (
+    SHARD_MODES,
     SinglePromptGenerator,
 )
 from src.prompts.prompt_strategies import (
     GenerationPromptStrategy,
 )
+from src.prompts.budget import CharRatioTokenCounter, PromptBudget, load_token_counter
+from src.prompts.datasets import JsonlDataset
+from src.prompts.sampling import LengthBucketStrata, StratifiedSampler
 from src.evaluation.evaluator import Evaluator
 from src.evaluation.parsers import RegexParser
 from src.evaluation.metrics import (
@@ -60,6 +75,21 @@ def parse_arguments():
         help="Язык набора данных XLSum для оценки",
     )
 
+    parser.add_argument(
+        "--endpoints",
+        type=str,
+        default=None,
+        help="Список реплик сервера через запятую в виде host:port "
+        "(заменяет --host и --port)",
+    )
+
+    parser.add_argument(
+        "--health_check_interval",
+        type=float,
+        default=15.0,
+        help="Период проверки работоспособности реплик (в секундах)",
+    )
+
     parser.add_argument(
         "--batch_size",
         type=int,
@@ -67,6 +97,41 @@ def parse_arguments():
         help="Размер пакета для запросов",
     )
 
+    parser.add_argument(
+        "--adaptive_batch_size",
+        action="store_true",
+        help="Подбирать размер пакета по пропускной способности и ошибкам сервера "
+        "(--batch_size игнорируется)",
+    )
+
+    parser.add_argument(
+        "--initial_batch_size",
+        type=int,
+        default=8,
+        help="Начальный размер пакета при адаптивном подборе",
+    )
+
+    parser.add_argument(
+        "--max_batch_size",
+        type=int,
+        default=1024,
+        help="Максимальный размер пакета при адаптивном подборе",
+    )
+
+    parser.add_argument(
+        "--target_latency",
+        type=float,
+        default=None,
+        help="Целевая задержка пакета (в секундах) при адаптивном подборе",
+    )
+
+    parser.add_argument(
+        "--max_in_flight",
+        type=int,
+        default=4,
+        help="Максимальное количество пакетов, одновременно находящихся в обработке",
+    )
+
     parser.add_argument(
         "--max_tokens",
         type=int,
@@ -74,6 +139,240 @@ def parse_arguments():
         help="Максимальное количество токенов в ответе",
     )
 
+    parser.add_argument(
+        "--max_context_tokens",
+        type=int,
+        default=None,
+        help="Размер контекста модели: текст статьи обрезается по границе предложения, "
+        "чтобы промпт и ответ (max_tokens) поместились в контекст",
+    )
+
+    parser.add_argument(
+        "--tokenizer",
+        type=str,
+        default=None,
+        help="Токенизатор transformers (имя или путь) для подсчета токенов промпта; "
+        "без него токены оцениваются по длине текста",
+    )
+
+    parser.add_argument(
+        "--chars_per_token",
+        type=float,
+        default=None,
+        help="Среднее количество символов на токен для оценки без токенизатора "
+        "(по умолчанию - калибруется по ответам сервера, см. --calibration_samples)",
+    )
+
+    parser.add_argument(
+        "--calibration_samples",
+        type=int,
+        default=32,
+        help="Количество статей, по количеству токенов которых (поле usage ответов "
+        "сервера) калибруется оценка без токенизатора; 0 - использовать приближенное "
+        "отношение символов на токен для языка",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Потоковая генерация: прекращать генерацию ответа, как только он готов "
+        "или модель начинает следующую реплику (<model>/<client>)",
+    )
+
+    parser.add_argument(
+        "--length_bucketing",
+        action="store_true",
+        help="Группировать в пакеты промпты похожей длины, чтобы сократить паддинг на сервере",
+    )
+
+    parser.add_argument(
+        "--lookahead",
+        type=int,
+        default=2048,
+        help="Размер окна просмотра (в промптах) для группировки по длине",
+    )
+
+    parser.add_argument(
+        "--connect_timeout",
+        type=float,
+        default=5.0,
+        help="Таймаут на подключение к серверу (в секундах)",
+    )
+
+    parser.add_argument(
+        "--read_timeout",
+        type=float,
+        default=300.0,
+        help="Таймаут на чтение ответа сервера (в секундах)",
+    )
+
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=3,
+        help="Количество повторов запроса при ошибках 5xx и ошибках соединения",
+    )
+
+    parser.add_argument(
+        "--cache_path",
+        type=str,
+        default=os.path.join(project_root, "results", "cache", "responses.sqlite"),
+        help="Путь к дисковому кэшу ответов модели",
+    )
+
+    parser.add_argument(
+        "--cache_max_entries",
+        type=int,
+        default=1_000_000,
+        help="Максимальное количество ответов в кэше",
+    )
+
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Использовать дисковый кэш ответов модели (ключ включает адрес сервера "
+        "и --model_id)",
+    )
+
+    parser.add_argument(
+        "--model_id",
+        type=str,
+        default=None,
+        help="Идентификатор модели (чекпоинта): ответы разных моделей на одном "
+        "сервере не смешиваются в кэше",
+    )
+
+    parser.add_argument(
+        "--checkpoint_path",
+        type=str,
+        default=None,
+        help="Путь к файлу контрольной точки (по умолчанию в output_dir)",
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Продолжить обработку с контрольной точки, пропустив обработанные примеры",
+    )
+
+    parser.add_argument(
+        "--num_shards",
+        type=int,
+        default=1,
+        help="Количество частей набора данных для оценки на нескольких узлах",
+    )
+
+    parser.add_argument(
+        "--shard_index",
+        type=int,
+        default=0,
+        help="Номер части набора данных, оцениваемой на этом узле (от 0)",
+    )
+
+    parser.add_argument(
+        "--shard_mode",
+        type=str,
+        choices=SHARD_MODES,
+        default="contiguous",
+        help="Деление на части: contiguous - подряд идущие примеры, "
+        "strided - каждый num_shards-й пример",
+    )
+
+    parser.add_argument(
+        "--render_workers",
+        type=int,
+        default=0,
+        help="Количество процессов для формирования промптов заранее "
+        "(0 - в основном процессе)",
+    )
+
+    parser.add_argument(
+        "--sample_fraction",
+        type=float,
+        default=None,
+        help="Оценивать стратифицированную подвыборку: доля примеров каждой страты",
+    )
+
+    parser.add_argument(
+        "--sample_per_stratum",
+        type=int,
+        default=None,
+        help="Оценивать стратифицированную подвыборку: количество примеров каждой страты",
+    )
+
+    parser.add_argument(
+        "--sample_manifest",
+        type=str,
+        default=None,
+        help="Файл манифеста подвыборки; если он существует, используются сохраненные примеры",
+    )
+
+    parser.add_argument(
+        "--length_buckets",
+        type=int,
+        default=4,
+        help="Количество корзин длины текста (страт) для подвыборки",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Начальное значение генератора случайных чисел подвыборки",
+    )
+
+    parser.add_argument(
+        "--compression",
+        type=str,
+        choices=COMPRESSIONS,
+        default="none",
+        help="Сжатие тел запросов (zstd требует пакет zstandard)",
+    )
+
+    parser.add_argument(
+        "--json_codec",
+        type=str,
+        choices=JSON_CODECS,
+        default="json",
+        help="JSON-кодек запросов и ответов (auto - orjson, если он установлен)",
+    )
+
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Отправлять повторяющиеся промпты один раз за прогон",
+    )
+
+    parser.add_argument(
+        "--quarantine_path",
+        type=str,
+        default=None,
+        help="JSONL-файл для промптов, на которых сервер завершается ошибкой "
+        "(по умолчанию - в директории результатов; при --isolate_failures)",
+    )
+
+    parser.add_argument(
+        "--isolate_failures",
+        action="store_true",
+        help="При ошибке пакета, вызванной содержимым промптов, искать ошибочные "
+        "промпты делением пакета и записывать их в карантинный файл вместо "
+        "завершения обработки",
+    )
+
+    parser.add_argument(
+        "--telemetry_path",
+        type=str,
+        default=None,
+        help="JSONL-файл для событий телеметрии пакетов",
+    )
+
+    parser.add_argument(
+        "--prometheus_path",
+        type=str,
+        default=None,
+        help="Текстовый файл метрик в формате Prometheus (textfile-коллектор)",
+    )
+
     parser.add_argument(
         "--output_dir",
         type=str,
@@ -81,7 +380,51 @@ def parse_arguments():
         help="Директория для сохранения результатов",
     )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    try:
+        # orjson и zstandard - необязательные пакеты
+        PayloadCodec(json_codec=args.json_codec, compression=args.compression)
+    except ImportError as e:
+        parser.error(str(e))
+    return args
+
+
+def calibrate_token_counter(client, data_path, num_samples, fallback):
+    """
+    Калибрует отношение символов на токен по количеству токенов первых
+    num_samples статей, которое сообщает сервер (usage.prompt_tokens).
+    При ошибке возвращает fallback (приближенное отношение для языка).
+    """
+    texts = []
+    for item in JsonlDataset(data_path):
+        text = item.get("inputs", {}).get("text")
+        if text:
+            texts.append(text)
+        if len(texts) >= num_samples:
+            break
+
+    try:
+        counter = CharRatioTokenCounter.from_usage(texts, client.send_batch_request(texts))
+    except Exception as e:
+        print(
+            f"Не удалось откалибровать оценку токенов по ответам сервера ({e}), "
+            f"используется {fallback.chars_per_token} символа на токен"
+        )
+        return fallback
+
+    print(
+        f"Оценка токенов откалибрована по {counter.calibration_texts} статьям: "
+        f"{counter.chars_per_token:.2f} символа на токен"
+    )
+    return counter
+
+
+def make_metric(language):
+    """Метрики оценки XLSum (используются также при объединении частей, см. merge_shards.py)."""
+    return CompositeMetric(
+        metrics=[BLEUMetric(language=language), ROUGEMetric()],
+        metric_names=["bleu", "rouge"],
+    )
 
 
 def main():
@@ -105,7 +448,57 @@ def main():
 
     print(f"Инициализация клиента для запросов к модели на {args.host}:{args.port}...")
 
-    client = BatchModelClient(
+    cache = None
+    if args.cache:
+        if args.model_id is None:
+            print(
+                "Предупреждение: кэш ответов без --model_id - после смены модели на "
+                "сервере будут возвращаться ответы прежней модели"
+            )
+        cache = ResponseCache(args.cache_path, max_entries=args.cache_max_entries)
+
+    scheduler = None
+    if args.length_bucketing:
+        scheduler = LengthBucketScheduler(lookahead=args.lookahead)
+
+    batch_sizer = None
+    if args.adaptive_batch_size:
+        batch_sizer = AdaptiveBatchSizer(
+            initial_size=args.initial_batch_size,
+            max_size=args.max_batch_size,
+            target_latency=args.target_latency,
+        )
+
+    endpoint_pool = None
+    if args.endpoints:
+        endpoint_pool = EndpointPool.from_addresses(
+            args.endpoints.split(","),
+            args.endpoint,
+            health_check_interval=args.health_check_interval,
+        )
+        print(f"Реплики сервера: {', '.join(e.url for e in endpoint_pool.endpoints)}")
+
+    telemetry = ClientTelemetry(
+        events_path=args.telemetry_path, prometheus_path=args.prometheus_path
+    )
+
+    codec = PayloadCodec(json_codec=args.json_codec, compression=args.compression)
+
+    deduplicator = None
+    if args.dedup:
+        deduplicator = PromptDeduplicator()
+
+    quarantine = None
+    if args.isolate_failures:
+        quarantine = QuarantineFile(
+            args.quarantine_path or os.path.join(args.output_dir, f"xlsum_{args.language}_quarantine.jsonl")
+        )
+
+    early_stopper = None
+    if args.stream:
+        early_stopper = EarlyStopper()
+
+    client = AsyncBatchModelClient(
         host=args.host,
         port=args.port,
         endpoint=args.endpoint,
@@ -113,38 +506,162 @@ def main():
         max_tokens=args.max_tokens,
         temperature=0.0,
         top_p=1.0,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        retry_policy=RetryPolicy(max_retries=args.max_retries),
+        cache=cache,
+        scheduler=scheduler,
+        batch_sizer=batch_sizer,
+        endpoint_pool=endpoint_pool,
+        telemetry=telemetry,
+        early_stopper=early_stopper,
+        isolate_failures=args.isolate_failures,
+        quarantine=quarantine,
+        deduplicator=deduplicator,
+        model_id=args.model_id,
+        codec=codec,
+        max_in_flight=args.max_in_flight,
     )
 
-    prompt_strategy = GenerationPromptStrategy()
+    prompt_budget = None
+    if args.max_context_tokens is not None:
+        token_counter = load_token_counter(
+            tokenizer=args.tokenizer,
+            language=args.language,
+            chars_per_token=args.chars_per_token,
+        )
+        if (
+            isinstance(token_counter, CharRatioTokenCounter)
+            and args.chars_per_token is None
+            and args.calibration_samples > 0
+        ):
+            token_counter = calibrate_token_counter(
+                client, xlsum_data_path, args.calibration_samples, token_counter
+            )
+        prompt_budget = PromptBudget(
+            token_counter,
+            max_context_tokens=args.max_context_tokens,
+            max_tokens=args.max_tokens,
+        )
+
+    prompt_strategy = GenerationPromptStrategy(budget=prompt_budget)
     prompt_generator = SinglePromptGenerator(strategy=prompt_strategy)
     prompt_generator.load_data(xlsum_data_path)
 
+    if args.sample_fraction is not None or args.sample_per_stratum is not None:
+        sampler = StratifiedSampler(
+            fraction=args.sample_fraction,
+            per_stratum=args.sample_per_stratum,
+            seed=args.seed,
+            strata_fn=LengthBucketStrata(n_buckets=args.length_buckets),
+        )
+        sampler.apply(prompt_generator, manifest_path=args.sample_manifest)
+
+    shard_suffix = ""
+    if args.num_shards > 1:
+        prompt_generator.shard(args.shard_index, args.num_shards, mode=args.shard_mode)
+        shard_suffix = f".shard{args.shard_index}-of-{args.num_shards}"
+        print(
+            f"Часть {args.shard_index} из {args.num_shards} ({args.shard_mode}): "
+            f"{len(prompt_generator)} примеров"
+        )
+
+    # Недостающие поля шаблонов обнаруживаются до первого запроса к модели
+    prompt_generator.validate()
+    if args.render_workers > 1:
+        prompt_generator.prerender(args.render_workers)
+
     print("Инициализация парсера и метрик для оценки ответов модели...")
 
     parser = RegexParser(pattern=r"(.*)", group=1)
 
-    bleu_metric = BLEUMetric(language=args.language)
-    rouge_metric = ROUGEMetric()
-
-    composite_metric = CompositeMetric(
-        metrics=[bleu_metric, rouge_metric],
-        metric_names=["bleu", "rouge"],
-    )
+    composite_metric = make_metric(args.language)
 
     evaluator = Evaluator(
         parser=parser, metric=composite_metric, output_dir=args.output_dir
     )
 
     print(f"Начинаем оценку модели на наборе данных XLSum ({args.language})...")
-    print(f"Параметры: batch_size={args.batch_size}, max_tokens={args.max_tokens}")
+    print(
+        f"Параметры: batch_size={args.batch_size}, max_tokens={args.max_tokens}, "
+        f"max_in_flight={args.max_in_flight}"
+    )
 
-    results = client.process_dataset(generator=prompt_generator)
+    checkpoint_path = args.checkpoint_path or os.path.join(
+        args.output_dir, f"xlsum_{args.language}_checkpoint{shard_suffix}.jsonl"
+    )
+    checkpoint = JsonlCheckpoint(checkpoint_path, resume=args.resume)
+
+    if endpoint_pool is not None:
+        endpoint_pool.start()
 
+    results = client.iter_dataset(generator=prompt_generator, checkpoint=checkpoint)
     evaluation_results = evaluator.evaluate_dataset(results)
+    client.close()
+    prompt_generator.close()
+    run_info = client.get_run_info()
+    if prompt_generator.shard_info is not None:
+        run_info["shard"] = prompt_generator.shard_info
+    if prompt_budget is not None:
+        run_info["prompt_budget"] = prompt_budget.get_stats()
+    print(f"Повторных запросов: {run_info['async_transport']['retries']}")
+    telemetry_summary = run_info["telemetry"]
+    print(
+        f"Пропускная способность: {telemetry_summary['prompts_per_second']:.1f} промптов/с, "
+        f"задержка пакета p50={telemetry_summary['latency_p50']:.2f} с, "
+        f"p95={telemetry_summary['latency_p95']:.2f} с"
+    )
+    if early_stopper is not None:
+        streaming_stats = run_info["streaming"]
+        print(
+            f"Потоковая генерация: досрочно остановлено {streaming_stats['stopped_early']} "
+            f"ответов, прервано {streaming_stats['cancelled_streams']} "
+            f"из {streaming_stats['streams']} потоков"
+        )
+    print(
+        f"Передано {telemetry_summary['request_bytes']} байт запросов "
+        f"(до сжатия {telemetry_summary['raw_request_bytes']}), "
+        f"{telemetry_summary['response_bytes']} байт ответов; "
+        f"кодирование {telemetry_summary['encode_time']:.3f} с, "
+        f"декодирование {telemetry_summary['decode_time']:.3f} с"
+    )
+    if deduplicator is not None:
+        dedup_stats = run_info["dedup"]
+        print(
+            f"Повторяющихся промптов: {dedup_stats['duplicates']} "
+            f"({dedup_stats['dedup_ratio']:.2%})"
+        )
+    if quarantine is not None and quarantine.count > 0:
+        print(f"Промптов с ошибкой: {quarantine.count}, записаны в {quarantine.path}")
+    if prompt_budget is not None:
+        budget_stats = run_info["prompt_budget"]
+        print(
+            f"Обрезано статей: {budget_stats['truncated_items']} из {budget_stats['items']} "
+            f"({budget_stats['truncated_share']:.2%}), сэкономлено "
+            f"{budget_stats['saved_tokens']} токенов промптов ({budget_stats['saved_share']:.2%})"
+        )
+    if cache is not None:
+        print(f"Кэш ответов: попаданий {cache.hits}, промахов {cache.misses}")
+    if endpoint_pool is not None:
+        for url, endpoint_stats in run_info["endpoints"].items():
+            print(
+                f"{url}: {endpoint_stats['prompts']} промптов, "
+                f"{endpoint_stats['prompts_per_second']:.1f} промптов/с, "
+                f"ошибок {endpoint_stats['errors']}"
+            )
+    if batch_sizer is not None:
+        print(f"Подобранный размер пакета: {batch_sizer.current_size}")
+    if scheduler is not None:
+        scheduler_stats = scheduler.get_stats()
+        print(
+            f"Доля паддинга: {scheduler_stats['padding_ratio_before']:.2%} -> "
+            f"{scheduler_stats['padding_ratio_after']:.2%}"
+        )
+
     timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    results_filename = f"xlsum_{args.language}_evaluation_{timestamp}.json"
+    results_filename = f"xlsum_{args.language}_evaluation{shard_suffix}_{timestamp}.json"
 
-    evaluator.save_evaluation(evaluation_results, results_filename)
+    evaluator.save_evaluation(evaluation_results, results_filename, run_info=run_info)
 
     print(
         f"\nРезультаты сохранены в файл: {os.path.join(args.output_dir, results_filename)}"
@@ -0,0 +1,255 @@
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parents[2]
+sys.path.append(str(project_root))
+
+from src.client.async_model_client import AsyncBatchModelClient
+from src.client.codecs import COMPRESSIONS, JSON_CODECS, PayloadCodec, get_json_codec
+from src.client.telemetry import ClientTelemetry
+from src.prompts.prompt_generators import SinglePromptGenerator
+from src.prompts.prompt_strategies import GenerationPromptStrategy
+from src.server.mock_server import MockModelServer, MockServerThread
+
+
+LOAD_TEST_TEMPLATE = "Summarize the following text:\n{text}\n\nSUMMARY:"
+
+
+def write_synthetic_dataset(path, num_prompts, prompt_length, seed):
+    """Записывает синтетический набор данных в формате обработанных наборов."""
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(num_prompts):
+            length = max(1, int(rng.gauss(prompt_length, prompt_length / 4)))
+            text = " ".join(rng.choice(words) for _ in range(length))
+            record = {
+                "instruction": LOAD_TEST_TEMPLATE,
+                "inputs": {"text": text},
+                "output": "",
+                "meta": {"id": i, "domain": "synthetic"},
+            }
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def parse_arguments():
+    """
+    Парсит аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест клиента на локальной замене сервера с моделью"
+    )
+
+    parser.add_argument(
+        "--host",
+        type=str,
+        default=None,
+        help="Хост внешнего сервера (по умолчанию запускается встроенный)",
+    )
+    parser.add_argument("--port", type=int, default=8765, help="Порт сервера")
+    parser.add_argument(
+        "--endpoint",
+        type=str,
+        default="/api/v1/generate",
+        help="Эндпоинт для запросов к модели",
+    )
+    parser.add_argument("--num_prompts", type=int, default=2000, help="Количество промптов")
+    parser.add_argument(
+        "--prompt_length", type=int, default=200, help="Средняя длина промпта в словах"
+    )
+    parser.add_argument("--batch_size", type=int, default=100, help="Размер пакета")
+    parser.add_argument(
+        "--max_in_flight",
+        type=int,
+        default=4,
+        help="Максимальное количество пакетов, одновременно находящихся в обработке",
+    )
+    parser.add_argument(
+        "--max_tokens", type=int, default=10, help="Максимальное количество токенов в ответе"
+    )
+    parser.add_argument(
+        "--per_token_latency",
+        type=float,
+        default=0.001,
+        help="Время генерации одного токена встроенным сервером (в секундах)",
+    )
+    parser.add_argument(
+        "--prefill_latency",
+        type=float,
+        default=0.0001,
+        help="Время обработки одного промпта встроенным сервером (в секундах)",
+    )
+    parser.add_argument(
+        "--error_rate",
+        type=float,
+        default=0.0,
+        help="Доля запросов, на которые встроенный сервер отвечает ошибкой",
+    )
+    parser.add_argument(
+        "--max_batch_size",
+        type=int,
+        default=None,
+        help="Максимальный размер пакета встроенного сервера",
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        choices=COMPRESSIONS,
+        default="none",
+        help="Сжатие тел запросов (zstd требует пакет zstandard)",
+    )
+    parser.add_argument(
+        "--json_codec",
+        type=str,
+        choices=JSON_CODECS,
+        default="json",
+        help="JSON-кодек клиента и встроенного сервера",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора")
+    parser.add_argument(
+        "--min_throughput",
+        type=float,
+        default=None,
+        help="Минимально допустимая пропускная способность (промптов/с); "
+        "при меньшем значении скрипт завершается с ошибкой",
+    )
+    parser.add_argument(
+        "--telemetry_path",
+        type=str,
+        default=None,
+        help="JSONL-файл для событий телеметрии пакетов",
+    )
+    parser.add_argument(
+        "--prometheus_path",
+        type=str,
+        default=None,
+        help="Текстовый файл метрик в формате Prometheus",
+    )
+    parser.add_argument(
+        "--output_file",
+        type=str,
+        default=None,
+        help="Файл для сохранения отчета в формате JSON",
+    )
+
+    args = parser.parse_args()
+    try:
+        # orjson и zstandard - необязательные пакеты
+        PayloadCodec(json_codec=args.json_codec, compression=args.compression)
+    except ImportError as e:
+        parser.error(str(e))
+    return args
+
+
+def run_load_test(args):
+    host = args.host or "127.0.0.1"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dataset_path = os.path.join(tmp_dir, "load_test.jsonl")
+        write_synthetic_dataset(
+            dataset_path, args.num_prompts, args.prompt_length, args.seed
+        )
+
+        prompt_generator = SinglePromptGenerator(strategy=GenerationPromptStrategy())
+        prompt_generator.load_data(dataset_path)
+
+        telemetry = ClientTelemetry(
+            events_path=args.telemetry_path, prometheus_path=args.prometheus_path
+        )
+        client = AsyncBatchModelClient(
+            host=host,
+            port=args.port,
+            endpoint=args.endpoint,
+            batch_size=args.batch_size,
+            max_tokens=args.max_tokens,
+            max_in_flight=args.max_in_flight,
+            telemetry=telemetry,
+            codec=PayloadCodec(json_codec=args.json_codec, compression=args.compression),
+        )
+
+        started = time.perf_counter()
+        results = client.process_dataset(generator=prompt_generator)
+        elapsed = time.perf_counter() - started
+        client.close()
+
+    errors = sum(1 for result in results if result.get("error"))
+    summary = telemetry.summary()
+
+    return {
+        "prompts": len(results),
+        "errors": errors,
+        "batches": summary["batches"],
+        "elapsed": elapsed,
+        "prompts_per_second": len(results) / elapsed if elapsed > 0 else 0.0,
+        "latency_p50": summary["latency_p50"],
+        "latency_p95": summary["latency_p95"],
+        "latency_p99": summary["latency_p99"],
+        "request_bytes": summary["request_bytes"],
+        "raw_request_bytes": summary["raw_request_bytes"],
+        "response_bytes": summary["response_bytes"],
+        "encode_time": summary["encode_time"],
+        "decode_time": summary["decode_time"],
+        "run_info": client.get_run_info(),
+    }
+
+
+def main():
+    args = parse_arguments()
+
+    server_thread = None
+    if args.host is None:
+        server = MockModelServer(
+            per_token_latency=args.per_token_latency,
+            prefill_latency=args.prefill_latency,
+            error_rate=args.error_rate,
+            max_batch_size=args.max_batch_size,
+            endpoint=args.endpoint,
+            seed=args.seed,
+            json_codec=get_json_codec(args.json_codec).name,
+        )
+        server_thread = MockServerThread(server, port=args.port).start()
+        print(f"Запущен встроенный сервер на порту {args.port}")
+
+    try:
+        report = run_load_test(args)
+    finally:
+        if server_thread is not None:
+            server_thread.stop()
+
+    print("\nРезультаты нагрузочного теста:")
+    print(f"Промптов: {report['prompts']}, ошибок: {report['errors']}")
+    print(f"Пакетов: {report['batches']}, время: {report['elapsed']:.2f} с")
+    print(f"Пропускная способность: {report['prompts_per_second']:.1f} промптов/с")
+    print(
+        f"Задержка пакета: p50={report['latency_p50'] * 1000:.1f} мс, "
+        f"p95={report['latency_p95'] * 1000:.1f} мс, "
+        f"p99={report['latency_p99'] * 1000:.1f} мс"
+    )
+    print(
+        f"Передано {report['request_bytes']} байт запросов "
+        f"(до сжатия {report['raw_request_bytes']}), {report['response_bytes']} байт ответов; "
+        f"кодирование {report['encode_time']:.3f} с, декодирование {report['decode_time']:.3f} с"
+    )
+
+    if args.output_file:
+        with open(args.output_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Отчет сохранен в {args.output_file}")
+
+    if args.min_throughput is not None and report["prompts_per_second"] < args.min_throughput:
+        print(
+            f"Пропускная способность ниже порога {args.min_throughput:.1f} промптов/с"
+        )
+        sys.exit(1)
+
+
+# python3 src/scripts/load_test.py --num_prompts 5000 --batch_size 100 --max_in_flight 4
+if __name__ == "__main__":
+    main()
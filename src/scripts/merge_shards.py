@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parents[2]
+sys.path.append(str(project_root))
+
+from src.client.checkpoint import merge_checkpoints
+from src.evaluation.evaluator import Evaluator
+from src.evaluation.parsers import MultipleChoiceParser, RegexParser
+from src.scripts.evaluate_mmlu import make_metric as make_mmlu_metric
+from src.scripts.evaluete_xlsum import make_metric as make_xlsum_metric
+
+
+def parse_arguments():
+    """
+    Парсит аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(
+        description="Объединение результатов частей набора данных, оцененных на разных узлах"
+    )
+
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="Контрольные точки частей (например, mmlu_checkpoint.shard0-of-4.jsonl ...)",
+    )
+
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="JSONL-файл для объединенных результатов",
+    )
+
+    parser.add_argument(
+        "--task",
+        type=str,
+        default=None,
+        choices=["mmlu", "xlsum"],
+        help="Оценить объединенные результаты как результаты задачи",
+    )
+
+    parser.add_argument(
+        "--language",
+        type=str,
+        default="russian",
+        choices=["russian", "english"],
+        help="Язык набора данных XLSum (для --task xlsum)",
+    )
+
+    parser.add_argument(
+        "--expected_total",
+        type=int,
+        default=None,
+        help="Ожидаемое количество результатов (размер набора данных или подвыборки)",
+    )
+
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        default=os.path.join(project_root, "results", "evaluations"),
+        help="Директория для сохранения оценки",
+    )
+
+    return parser.parse_args()
+
+
+def make_evaluator(task, language, output_dir, results):
+    """
+    Оценщик с теми же парсером и метриками, что в скриптах оценки задачи.
+
+    Режим оценки MMLU определяется по результатам: вероятности вариантов
+    (option_probs) - оценка по логарифмам вероятностей, список ответов
+    (model_outputs) - несколько ответов на промпт.
+    """
+    if task == "mmlu":
+        calibration = any("option_probs" in result for result in results)
+        n_samples = max((len(result.get("model_outputs") or ()) for result in results), default=1)
+        return Evaluator(
+            parser=MultipleChoiceParser(case_sensitive=False),
+            metric=make_mmlu_metric(calibration=calibration, n_samples=max(n_samples, 1)),
+            output_dir=output_dir,
+        )
+    return Evaluator(
+        parser=RegexParser(pattern=r"(.*)", group=1),
+        metric=make_xlsum_metric(language),
+        output_dir=output_dir,
+    )
+
+
+def main():
+    args = parse_arguments()
+
+    try:
+        results = merge_checkpoints(args.inputs)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+
+    print(f"Объединено {len(results)} результатов из {len(args.inputs)} файлов")
+    if args.expected_total is not None and len(results) != args.expected_total:
+        print(
+            f"Предупреждение: ожидалось {args.expected_total} результатов, "
+            f"не хватает {args.expected_total - len(results)}"
+        )
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        print(f"Объединенные результаты сохранены в файл: {args.output}")
+
+    if args.task is None:
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    evaluator = make_evaluator(args.task, args.language, args.output_dir, results)
+    evaluation_results = evaluator.evaluate_dataset(results)
+
+    name = "mmlu" if args.task == "mmlu" else f"xlsum_{args.language}"
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    results_filename = f"{name}_evaluation_merged_{timestamp}.json"
+    run_info = {"merged_from": args.inputs, "merged_results": len(results)}
+    evaluator.save_evaluation(evaluation_results, results_filename, run_info=run_info)
+
+    if args.task == "mmlu":
+        print(f"Точность (accuracy): {evaluation_results['accuracy']:.4f}")
+        if "calibration_ece" in evaluation_results:
+            print(
+                f"Калибровка: ECE={evaluation_results['calibration_ece']:.4f}, "
+                f"Brier={evaluation_results['calibration_brier']:.4f}"
+            )
+        if "sampling_pass@1" in evaluation_results:
+            print(f"pass@1={evaluation_results['sampling_pass@1']:.4f}")
+    print(
+        f"Оценка сохранена в файл: {os.path.join(args.output_dir, results_filename)}"
+    )
+
+
+# python3 src/scripts/merge_shards.py results/evaluations/mmlu_checkpoint.shard*-of-4.jsonl --task mmlu
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from aiohttp import web
+
+project_root = Path(__file__).parents[2]
+sys.path.append(str(project_root))
+
+from src.client.codecs import decompress
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class MockModelServer:
+    """
+    Локальная замена сервера с моделью для измерения пропускной способности клиента.
+
+    Поддерживает тот же протокол, что и настоящий сервер: одиночный запрос
+    с полем prompt и пакетный запрос с полем prompts. Если в запросе указано
+    поле choices, вместо генерации возвращаются логарифмы вероятностей
+    следующего токена для этих вариантов (поле logprobs). Пакет может быть
+    передан и в виде общего префикса с частями промптов (поля prefix и
+    suffixes); такие префиксы кэшируются, как KV-кэш настоящего сервера.
+    Поле n > 1 запрашивает несколько ответов на каждый промпт (поле texts):
+    промпт обрабатывается один раз, а ответы генерируются параллельно и при
+    temperature > 0 отличаются друг от друга.
+    Задержка ответа моделируется как prefill_latency на промпт плюс
+    prefill_token_latency на каждое слово промптов, не найденное в кэше
+    префиксов, плюс per_token_latency на каждый сгенерированный токен самого
+    длинного ответа пакета. При stream=true ответ передается потоком
+    Server-Sent Events по одному токену; если клиент закрывает соединение,
+    генерация прекращается. Тело запроса может быть сжато gzip или zstd
+    (заголовок Content-Encoding).
+    """
+
+    LETTERS = "ABCD"
+
+    def __init__(
+        self,
+        per_token_latency: float = 0.001,
+        prefill_latency: float = 0.0,
+        error_rate: float = 0.0,
+        max_batch_size: Optional[int] = None,
+        letter_mode: bool = False,
+        endpoint: str = "/api/v1/generate",
+        seed: Optional[int] = None,
+        prefill_token_latency: float = 0.0,
+        prefix_cache_size: int = 64,
+        poison_marker: Optional[str] = None,
+        json_codec: str = "json",
+    ):
+        """
+        Args:
+            per_token_latency: Время генерации одного токена (в секундах)
+            prefill_latency: Время обработки одного промпта (в секундах)
+            error_rate: Доля запросов, на которые сервер отвечает ошибкой 503
+            max_batch_size: Максимальный размер пакета, больше - ошибка 413
+            letter_mode: Отвечать на одиночные запросы полем letter
+            endpoint: Путь эндпоинта генерации
+            seed: Начальное значение генератора случайных чисел
+            prefill_token_latency: Время обработки одного слова промпта (в секундах)
+            prefix_cache_size: Количество префиксов, хранимых в кэше
+            poison_marker: Запрос, в промптах которого встречается эта строка,
+                завершается ошибкой 400 (для проверки изоляции ошибок)
+            json_codec: JSON-кодек ответов (json или orjson)
+        """
+        if json_codec == "orjson" and orjson is None:
+            raise ImportError("Для кодека orjson необходимо установить пакет orjson")
+
+        self.per_token_latency = per_token_latency
+        self.prefill_latency = prefill_latency
+        self.error_rate = error_rate
+        self.max_batch_size = max_batch_size
+        self.letter_mode = letter_mode
+        self.endpoint = endpoint
+        self.random = random.Random(seed)
+        self.prefill_token_latency = prefill_token_latency
+        self.prefix_cache_size = prefix_cache_size
+        self.prefix_cache = OrderedDict()
+        self.poison_marker = poison_marker
+        self.json_codec = json_codec
+
+        self.requests = 0
+        self.prompts = 0
+        self.errors = 0
+        self.prefill_tokens = 0
+        self.prefix_hits = 0
+        self.prefix_misses = 0
+        self.generated_tokens = 0
+        self.cancelled_streams = 0
+        self.compressed_requests = 0
+
+    def _letter(self, prompt: str, letters: str = LETTERS) -> str:
+        return letters[sum(map(ord, prompt[-64:])) % len(letters)]
+
+    def _score(self, prompt: str, choices: List[str]) -> Dict[str, Any]:
+        seed = sum(map(ord, prompt))
+        favored = choices[seed % len(choices)]
+        logprobs = {
+            letter: -0.1 if letter == favored else -2.0 - ((seed + i) % 7) * 0.5
+            for i, letter in enumerate(choices)
+        }
+        return {
+            "text": favored,
+            "logprobs": logprobs,
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": 1},
+        }
+
+    def _generate(self, prompt: str, max_tokens: int) -> Dict[str, Any]:
+        letter = self._letter(prompt)
+        tokens = [f"({letter})"] + ["lorem"] * max(0, max_tokens - 1)
+        return {
+            "text": " ".join(tokens),
+            "usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": len(tokens),
+            },
+        }
+
+    def _sample(
+        self, prompt: str, max_tokens: int, n: int, temperature: float
+    ) -> Dict[str, Any]:
+        """Несколько ответов на один промпт; при temperature > 0 часть из них случайна."""
+        letter = self._letter(prompt)
+        texts = []
+        for _ in range(n):
+            sample_letter = letter
+            if temperature > 0 and self.random.random() > 1 / (1 + temperature):
+                sample_letter = self.random.choice(self.LETTERS)
+            tokens = [f"({sample_letter})"] + ["lorem"] * max(0, max_tokens - 1)
+            texts.append(" ".join(tokens))
+        return {
+            "text": texts[0],
+            "texts": texts,
+            "usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": sum(len(text.split(" ")) for text in texts),
+            },
+        }
+
+    def _prefill_tokens(self, prompts: List[str], prefix: str = "") -> int:
+        """Количество слов промптов, которые нужно обработать с учетом кэша префиксов."""
+        tokens = sum(len(prompt.split()) for prompt in prompts)
+        if not prefix:
+            return tokens
+
+        prefix_tokens = len(prefix.split())
+        tokens -= prefix_tokens * len(prompts)
+        if prefix in self.prefix_cache:
+            self.prefix_cache.move_to_end(prefix)
+            self.prefix_hits += 1
+        else:
+            self.prefix_misses += 1
+            tokens += prefix_tokens
+            self.prefix_cache[prefix] = True
+            if len(self.prefix_cache) > self.prefix_cache_size:
+                self.prefix_cache.popitem(last=False)
+        return tokens
+
+    async def _stream(
+        self,
+        request: web.Request,
+        prompts: List[str],
+        max_tokens: int,
+        prefill_delay: float,
+    ) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        generations = [self._generate(prompt, max_tokens) for prompt in prompts]
+        tokens = [generation["text"].split(" ") for generation in generations]
+        await asyncio.sleep(prefill_delay)
+
+        try:
+            for step in range(max(map(len, tokens), default=0)):
+                await asyncio.sleep(self.per_token_latency)
+                for i, item_tokens in enumerate(tokens):
+                    if step >= len(item_tokens):
+                        continue
+                    self.generated_tokens += 1
+                    event = {"index": i, "text": (" " if step else "") + item_tokens[step]}
+                    if step == len(item_tokens) - 1:
+                        event["finished"] = True
+                        event["usage"] = generations[i]["usage"]
+                    await response.write(
+                        f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+                    )
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            self.cancelled_streams += 1
+
+        return response
+
+    def _json_response(self, data: Any, status: int = 200) -> web.Response:
+        if self.json_codec == "orjson":
+            return web.Response(
+                body=orjson.dumps(data), status=status, content_type="application/json"
+            )
+        return web.json_response(data, status=status)
+
+    async def _read_json(self, request: web.Request) -> Dict[str, Any]:
+        body = await request.read()
+        encoding = request.headers.get("Content-Encoding", "identity")
+        try:
+            body = decompress(body, encoding)
+        except (ImportError, ValueError) as e:
+            raise web.HTTPUnsupportedMediaType(text=str(e))
+        if encoding != "identity":
+            self.compressed_requests += 1
+
+        if self.json_codec == "orjson":
+            return orjson.loads(body)
+        return json.loads(body)
+
+    async def handle_generate(self, request: web.Request) -> web.Response:
+        data = await self._read_json(request)
+        self.requests += 1
+
+        if self.error_rate > 0 and self.random.random() < self.error_rate:
+            self.errors += 1
+            return self._json_response({"error": "Сервер перегружен"}, status=503)
+
+        max_tokens = int(data.get("max_tokens", 10))
+        choices = data.get("choices")
+        if choices:
+            max_tokens = 1
+
+        prefix = data.get("prefix", "")
+        if "suffixes" in data:
+            data["prompts"] = [prefix + suffix for suffix in data["suffixes"]]
+
+        if "prompts" in data:
+            prompts: List[str] = data["prompts"]
+            if self.max_batch_size is not None and len(prompts) > self.max_batch_size:
+                self.errors += 1
+                return self._json_response(
+                    {"error": f"Размер пакета превышает {self.max_batch_size}"}, status=413
+                )
+            if self.poison_marker and any(self.poison_marker in prompt for prompt in prompts):
+                self.errors += 1
+                return self._json_response({"error": "Некорректный промпт"}, status=400)
+
+            prefill_tokens = self._prefill_tokens(prompts, prefix)
+            prefill_delay = (
+                self.prefill_latency * len(prompts)
+                + self.prefill_token_latency * prefill_tokens
+            )
+            self.prompts += len(prompts)
+            self.prefill_tokens += prefill_tokens
+            if data.get("stream") and not choices:
+                return await self._stream(request, prompts, max_tokens, prefill_delay)
+
+            n = int(data.get("n", 1))
+            await asyncio.sleep(prefill_delay + self.per_token_latency * max_tokens)
+            self.generated_tokens += len(prompts) * max_tokens * n
+            if choices:
+                return self._json_response([self._score(prompt, choices) for prompt in prompts])
+            if n > 1:
+                temperature = float(data.get("temperature", 0.0))
+                return self._json_response(
+                    [self._sample(prompt, max_tokens, n, temperature) for prompt in prompts]
+                )
+            return self._json_response(
+                [self._generate(prompt, max_tokens) for prompt in prompts]
+            )
+
+        prompt = data.get("prompt", "")
+        prefill_tokens = self._prefill_tokens([prompt])
+        prefill_delay = self.prefill_latency + self.prefill_token_latency * prefill_tokens
+        self.prompts += 1
+        self.prefill_tokens += prefill_tokens
+        if data.get("stream") and not choices:
+            return await self._stream(request, [prompt], max_tokens, prefill_delay)
+
+        await asyncio.sleep(prefill_delay + self.per_token_latency * max_tokens)
+        self.generated_tokens += max_tokens
+
+        if choices:
+            return self._json_response(self._score(prompt, choices))
+        if self.letter_mode:
+            return self._json_response({"letter": self._letter(prompt)})
+        return self._json_response(self._generate(prompt, max_tokens))
+
+    def create_app(self) -> web.Application:
+        # Тело запроса распаковывается в _read_json: встроенная распаковка
+        # aiohttp не поддерживает zstd без дополнительных пакетов
+        app = web.Application(
+            client_max_size=1024**3, handler_args={"auto_decompress": False}
+        )
+        app.router.add_post(self.endpoint, self.handle_generate)
+        return app
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "prompts": self.prompts,
+            "errors": self.errors,
+            "prefill_tokens": self.prefill_tokens,
+            "prefix_hits": self.prefix_hits,
+            "prefix_misses": self.prefix_misses,
+            "generated_tokens": self.generated_tokens,
+            "cancelled_streams": self.cancelled_streams,
+            "compressed_requests": self.compressed_requests,
+        }
+
+
+class MockServerThread:
+    """Запускает MockModelServer в фоновом потоке со своим циклом событий."""
+
+    def __init__(
+        self,
+        server: MockModelServer,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        start_timeout: float = 10.0,
+    ):
+        """
+        Args:
+            server: Сервер
+            host: Хост
+            port: Порт (0 - свободный порт, выбранный системой)
+            start_timeout: Максимальное время ожидания запуска сервера (в секундах)
+        """
+        self.server = server
+        self.host = host
+        self.port = port
+        self.start_timeout = start_timeout
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._started = threading.Event()
+        self._error = None
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        self._runner = web.AppRunner(self.server.create_app())
+        try:
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, self.host, self.port)
+            self._loop.run_until_complete(site.start())
+            if self.port == 0:
+                # Порт, выбранный системой
+                self.port = self._runner.addresses[0][1]
+        except BaseException as e:
+            # Ошибка запуска (например, порт занят) передается в start()
+            self._error = e
+            self._loop.run_until_complete(self._runner.cleanup())
+            self._loop.close()
+            self._started.set()
+            return
+        self._started.set()
+
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self) -> "MockServerThread":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        if not self._started.wait(self.start_timeout):
+            raise TimeoutError(
+                f"Сервер не запустился за {self.start_timeout} с "
+                f"на {self.host}:{self.port}"
+            )
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+        return self
+
+    def stop(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def __enter__(self) -> "MockServerThread":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+
+def parse_arguments():
+    """
+    Парсит аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Локальная замена сервера с моделью")
+
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="Хост сервера")
+    parser.add_argument("--port", type=int, default=8000, help="Порт сервера")
+    parser.add_argument(
+        "--endpoint",
+        type=str,
+        default="/api/v1/generate",
+        help="Эндпоинт для запросов к модели",
+    )
+    parser.add_argument(
+        "--per_token_latency",
+        type=float,
+        default=0.001,
+        help="Время генерации одного токена (в секундах)",
+    )
+    parser.add_argument(
+        "--prefill_latency",
+        type=float,
+        default=0.0,
+        help="Время обработки одного промпта (в секундах)",
+    )
+    parser.add_argument(
+        "--prefill_token_latency",
+        type=float,
+        default=0.0,
+        help="Время обработки одного слова промпта, не найденного в кэше префиксов (в секундах)",
+    )
+    parser.add_argument(
+        "--error_rate",
+        type=float,
+        default=0.0,
+        help="Доля запросов, завершающихся ошибкой 503",
+    )
+    parser.add_argument(
+        "--max_batch_size",
+        type=int,
+        default=None,
+        help="Максимальный размер пакета (больше - ошибка 413)",
+    )
+    parser.add_argument(
+        "--letter_mode",
+        action="store_true",
+        help="Отвечать на одиночные запросы полем letter",
+    )
+    parser.add_argument(
+        "--json_codec",
+        type=str,
+        choices=["json", "orjson"],
+        default="json",
+        help="JSON-кодек ответов",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+
+    server = MockModelServer(
+        per_token_latency=args.per_token_latency,
+        prefill_latency=args.prefill_latency,
+        error_rate=args.error_rate,
+        max_batch_size=args.max_batch_size,
+        letter_mode=args.letter_mode,
+        prefill_token_latency=args.prefill_token_latency,
+        endpoint=args.endpoint,
+        json_codec=args.json_codec,
+    )
+
+    print(f"Локальный сервер модели запущен на {args.host}:{args.port}{args.endpoint}")
+    web.run_app(server.create_app(), host=args.host, port=args.port, print=None)
+
+
+# python3 src/server/mock_server.py --port 8000 --per_token_latency 0.001
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parents[1]
+sys.path.append(str(project_root))
+
+from src.prompts.prompt_generators import SinglePromptGenerator
+from src.prompts.prompt_strategies import GenerationPromptStrategy
+from src.server.mock_server import MockModelServer, MockServerThread
+
+
+def make_items(n_items, texts=None):
+    """Примеры в формате обработанных наборов данных."""
+    texts = texts or {}
+    return [
+        {
+            "instruction": "Question {text}\nAnswer:",
+            "inputs": {"text": texts.get(i, f"item {i}")},
+            "output": f"answer {i}",
+            "meta": {"domain": "test"},
+        }
+        for i in range(n_items)
+    ]
+
+
+def expected_output(server, prompt, max_tokens=10):
+    """Ответ MockModelServer на промпт (без потоковой генерации)."""
+    return server._generate(prompt, max_tokens)["text"]
+
+
+def make_generator(items):
+    generator = SinglePromptGenerator(GenerationPromptStrategy())
+    generator.data = items
+    return generator
+
+
+@pytest.fixture
+def mock_server():
+    """Запускает MockModelServer на свободном порту; возвращает (сервер, порт)."""
+    threads = []
+
+    def start(**server_kwargs):
+        server_kwargs.setdefault("per_token_latency", 0.0)
+        server = MockModelServer(**server_kwargs)
+        thread = MockServerThread(server, port=0).start()
+        threads.append(thread)
+        return server, thread.port
+
+    yield start
+
+    for thread in threads:
+        thread.stop()
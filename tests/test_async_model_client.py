@@ -0,0 +1,51 @@
+import asyncio
+
+from src.client.async_model_client import AsyncBatchModelClient
+from src.client.dedup import PromptDeduplicator
+from src.client.transport import RetryPolicy
+
+from conftest import expected_output, make_generator, make_items
+
+
+def test_async_results_in_index_order(mock_server):
+    # Промпты первого пакета длиннее, поэтому его ответ приходит позже
+    # ответов следующих пакетов, отправленных одновременно с ним
+    texts = {i: " ".join(["word"] * 400) + f" {i}" for i in range(5)}
+    server, port = mock_server(prefill_token_latency=0.0001)
+    client = AsyncBatchModelClient(port=port, batch_size=5, max_in_flight=4)
+
+    results = list(client.iter_dataset(make_generator(make_items(40, texts))))
+
+    assert [result["index"] for result in results] == list(range(40))
+    for result in results:
+        assert result["error"] is None
+        assert result["model_output"] == expected_output(server, result["prompt"])
+    assert server.requests == 8
+
+
+def test_dedup_waiters_see_the_original_error(mock_server):
+    server, port = mock_server(poison_marker="POISON")
+    client = AsyncBatchModelClient(
+        port=port,
+        batch_size=2,
+        deduplicator=PromptDeduplicator(),
+        retry_policy=RetryPolicy(max_retries=0),
+    )
+    first = [{"index": 0, "prompt": "POISON"}, {"index": 1, "prompt": "shared"}]
+    second = [{"index": 2, "prompt": "shared"}, {"index": 3, "prompt": "other"}]
+
+    async def run():
+        async with client.async_transport:
+            return await asyncio.gather(
+                *(
+                    client._process_batch_async(batch, [item["prompt"] for item in batch])
+                    for batch in (first, second)
+                ),
+                return_exceptions=True,
+            )
+
+    first_error, second_error = asyncio.run(run())
+
+    # Второй пакет ждал ответ на "shared" от первого и получил его ошибку
+    assert isinstance(first_error, Exception)
+    assert second_error is first_error
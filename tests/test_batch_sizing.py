@@ -0,0 +1,51 @@
+import requests
+
+from src.client.batch_sizing import AdaptiveBatchSizer
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+def test_server_error_does_not_lower_ceiling():
+    sizer = AdaptiveBatchSizer(initial_size=64, max_size=256)
+
+    assert sizer.record_failure(64, http_error(503))
+    assert sizer.current_size == 32
+    assert sizer.max_size == 256
+
+
+def test_timeout_ceiling_recovers_after_successes():
+    sizer = AdaptiveBatchSizer(initial_size=64, max_size=256, recovery_successes=3)
+
+    assert sizer.record_failure(64, requests.Timeout())
+    assert sizer.max_size == 32
+
+    for _ in range(3):
+        sizer.record_success(32, 1.0)
+    assert sizer.max_size == 64
+    assert not sizer.settled
+    assert sizer.recoveries == 1
+
+
+def test_rejected_size_is_not_retried():
+    sizer = AdaptiveBatchSizer(initial_size=64, max_size=256, recovery_successes=1)
+
+    assert sizer.record_failure(64, http_error(413))
+    assert sizer.size_limit == 63
+
+    sizer.record_success(32, 1.0)
+    assert sizer.max_size == 63
+
+
+def test_latency_is_divided_between_concurrent_batches():
+    sizer = AdaptiveBatchSizer(initial_size=16, target_latency=1.5)
+
+    sizer.record_success(16, 4.0, concurrency=4)
+    assert sizer.latency_violations == 0
+    assert sizer.current_size == 32
+
+    sizer.record_success(32, 4.0)
+    assert sizer.latency_violations == 1
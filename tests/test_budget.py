@@ -0,0 +1,21 @@
+import pytest
+
+from src.client.model_client import BatchModelClient
+from src.prompts.budget import CharRatioTokenCounter
+
+
+def test_char_ratio_calibrated_from_server_usage(mock_server):
+    # MockModelServer считает токеном промпта каждое слово
+    server, port = mock_server()
+    texts = ["один два три", "четыре пять", "шесть"]
+    client = BatchModelClient(port=port, max_tokens=1)
+
+    counter = CharRatioTokenCounter.from_usage(texts, client.send_batch_request(texts))
+
+    assert counter.chars_per_token == sum(map(len, texts)) / 6
+    assert counter.describe()["calibration_texts"] == 3
+
+
+def test_char_ratio_calibration_requires_usage():
+    with pytest.raises(ValueError):
+        CharRatioTokenCounter.from_usage(["текст"], [{"text": "ответ"}])
@@ -0,0 +1,54 @@
+from src.client.checkpoint import JsonlCheckpoint
+from src.client.model_client import BatchModelClient
+from src.prompts.budget import CharRatioTokenCounter, PromptBudget
+from src.prompts.prompt_strategies import GenerationPromptStrategy
+
+from conftest import make_generator, make_items
+
+
+def test_checkpoint_torn_tail_recovery_and_resume(mock_server, tmp_path):
+    server, port = mock_server()
+    items = make_items(20)
+    path = str(tmp_path / "checkpoint.jsonl")
+
+    client = BatchModelClient(port=port, batch_size=5)
+    full_results = client.process_dataset(make_generator(items))
+
+    # Сбой во время записи: сохранены два пакета и начало записи третьего
+    checkpoint = JsonlCheckpoint(path)
+    checkpoint.append(full_results[:10])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"index": 10, "prompt": "Quest')
+
+    assert JsonlCheckpoint(path, resume=True).load_indices() == set(range(10))
+    with open(path, "rb") as f:
+        assert f.read().endswith(b"\n")
+
+    requests_before = server.prompts
+    client = BatchModelClient(port=port, batch_size=5)
+    results = client.process_dataset(
+        make_generator(items), checkpoint=JsonlCheckpoint(path, resume=True)
+    )
+
+    assert server.prompts - requests_before == 10
+    assert client.resumed_count == 10
+    assert results == full_results
+    assert sorted(JsonlCheckpoint(path, resume=True).load()) == list(range(20))
+
+
+def test_resumed_items_are_not_rendered(mock_server, tmp_path):
+    server, port = mock_server()
+    items = make_items(20)
+    path = str(tmp_path / "checkpoint.jsonl")
+
+    client = BatchModelClient(port=port, batch_size=5)
+    JsonlCheckpoint(path).append(client.process_dataset(make_generator(items))[:10])
+
+    budget = PromptBudget(CharRatioTokenCounter(), max_context_tokens=1000)
+    generator = make_generator(items)
+    generator.set_strategy(GenerationPromptStrategy(budget=budget))
+    client = BatchModelClient(port=port, batch_size=5)
+    client.process_dataset(generator, checkpoint=JsonlCheckpoint(path, resume=True))
+
+    # Бюджет учитывает только отправленные промпты
+    assert budget.items == 10
@@ -0,0 +1,20 @@
+import json
+
+from src.prompts.datasets import JsonlDataset
+
+
+def test_whitespace_only_lines_are_skipped(tmp_path):
+    path = tmp_path / "data.jsonl"
+    records = [{"id": 0}, {"id": 1}, {"id": 2}]
+    path.write_bytes(
+        json.dumps(records[0]).encode() + b"\n"
+        + b"    \n"
+        + b"\r\n"
+        + json.dumps(records[1]).encode() + b"\n"
+        + b"\t \t \n"
+        + json.dumps(records[2]).encode() + b"\n"
+    )
+
+    dataset = JsonlDataset(str(path), save_index=False)
+    assert len(dataset) == 3
+    assert list(dataset) == records
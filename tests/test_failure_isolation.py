@@ -0,0 +1,55 @@
+import pytest
+import requests
+
+from src.client.async_model_client import AsyncBatchModelClient
+from src.client.model_client import BatchModelClient
+from src.client.transport import RetryPolicy
+
+from conftest import expected_output, make_generator, make_items
+
+
+@pytest.mark.parametrize("client_class", [BatchModelClient, AsyncBatchModelClient])
+def test_bisection_isolates_poisoned_prompt(mock_server, client_class):
+    server, port = mock_server(poison_marker="POISON")
+    items = make_items(32, {13: "POISON item 13"})
+    client = client_class(
+        port=port,
+        batch_size=16,
+        retry_policy=RetryPolicy(max_retries=0),
+        isolate_failures=True,
+    )
+
+    results = client.process_dataset(make_generator(items))
+
+    assert [result["index"] for result in results] == list(range(32))
+    assert [result["index"] for result in results if result["error"]] == [13]
+    assert client.isolation_stats == {"bisections": 4, "failed_prompts": 1}
+    for result in results:
+        if not result["error"]:
+            assert result["model_output"] == expected_output(server, result["prompt"])
+
+
+def test_bisection_depth_is_bounded(mock_server):
+    server, port = mock_server(poison_marker="POISON")
+    items = make_items(16, {5: "POISON item 5"})
+    client = BatchModelClient(
+        port=port,
+        batch_size=16,
+        retry_policy=RetryPolicy(max_retries=0),
+        isolate_failures=True,
+        max_bisect_depth=1,
+    )
+
+    results = client.process_dataset(make_generator(items))
+
+    assert [result["index"] for result in results if result["error"]] == list(range(8))
+    assert client.isolation_stats == {"bisections": 1, "failed_prompts": 8}
+
+
+def test_poisoned_batch_fails_without_isolation(mock_server):
+    server, port = mock_server(poison_marker="POISON")
+    client = BatchModelClient(port=port, batch_size=8, retry_policy=RetryPolicy(max_retries=0))
+
+    with pytest.raises(requests.HTTPError):
+        client.process_dataset(make_generator(make_items(8, {3: "POISON item 3"})))
+    assert client.get_run_info()["isolate_failures"] is False
@@ -0,0 +1,34 @@
+import pytest
+
+from src.client.checkpoint import JsonlCheckpoint, merge_checkpoints
+
+
+def make_results(indices, error=None):
+    return [
+        {"index": i, "prompt": f"prompt {i}", "model_output": f"output {i}", "error": error}
+        for i in indices
+    ]
+
+
+def test_merge_checkpoints_orders_by_index(tmp_path):
+    first, second = str(tmp_path / "shard0.jsonl"), str(tmp_path / "shard1.jsonl")
+    JsonlCheckpoint(first).append(make_results([0, 2, 4]))
+    JsonlCheckpoint(second).append(make_results([1, 3]) + make_results([5], error="HTTPError"))
+
+    merged = merge_checkpoints([first, second])
+
+    assert [result["index"] for result in merged] == [0, 1, 2, 3, 4]
+
+
+def test_merge_checkpoints_detects_overlap(tmp_path):
+    first, second = str(tmp_path / "shard0.jsonl"), str(tmp_path / "shard1.jsonl")
+    JsonlCheckpoint(first).append(make_results([0, 1, 2]))
+    JsonlCheckpoint(second).append(make_results([2, 3]))
+
+    with pytest.raises(ValueError, match="1 примеров"):
+        merge_checkpoints([first, second])
+
+
+def test_merge_checkpoints_missing_file(tmp_path):
+    with pytest.raises(ValueError, match="не найден"):
+        merge_checkpoints([str(tmp_path / "missing.jsonl")])
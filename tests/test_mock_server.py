@@ -0,0 +1,40 @@
+import socket
+
+import pytest
+
+from src.client.codecs import PayloadCodec
+from src.client.model_client import BatchModelClient
+from src.server.mock_server import MockModelServer, MockServerThread
+
+from conftest import make_generator, make_items
+
+
+def test_mock_server_thread_picks_free_port():
+    with MockServerThread(MockModelServer(), port=0) as thread:
+        assert thread.port != 0
+
+        with pytest.raises(OSError):
+            MockServerThread(MockModelServer(), port=thread.port).start()
+
+
+def test_mock_server_thread_reports_busy_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        port = sock.getsockname()[1]
+
+        with pytest.raises(OSError):
+            MockServerThread(MockModelServer(), port=port).start()
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_mock_server_reads_compressed_requests(mock_server, compression):
+    server, port = mock_server()
+    client = BatchModelClient(
+        port=port, batch_size=4, codec=PayloadCodec(compression=compression)
+    )
+
+    results = client.process_dataset(make_generator(make_items(8)))
+
+    assert [result["error"] for result in results] == [None] * 8
+    assert server.compressed_requests == 2
@@ -0,0 +1,42 @@
+import pytest
+
+from src.evaluation.parsers import MultipleChoiceParser
+
+
+RESPONSES = [
+    "(B) lorem lorem",
+    "I think (B)",
+    "I think the answer is (C).",
+    "xx(B) then C. done",
+    "Answer: D\nbecause",
+    "The answer is A. It is",
+    "B.",
+    "Ответ: (E) потому что",
+    "option G is correct",
+    "hmm (J)\n(A) again",
+]
+
+
+@pytest.mark.parametrize("response", RESPONSES)
+@pytest.mark.parametrize("case_sensitive", [False, True])
+def test_parse_partial_agrees_with_parse(response, case_sensitive):
+    parser = MultipleChoiceParser(case_sensitive=case_sensitive)
+    final = parser.parse(response)
+
+    for end in range(len(response) + 1):
+        partial = parser.parse_partial(response[:end])
+        if partial is not None:
+            assert partial == final
+            # Текст, на котором генерация остановлена, разбирается так же
+            assert parser.parse(response[:end]) == final
+
+
+def test_parse_partial_waits_for_delimiter():
+    parser = MultipleChoiceParser()
+
+    assert parser.parse_partial("(B)") is None
+    assert parser.parse_partial("(B) ") == "B"
+    assert parser.parse_partial("xx(B)") is None
+    # Как и parse, выбирает "I" (допустимый вариант) в начале "I think (B)"
+    assert parser.parse_partial("I") is None
+    assert parser.parse_partial("I think (B)") == parser.parse("I think (B)") == "I"
@@ -0,0 +1,59 @@
+from src.prompts.prompt_generators import FewShotPromptGenerator
+from src.prompts.prompt_strategies import GenerationPromptStrategy
+
+from conftest import make_generator, make_items
+
+
+def make_few_shot_generator(items, share_prefix=True):
+    generator = FewShotPromptGenerator(
+        GenerationPromptStrategy(), n_shots=2, share_prefix=share_prefix
+    )
+    generator.few_shot_examples = items[:2]
+    generator.data = items[2:]
+    return generator
+
+
+def test_prerender_matches_sequential_rendering():
+    items = make_items(50)
+    expected = list(make_generator(items))
+
+    generator = make_generator(items).prerender(workers=2, chunk_size=7)
+    try:
+        assert list(generator) == expected
+    finally:
+        generator.close()
+
+
+def test_prerender_few_shot_records_share_prefix():
+    items = make_items(30)
+    expected = list(make_few_shot_generator(items))
+
+    generator = make_few_shot_generator(items).prerender(workers=2, chunk_size=4)
+    try:
+        records = list(generator)
+    finally:
+        generator.close()
+
+    assert records == expected
+    assert all(record["prefix"] is records[0]["prefix"] for record in records)
+    assert all(record["prompt"].startswith(record["prefix"]) for record in records)
+
+
+def test_few_shot_records_without_shared_prefix():
+    items = make_items(10)
+    shared = list(make_few_shot_generator(items))
+    records = list(make_few_shot_generator(items, share_prefix=False))
+
+    assert all("prefix" not in record for record in records)
+    assert [record["prompt"] for record in records] == [record["prompt"] for record in shared]
+
+
+def test_iter_items_skips_before_rendering():
+    items = make_items(30)
+    skip = set(range(0, 30, 3))
+    expected = [item for item in make_generator(items) if item["index"] not in skip]
+
+    assert list(make_generator(items).iter_items(skip)) == expected
+
+    generator = make_generator(items).prerender(workers=2, chunk_size=4)
+    assert list(generator.iter_items(skip)) == expected
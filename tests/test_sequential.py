@@ -0,0 +1,74 @@
+from src.client.model_client import BatchModelClient
+from src.client.scheduling import LengthBucketScheduler
+from src.client.transport import RetryPolicy
+from src.evaluation.evaluator import Evaluator
+from src.evaluation.metrics import AccuracyMetric
+from src.evaluation.parsers import MultipleChoiceParser
+from src.evaluation.sequential import SequentialEvaluator, wilson_interval
+
+from conftest import make_generator, make_items
+
+
+def make_sequential(**kwargs):
+    return SequentialEvaluator(
+        Evaluator(parser=MultipleChoiceParser(), metric=AccuracyMetric()), **kwargs
+    )
+
+
+def test_submitted_counts_sent_items_not_read_ahead(mock_server):
+    server, port = mock_server()
+    items = make_items(200)
+    for item in items:
+        item["output"] = "A"
+    # Планировщик читает элементы генератора на lookahead вперед
+    client = BatchModelClient(
+        port=port, batch_size=10, scheduler=LengthBucketScheduler(lookahead=100)
+    )
+    generator = make_generator(items)
+    sequential = SequentialEvaluator(
+        Evaluator(parser=MultipleChoiceParser(), metric=AccuracyMetric()),
+        max_ci_width=1.0,
+        min_examples=20,
+        check_every=20,
+    )
+
+    summary = sequential.evaluate(client, generator)["sequential"]
+
+    assert summary["stop_reason"] == "ci_width"
+    assert summary["evaluated"] == 20
+    assert summary["submitted"] == server.prompts
+    assert summary["requests_saved"] == 200 - server.prompts
+
+
+def test_interval_is_corrected_for_repeated_checks(mock_server):
+    server, port = mock_server()
+    client = BatchModelClient(port=port, batch_size=10)
+    sequential = make_sequential(max_ci_width=0.0, min_examples=10, check_every=10)
+
+    summary = sequential.evaluate(client, make_generator(make_items(100)))["sequential"]
+
+    assert summary["stop_reason"] == "exhausted"
+    assert summary["planned_checks"] == 10
+    assert summary["check_confidence"] == 1 - 0.05 / 10
+    correct = round(summary["accuracy"] * summary["evaluated"])
+    assert (summary["ci_lower"], summary["ci_upper"]) == wilson_interval(
+        correct, summary["evaluated"], 1 - 0.05 / 10
+    )
+    naive_lower, naive_upper = wilson_interval(correct, summary["evaluated"], 0.95)
+    assert summary["ci_upper"] - summary["ci_lower"] > naive_upper - naive_lower
+
+
+def test_failed_results_are_reported_separately(mock_server):
+    server, port = mock_server(poison_marker="POISON")
+    client = BatchModelClient(
+        port=port, batch_size=10, isolate_failures=True, retry_policy=RetryPolicy(max_retries=0)
+    )
+    sequential = make_sequential(max_ci_width=0.0, min_examples=10, check_every=10)
+    items = make_items(50, {7: "POISON item 7"})
+
+    summary = sequential.evaluate(client, make_generator(items))["sequential"]
+
+    assert summary["failed"] == 1
+    assert summary["evaluated"] == 49
+    assert summary["total"] == 49
+    assert summary["requests_saved"] == 0
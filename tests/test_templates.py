@@ -0,0 +1,62 @@
+import pytest
+
+from src.prompts.templates import CompiledTemplate, compile_template, substitute_field
+
+
+VALUES = {"subject": "math", "text": "2 + 2 = ?", "n": 3.14159, "items": ["a", "b"]}
+
+TEMPLATES = [
+    "",
+    "No fields at all",
+    "{text}",
+    "The following are questions about {subject}.\n\n{text}\nAnswer:",
+    "Percent % signs %s and %(text)s stay literal: {text}",
+    "Escaped {{braces}} around {subject}",
+    "Conversions: {subject!r} {text!s} {subject!a}",
+    "Format specs: {n:.2f} {subject:>10} {text:*^20}",
+    "Repeated {text} and {text} again",
+    "Positional-free compound fields: {items[0]} {items[1]}",
+    "Nested spec {n:{width}}",
+]
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_render_matches_str_format(template):
+    values = {**VALUES, "width": 8}
+    assert CompiledTemplate(template).render(values) == template.format(**values)
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_render_many_matches_str_format(template):
+    column = [{**VALUES, "text": f"question {i}", "width": 8} for i in range(5)]
+    rendered = compile_template(template).render_many(column)
+    assert rendered == [template.format(**values) for values in column]
+
+
+def test_render_many_with_extra_column():
+    template = "{subject}: {text}\n{options}\nAnswer:"
+    column = [{"subject": "law", "text": f"question {i}"} for i in range(3)]
+    extra = [{"options": f"A. {i}\nB. {i + 1}"} for i in range(3)]
+
+    rendered = compile_template(template).render_many(column, extra)
+
+    assert rendered == [
+        template.format(**values, **options) for values, options in zip(column, extra)
+    ]
+
+
+def test_render_many_reports_missing_fields():
+    template = compile_template("{subject}: {text}")
+    with pytest.raises(ValueError, match="номера: 1"):
+        template.render_many([{"subject": "a", "text": "b"}, {"subject": "c"}])
+
+
+def test_substitute_field_matches_str_format():
+    template = "{subject}: {text}\n{options}\nAnswer: {{x}}"
+    compiled = substitute_field(template, "options", "A. {option_a}\nB. {option_b}")
+    values = {"subject": "math", "text": "1 + 1", "option_a": "2", "option_b": "3"}
+
+    assert compiled.render(values) == template.format(
+        options=f"A. {values['option_a']}\nB. {values['option_b']}", **values
+    )
+    assert substitute_field("{options!r}", "options", "{a}") is None